@@ -0,0 +1,301 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import scipy
+
+import circuit_calculator
+from circuit_calculator import metrics
+from circuit_calculator.circuit_generators import GENERATORS
+from circuit_calculator.method_selector import ANALYZING_METHODS, CostModel, solve_with_method
+
+# Тесты производительности расчёта цепей на синтетических топологиях.
+# Измеряются разбор сообщения, расчёт и сериализация результата, а также этапы расчёта из его профиля
+# (выбор метода, сборка уравнений, факторизация и т. д., см. metrics) – те же, что у сервера.
+# Результаты выводятся в JSON и могут сравниваться с результатами другой версии:
+#   python benchmark.py --topologies ladder grid --sizes 100 10000 --output new.json --compare old.json
+# В режиме калибровки подбираются коэффициенты модели стоимости методов (см. method_selector),
+# которые затем задаются серверу переменной METHOD_COST_MODEL:
+#   python benchmark.py --sizes 100 1000 10000 30000 --calibrate cost_model.json
+
+STAGES = ('parse', 'analysis', 'serialization')
+ENGINES = ('graph', 'compact', 'binary')
+
+# Время запуска измеряется в отдельных процессах: импорт пакета (модули загружаются лениво, см. __init__),
+# импорт модулей расчёта (NumPy, SciPy), первый и следующий расчёт цепи без прогрева и с прогревом
+STARTUP_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import circuit_calculator
+package_import = time.perf_counter() - start
+from circuit_calculator import circuit_graph, circuit_parser
+solver_import = time.perf_counter() - start - package_import
+from circuit_calculator.circuit_generators import GENERATORS
+data = GENERATORS['grid'](int(sys.argv[1]), 0)
+times = {'package_import': package_import, 'solver_import': solver_import}
+suffix = ''
+if sys.argv[2] == 'warm':
+    times['warm_up'] = circuit_calculator.warm_up()
+    suffix = '_after_warm_up'
+for name in ('first_solve', 'next_solve'):
+    start = time.perf_counter()
+    circuit_parser.parse_circuit(data).solve_circuit()
+    times[name + suffix] = time.perf_counter() - start
+print(json.dumps(times))
+'''
+# Число узлов цепи первого расчёта при измерении времени запуска
+STARTUP_CIRCUIT_SIZE = 1000
+
+
+# Расчёт CircuitGraph тем же путём, что и на сервере (analyze_circuit: выбор метода по модели стоимости,
+# разбиение на блоки и т. д.) или заданным методом method ('mna' или 'mca');
+# возвращает название метода и профиль расчёта
+def run_graph_stages(data, method, stage):
+    with stage('parse'):
+        circuit_graph = circuit_calculator.parse_circuit(data)
+    with stage('analysis'), metrics.profile() as profile:
+        if method == 'auto':
+            analyzing_method = circuit_graph.analyze_circuit()
+        else:
+            solve_with_method(circuit_graph, method)
+            analyzing_method = ANALYZING_METHODS[method]
+    with stage('serialization'):
+        json.dumps(circuit_graph.form_result(analyzing_method))
+    return analyzing_method, profile
+
+
+# Расчёт компактного представления (CompactCircuit.solve_circuit, выбор решателя по модели стоимости);
+# binary – разбор и результат в двоичном формате
+def run_compact_stages(data, binary, stage):
+    message = circuit_calculator.form_binary_circuit(data) if binary else data
+    with stage('parse'):
+        if binary:
+            circuit = circuit_calculator.parse_binary_circuit(message)
+        else:
+            circuit = circuit_calculator.parse_circuit(message, compact=True)
+    with stage('analysis'), metrics.profile() as profile:
+        result = circuit.solve_circuit()
+    with stage('serialization'):
+        if binary:
+            circuit.form_binary_result()
+        else:
+            json.dumps(result)
+    return result['method'], profile
+
+
+def run_stages(data, engine, method, stage):
+    if engine == 'graph':
+        return run_graph_stages(data, method, stage)
+    return run_compact_stages(data, engine == 'binary', stage)
+
+
+# Время этапов – минимум по repeat запускам; пиковая память этапов – отдельным запуском под tracemalloc,
+# так как отслеживание выделений памяти замедляет расчёт
+def benchmark(data, engine, method, repeat, measure_memory):
+    times = {}
+    for _ in range(repeat):
+        run_times = {}
+
+        @contextlib.contextmanager
+        def timed_stage(name):
+            start = time.perf_counter()
+            yield
+            run_times[name] = time.perf_counter() - start
+
+        analyzing_method, profile = run_stages(data, engine, method, timed_stage)
+        # этапы профиля входят во время расчёта ('analysis') и в полное время не добавляются
+        run_times.update(profile.stages)
+        for name, value in run_times.items():
+            times[name] = min(times.get(name, value), value)
+
+    result = {
+        'method': analyzing_method,
+        'times': times,
+        'total_time': sum(times[name] for name in STAGES),
+    }
+    for name in ('selected_method', 'solver'):
+        if name in profile.counters:
+            result[name] = profile.counters[name]
+    if measure_memory:
+        peak_memory = {}
+
+        @contextlib.contextmanager
+        def traced_stage(name):
+            tracemalloc.reset_peak()
+            yield
+            peak_memory[name] = tracemalloc.get_traced_memory()[1]
+
+        tracemalloc.start()
+        try:
+            run_stages(data, engine, method, traced_stage)
+        finally:
+            tracemalloc.stop()
+        result['peak_memory'] = peak_memory
+        result['max_peak_memory'] = max(peak_memory.values())
+    return result
+
+
+def run_benchmarks(topologies, sizes, engines, method, repeat, measure_memory, seed):
+    results = []
+    for topology in topologies:
+        for size in sizes:
+            start = time.perf_counter()
+            data = GENERATORS[topology](size, seed)
+            generation_time = time.perf_counter() - start
+            for engine in engines:
+                result = {
+                    'topology': topology,
+                    'size': size,
+                    'engine': engine,
+                    'requested_method': method if engine == 'graph' else 'auto',
+                    'nodes': len(data['nodes']),
+                    'edges': len(data['edges']),
+                    'generation_time': generation_time,
+                }
+                try:
+                    result.update(benchmark(data, engine, method, repeat, measure_memory))
+                except Exception as e:
+                    result['error'] = f'{type(e).__name__}: {e}'
+                print(f"{topology:>8} {size:>8} {engine:>7} "
+                      + (f"{result['total_time']:10.4f} s" if 'error' not in result else result['error']),
+                      file=sys.stderr)
+                results.append(result)
+    return results
+
+
+# Время запуска – минимум по repeat запускам процессов; cli – полное время консольной программы
+# (python -m circuit_calculator solve) на небольшой цепи, interpreter – время запуска пустого интерпретатора
+def measure_startup(repeat):
+    directory = os.path.dirname(os.path.abspath(__file__))
+    times = {}
+
+    def run(name, command):
+        start = time.perf_counter()
+        process = subprocess.run(command, cwd=directory, capture_output=True, text=True, check=True)
+        elapsed = {name: time.perf_counter() - start} if name else json.loads(process.stdout)
+        for key, value in elapsed.items():
+            times[key] = min(times.get(key, value), value)
+
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump(GENERATORS['ladder'](10, 0), f)
+    try:
+        for _ in range(repeat):
+            run('interpreter', [sys.executable, '-c', 'pass'])
+            run('cli', [sys.executable, '-m', 'circuit_calculator', 'solve', f.name])
+            run(None, [sys.executable, '-c', STARTUP_SCRIPT, str(STARTUP_CIRCUIT_SIZE), 'cold'])
+            run(None, [sys.executable, '-c', STARTUP_SCRIPT, str(STARTUP_CIRCUIT_SIZE), 'warm'])
+    finally:
+        os.unlink(f.name)
+    print('startup ' + ' '.join(f'{name} {value:.4f} s' for name, value in times.items()), file=sys.stderr)
+    return times
+
+
+def calibrate(topologies, sizes, repeat, seed, path):
+    circuits = [GENERATORS[topology](size, seed) for topology in topologies for size in sizes]
+    start = time.perf_counter()
+    cost_model = CostModel.calibrate(circuits, repeat)
+    cost_model.save(path)
+    print(f'calibrated on {len(circuits)} circuits in {time.perf_counter() - start:.1f} s', file=sys.stderr)
+    json.dump(cost_model.coefficients, sys.stdout, indent=2)
+
+
+def result_key(result):
+    return result['topology'], result['size'], result['engine'], result['requested_method']
+
+
+# Регрессия – этап, который стал медленнее в threshold раз; этапы короче min_time не сравниваются
+def compare_results(results, baseline, threshold, min_time):
+    baseline_results = {result_key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        old_result = baseline_results.get(result_key(result))
+        if old_result is None or 'times' not in result or 'times' not in old_result:
+            continue
+        for name, value in result['times'].items():
+            old_value = old_result['times'].get(name)
+            if old_value is not None and max(value, old_value) >= min_time and value > threshold * old_value:
+                regressions.append({
+                    'topology': result['topology'], 'size': result['size'], 'engine': result['engine'],
+                    'stage': name, 'time': value, 'baseline_time': old_value, 'ratio': value / old_value,
+                })
+    return regressions
+
+
+def compare_startup(startup, baseline, threshold, min_time):
+    regressions = []
+    for name, value in startup.items():
+        old_value = baseline.get(name)
+        if old_value is not None and max(value, old_value) >= min_time and value > threshold * old_value:
+            regressions.append({'topology': 'startup', 'size': 0, 'engine': '', 'stage': name, 'time': value,
+                                'baseline_time': old_value, 'ratio': value / old_value})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Circuit solver benchmarks')
+    parser.add_argument('--topologies', nargs='+', default=list(GENERATORS), choices=list(GENERATORS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10, 100, 1000, 10000],
+                        help='approximate number of nodes')
+    parser.add_argument('--engines', nargs='+', default=['graph', 'compact'], choices=ENGINES)
+    parser.add_argument('--method', default='auto', choices=['auto', 'mna', 'mca'],
+                        help='analysis method of the graph engine')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory run')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='file for JSON results (stdout by default)')
+    parser.add_argument('--compare', help='JSON results of another version to compare with')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown ratio reported as a regression')
+    parser.add_argument('--min-time', type=float, default=1e-3, help='stages faster than this are not compared')
+    parser.add_argument('--calibrate', metavar='PATH', help='fit the method cost model and save it to PATH')
+    parser.add_argument('--no-startup', action='store_true', help='skip the import and startup time runs')
+    args = parser.parse_args()
+
+    if args.calibrate:
+        calibrate(args.topologies, args.sizes, args.repeat, args.seed, args.calibrate)
+        return
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'scipy': scipy.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'results': run_benchmarks(args.topologies, args.sizes, args.engines, args.method,
+                                  args.repeat, not args.no_memory, args.seed),
+    }
+    if not args.no_startup:
+        report['startup'] = measure_startup(args.repeat)
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(report['results'], baseline, args.threshold, args.min_time)
+        if 'startup' in report and 'startup' in baseline:
+            regressions += compare_startup(report['startup'], baseline['startup'], args.threshold, args.min_time)
+        report['regressions'] = regressions
+        for regression in regressions:
+            print(f"regression: {regression['topology']} {regression['size']} {regression['engine']} "
+                  f"{regression['stage']} {regression['baseline_time']:.4f} s -> {regression['time']:.4f} s",
+                  file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1,44 @@
-from .circuit_parser import *
\ No newline at end of file
+import importlib
+
+# Модули пакета загружаются при первом обращении к их именам: импорт пакета не загружает NumPy и SciPy,
+# пока расчёт не нужен (консольная программа до чтения цепи, основной процесс сервера с несколькими процессами).
+# Имена разбора цепей (parse_circuit и другие) доступны из пакета, как из circuit_parser
+_LAZY_ATTRIBUTES = {
+    'SingularMatrixError': 'linear_solver',
+    'CostModel': 'method_selector',
+    'set_cost_model': 'method_selector',
+    'SolveMetrics': 'metrics',
+    'SolveCache': 'solve_cache',
+    'TransientAnalysis': 'transient',
+    'warm_up': 'warmup',
+}
+_PARSER_ATTRIBUTES = ('ELEMENT_TYPES', 'NONLINEAR_ELEMENT_TYPES', 'BINARY_ELEMENT_TYPES', 'CircuitGraph', 'Direction',
+                      'CompactCircuit', 'Resistor', 'VoltageSource', 'CurrentSource', 'Capacitor', 'Inductor',
+                      'Diode', 'NonlinearResistor', 'add_elements', 'parse_circuit', 'parse_newton_options',
+                      'canonicalize_circuit', 'parse_compact_circuit', 'parse_binary_circuit', 'form_binary_circuit',
+                      'parse_element_reference', 'parse_update', 'parse_sweep', 'parse_sensitivity',
+                      'parse_transient', 'parse_ac', 'parse_stream_options')
+_SUBMODULES = ('circuit_generators', 'circuit_graph', 'circuit_parser', 'compact_circuit', 'components',
+               'decomposition', 'linear_solver', 'metrics', 'method_selector', 'newton', 'solve_cache',
+               'transient', 'warmup')
+
+# Имена, которые импортирует from circuit_calculator import * (модули пакета не импортируются)
+__all__ = [*_PARSER_ATTRIBUTES, *_LAZY_ATTRIBUTES]
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(f'.{_LAZY_ATTRIBUTES[name]}', __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f'.{name}', __name__)
+    else:
+        circuit_parser = importlib.import_module('.circuit_parser', __name__)
+        if name.startswith('_') or not hasattr(circuit_parser, name):
+            raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+        value = getattr(circuit_parser, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *__all__, *_SUBMODULES})
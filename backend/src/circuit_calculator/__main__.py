@@ -0,0 +1,67 @@
+import argparse
+import json
+import sys
+import time
+
+# Консольная программа расчёта цепей без сервера (FastAPI и uvicorn не загружаются):
+#   python -m circuit_calculator solve netlist.json [other.json ...] [--output results.jsonl] [--profile]
+# Файл – цепь в формате сообщения клиента ({"nodes": [...], "edges": [...]}), "-" – стандартный ввод.
+# Результат каждого файла – строка JSON: {"file": ..., "calculation_result": ...} или {"file": ..., "error": ...}
+
+
+def read_circuit(path):
+    if path == '-':
+        return json.load(sys.stdin)
+    with open(path) as f:
+        return json.load(f)
+
+
+# Расчёт цепей по очереди; ошибка в одном файле не прерывает расчёт остальных.
+# Возвращает число файлов, расчёт которых не удался
+def solve_files(paths, output, profile=False):
+    # модули расчёта (NumPy, SciPy) загружаются только здесь
+    from . import metrics
+    from .circuit_parser import parse_circuit
+    failed = 0
+    for path in paths:
+        response = {'file': path}
+        try:
+            with metrics.profile() as solve_profile:
+                data = read_circuit(path)
+                with metrics.stage('parse'):
+                    circuit_graph = parse_circuit(data)
+                response['calculation_result'] = circuit_graph.solve_circuit()
+            if profile:
+                response['profile'] = solve_profile.to_dict()
+        except Exception as e:
+            response['error'] = f'{type(e).__name__}: {e}'
+            failed += 1
+        output.write(json.dumps(response, separators=(',', ':'), ensure_ascii=False) + '\n')
+        output.flush()
+    return failed
+
+
+def main(argv=None):
+    start = time.perf_counter()
+    parser = argparse.ArgumentParser(prog='python -m circuit_calculator', description='Circuit calculator')
+    commands = parser.add_subparsers(dest='command', required=True)
+    solve_parser = commands.add_parser('solve', help='solve circuits from JSON files')
+    solve_parser.add_argument('files', nargs='+', help='circuit files, "-" for standard input')
+    solve_parser.add_argument('--output', help='file for JSON lines results (stdout by default)')
+    solve_parser.add_argument('--profile', action='store_true', help='attach the stage profile to each result')
+    solve_parser.add_argument('--timing', action='store_true', help='print startup and total time to stderr')
+    args = parser.parse_args(argv)
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        failed = solve_files(args.files, output, args.profile)
+    finally:
+        if args.output:
+            output.close()
+    if args.timing:
+        print(f'{len(args.files)} files ({failed} failed) in {time.perf_counter() - start:.4f} s', file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+import numpy as np
+
+# Генераторы синтетических цепей для тестов производительности.
+# Цепи возвращаются в формате сообщения клиента ({"nodes": [...], "edges": [...]}),
+# номиналы выбираются генератором случайных чисел с заданным seed, цепи связны.
+# Источники напряжения добавляются в долю source_fraction ветвей (в каждой цепи – хотя бы один)
+
+
+def _resistor(value):
+    return {'type': 'resistor', 'value': value}
+
+
+def _voltage_source(value, from_node, to_node):
+    return {'type': 'voltageSource', 'value': value, 'direction': {'from': from_node, 'to': to_node}}
+
+
+def form_circuit(num_nodes, start_nodes, end_nodes, seed=0, source_fraction=0.1):
+    rng = np.random.default_rng(seed)
+    num_edges = len(start_nodes)
+    resistance = rng.integers(1, 100, num_edges).tolist()
+    has_source = rng.random(num_edges) < source_fraction
+    has_source[0] = True
+    voltage = rng.integers(1, 20, num_edges).tolist()
+    edges = []
+    for i, (from_node, to_node) in enumerate(zip(np.asarray(start_nodes).tolist(), np.asarray(end_nodes).tolist())):
+        elements = [_resistor(resistance[i])]
+        if has_source[i]:
+            elements.append(_voltage_source(voltage[i], from_node, to_node))
+        edges.append({'id': i + 1, 'from': from_node, 'to': to_node, 'elements': elements})
+    return {'nodes': list(range(1, num_nodes + 1)), 'edges': edges}
+
+
+# Лестница: две шины по num_nodes / 2 узлов, соединённые перемычками
+def generate_ladder(num_nodes, seed=0, source_fraction=0.1):
+    rungs = max(2, num_nodes // 2)
+    top = np.arange(1, rungs + 1)
+    bottom = top + rungs
+    start_nodes = np.concatenate([top, top[:-1], bottom[:-1]])
+    end_nodes = np.concatenate([bottom, top[1:], bottom[1:]])
+    return form_circuit(2 * rungs, start_nodes, end_nodes, seed, source_fraction)
+
+
+# Прямоугольная сетка в dimensions измерениях (2 – плоская, 3 – объёмная) примерно из num_nodes узлов
+def generate_grid(num_nodes, seed=0, source_fraction=0.1, dimensions=2):
+    side = max(2, int(round(num_nodes ** (1 / dimensions))))
+    shape = (side,) * dimensions
+    indices = np.arange(side ** dimensions).reshape(shape) + 1
+    start_nodes, end_nodes = [], []
+    for axis in range(dimensions):
+        start_nodes.append(np.delete(indices, -1, axis=axis).ravel())
+        end_nodes.append(np.delete(indices, 0, axis=axis).ravel())
+    return form_circuit(side ** dimensions, np.concatenate(start_nodes), np.concatenate(end_nodes),
+                        seed, source_fraction)
+
+
+def generate_grid3d(num_nodes, seed=0, source_fraction=0.1):
+    return generate_grid(num_nodes, seed, source_fraction, dimensions=3)
+
+
+# Случайная разреженная цепь: случайное остовное дерево и дополнительные ветви до средней степени узла degree
+def generate_random(num_nodes, seed=0, source_fraction=0.1, degree=3):
+    num_nodes = max(num_nodes, 3)
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(num_nodes) + 1
+    parents = order[(rng.random(num_nodes - 1) * np.arange(1, num_nodes)).astype(np.int64)]
+    num_extra = max(1, num_nodes * degree // 2 - (num_nodes - 1))
+    extra_start = rng.integers(1, num_nodes + 1, num_extra)
+    extra_end = (extra_start + rng.integers(1, num_nodes, num_extra) - 1) % num_nodes + 1
+    return form_circuit(num_nodes, np.concatenate([parents, extra_start]), np.concatenate([order[1:], extra_end]),
+                        seed, source_fraction)
+
+
+# Цепь с особыми ветвями: лестница, в которой часть перемычек – идеальные источники напряжения
+# без сопротивления (перемычки не имеют общих узлов, поэтому особые ветви не образуют цепочек)
+def generate_specific(num_nodes, seed=0, source_fraction=0.1, specific_fraction=0.2):
+    circuit = generate_ladder(num_nodes, seed, source_fraction)
+    rng = np.random.default_rng(seed + 1)
+    rungs = len(circuit['nodes']) // 2
+    for i in np.flatnonzero(rng.random(rungs) < specific_fraction).tolist():
+        edge = circuit['edges'][i]
+        edge['elements'] = [_voltage_source(int(rng.integers(1, 20)), edge['from'], edge['to'])]
+    return circuit
+
+
+GENERATORS = {
+    'ladder': generate_ladder,
+    'grid': generate_grid,
+    'grid3d': generate_grid3d,
+    'random': generate_random,
+    'specific': generate_specific,
+}
@@ -1,11 +1,54 @@
 import heapq
+import logging
+import os
+from collections import deque
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+import scipy.sparse as sp
+from scipy.sparse import csgraph
+from . import decomposition, metrics, newton
+from .method_selector import ANALYZING_METHODS, ITERATIVE_THRESHOLD, get_cost_model
 from .components import (
     Resistor,
     VoltageSource,
     CurrentSource,
+    Capacitor,
+    Inductor,
+    Diode,
+    NONLINEAR_ELEMENTS,
 )
-from .utils import LU_decomposition, solve_LU
+from .linear_solver import (
+    CG_TOLERANCE,
+    DENSE_THRESHOLD,
+    SingularMatrixError,
+    SparseFactorization,
+    UpdatableFactorization,
+    factorize,
+    solve_iteratively,
+)
+
+logger = logging.getLogger(__name__)
+
+# Ограничение на число элементов матриц одного пакета при пакетном расчёте вариантов цепи
+SWEEP_CHUNK_ELEMENTS = 2 ** 24
+# Правила выбора базового узла уравнений узлов (см. CircuitGraph.set_basis_policy)
+BASIS_POLICIES = ('max_degree', 'seed')
+
+# Изменяемый параметр каждого типа элементов
+ELEMENT_VALUE_ATTRIBUTES = {
+    Resistor: 'resistance',
+    VoltageSource: 'voltage',
+    CurrentSource: 'current',
+    Capacitor: 'capacitance',
+    Inductor: 'inductance',
+    Diode: 'saturation_current',
+}
+
+# Коэффициенты уравнения хранятся в разреженном виде: {индекс узла или ветвь: коэффициент}
+def add_terms(terms, other_terms, sign=1):
+    for key, coefficient in other_terms.items():
+        terms[key] = terms.get(key, 0) + sign * coefficient
 
 class Direction:
     def __init__(self, start_node, end_node):
@@ -30,8 +73,12 @@ class Edge:
     def __init__(self, label, current_direction, elements):
         self.label = label
         self.current_direction = current_direction
+        # исходное направление ветви, относительно которого составляются уравнения
+        self.direction = current_direction
         self.elements = elements
         self.current_strength = None
+        # ветвь с нелинейным элементом состоит только из него (см. CircuitGraph.solve_circuit_using_newton)
+        self.nonlinear_elements = [element for element in elements if isinstance(element, NONLINEAR_ELEMENTS)]
         self.voltage_sum, self.resistance_sum, self.current_sum = self.calculate_element_contribution()
 
     # Проверка, является ли ветвь особой
@@ -39,10 +86,14 @@ class Edge:
     def is_specific(self):
         is_specific = True
         for element in self.elements:
-            if isinstance(element, Resistor):
+            if isinstance(element, (Resistor, *NONLINEAR_ELEMENTS)):
                 is_specific = False
         return is_specific
     
+    # Знак вклада источника относительно исходного направления ветви
+    def source_sign(self, element):
+        return 1 if element.direction.start_node == self.direction.start_node.label else -1
+
     def calculate_element_contribution(self):
         voltage_sum, resistance_sum, current_sum = 0, 0, 0
         for element in self.elements:
@@ -57,34 +108,62 @@ class Edge:
         self.weight = 1 / resistance_sum if resistance_sum != 0 else float('inf')
         return voltage_sum, resistance_sum, current_sum
     
-    def form_phi_equation(self, n):
-        phi, c = np.zeros(n), 0
+    def form_phi_equation(self):
+        phi, c = {}, 0
         numerator, denominator = self.voltage_sum, self.resistance_sum
         start_node_index = self.current_direction.start_node.index
         end_node_index = self.current_direction.end_node.index
         denominator = 1 if denominator == 0 else denominator
-        phi[start_node_index] += 1 / denominator
-        phi[end_node_index] -= 1 / denominator
+        add_terms(phi, {start_node_index: 1 / denominator})
+        add_terms(phi, {end_node_index: -1 / denominator})
         c += numerator / denominator + self.current_sum
         return phi, c
 
+    def reset_current_strength(self):
+        self.current_direction = self.direction
+        self.current_strength = None
+
+    # Ток ветви без сопротивления зависит от токов остальных ветвей её конечного узла,
+    # поэтому зависимости обходятся с явным стеком (без рекурсии и ограничения её глубины)
     def calculate_current_strength(self):
-        if self.current_strength is not None:
-            return
-        
+        stack = [self]
+        in_progress = set()
+        while stack:
+            edge = stack[-1]
+            if edge.current_strength is not None:
+                stack.pop()
+                continue
+            dependencies = []
+            if edge.resistance_sum == 0 and not edge.nonlinear_elements:
+                dependencies = [other_edge for _, other_edge in edge.current_direction.end_node.children
+                                if other_edge is not edge and other_edge.current_strength is None]
+            if dependencies and edge not in in_progress:
+                in_progress.add(edge)
+                for other_edge in dependencies:
+                    if other_edge in in_progress:
+                        raise Exception('current in a loop of zero-resistance branches is undefined')
+                    stack.append(other_edge)
+            else:
+                edge.assign_current_strength()
+                stack.pop()
+
+    def assign_current_strength(self):
         numerator = self.current_direction.start_node.potential - self.current_direction.end_node.potential
         denominator = 0
         numerator += self.voltage_sum
         denominator += self.resistance_sum
 
-        if denominator != 0:
+        if self.nonlinear_elements:
+            # ток нелинейного элемента – по его вольт-амперной характеристике
+            element = self.nonlinear_elements[0]
+            sign = 1 if element.direction.start_node == self.current_direction.start_node.label else -1
+            current_strength = sign * element.evaluate(sign * numerator)[0]
+        elif denominator != 0:
             current_strength = numerator / denominator + self.current_sum
         else:
             current_strength = 0 + self.current_sum
             for _, edge in self.current_direction.end_node.children:
                 if edge is not self:
-                    if edge.current_strength is None:
-                        edge.calculate_current_strength()
                     if self.current_direction.end_node.label == edge.current_direction.end_node.label:
                         current_strength -= edge.current_strength
                     else:
@@ -107,10 +186,60 @@ class Edge:
 class CircuitGraph:
     def __init__(self, elements=None):
         self.nodes = {}
+        self.edges = {}
         if elements:
             self.elements = elements
         self.num_nodes = 0
         self.num_edges = 0
+        # структура решения цепи с той же топологией (см. export_structure)
+        self.structure = None
+        # максимальное остовное дерево, если оно построено до расчёта методом контурных токов
+        self.spanning_tree = None
+        # выбор базового узла: узел, заданный явно, правило выбора и seed (см. set_basis_policy)
+        self.basis_node = None
+        self.basis_policy = 'max_degree'
+        self.seed = 0
+        # параметры метода Ньютона для цепи с нелинейными элементами (см. solve_circuit_using_newton)
+        self.newton_options = {}
+
+    # Граф сериализуется в плоском виде, чтобы pickle не обходил связанные узлы и ветви рекурсивно
+    # (например, при передаче в пул процессов); вместо факторизации сохраняется структура решения
+    def __getstate__(self):
+        state = {
+            'nodes': list(self.nodes),
+            'edges': [
+                (edge.label, edge.direction.start_node.label, edge.direction.end_node.label, edge.elements)
+                for edge in self.edges.values()
+            ],
+            'structure': self.export_structure() if getattr(self, 'analyzing_method', None) else self.structure,
+            'basis': (self.basis_node, self.basis_policy, self.seed),
+            'newton_options': self.newton_options,
+        }
+        if hasattr(self, 'elements'):
+            state['elements'] = self.elements
+        return state
+
+    def __setstate__(self, state):
+        self.__init__(state.get('elements'))
+        for label in state['nodes']:
+            self.add_node(label)
+        for label, first_node, second_node, elements in state['edges']:
+            self.add_edge(label, first_node, second_node, *elements)
+        self.structure = state['structure']
+        self.basis_node, self.basis_policy, self.seed = state['basis']
+        self.newton_options = state['newton_options']
+
+    # Базовый (с нулевым потенциалом) узел – узел basis_node, если он задан; иначе – по правилу policy:
+    # 'max_degree' – узел с наибольшим числом ветвей (первый из таких), 'seed' – случайный узел,
+    # выбранный генератором с заданным seed. Выбор не зависит от запуска, поэтому расчёт воспроизводим
+    def set_basis_policy(self, basis_node=None, policy='max_degree', seed=0):
+        if basis_node is not None and str(basis_node) not in self.nodes:
+            raise Exception(f'basis node "{basis_node}" is not a node of the graph')
+        if policy not in BASIS_POLICIES:
+            raise Exception(f'unknown basis node policy "{policy}"')
+        self.basis_node = None if basis_node is None else str(basis_node)
+        self.basis_policy = policy
+        self.seed = int(seed)
 
     def add_node(self, label):
         if label in self.nodes:
@@ -128,52 +257,41 @@ class CircuitGraph:
         edge = Edge(label, Direction(self.nodes[first_node], self.nodes[second_node]), elements)
         self.nodes[first_node].add_edge(self.nodes[second_node], edge)
         self.nodes[second_node].add_edge(self.nodes[first_node], edge)
+        self.edges[label] = edge
         self.num_edges += 1
 
     def dfs(self, start_node, visited=None):
         if visited is None:
             visited = set()
-        visited.add(start_node)
-        for child_label in self.nodes[start_node].children:
-            if child_label not in visited:
-                self.dfs(child_label, visited)
+        stack = [start_node]
+        while stack:
+            node_label = stack.pop()
+            if node_label in visited:
+                continue
+            visited.add(node_label)
+            for child, _ in self.nodes[node_label].children:
+                if child.label not in visited:
+                    stack.append(child.label)
         return visited
     
     def find_specific_edges(self):
-        specific_edges = []
-        visited = set()
-        for node in self.nodes.values():
-            for _, edge in node.children:
-                if edge not in visited:
-                    is_edge_specific = edge.is_specific()
-                    if is_edge_specific:
-                        specific_edges.append(edge)
-                    visited.add(edge)
-        return specific_edges
+        return [edge for edge in self.edges.values() if edge.is_specific()]
     
-    def form_phi_equations(self):
-        # число уравнений в СЛАУ
-        n = len(self.nodes)
-        A = np.zeros((n, n))
-        b = np.zeros(n)
-        specific_edges = self.find_specific_edges()
-        # число узлов, для которых нужно применять правило Кирхгофа для составления уравнения
-        # вычитаем из общего числа узлов базовый узел и число особых ветвей
-        # для особых ветвей достаточно вычислить потенциал одного из узлов
-        k = len(self.nodes) - 1 - len(specific_edges)
+    # Структура уравнений узлов, не зависящая от номиналов элементов:
+    # базовый узел и уравнение каждого узла как сумма токов ветвей с коэффициентами ±1
+    # specific_edges по умолчанию – ветви без резисторов (см. Edge.is_specific)
+    def find_phi_equation_terms(self, specific_edges=None):
+        specific_edges = set(self.find_specific_edges() if specific_edges is None else specific_edges)
         visited_edges = set()
-        if not len(specific_edges):
-            # выбираем случайный узел и делаем его базовым
-            basis_node_index = np.random.randint(0, len(self.nodes))
-        else:
-            # выбираем случайную особую ветвь и делаем первый узел базовым
-            specific_edge_index = np.random.randint(0, len(specific_edges))
-            basis_node_index = specific_edges[specific_edge_index].current_direction.start_node.index
-            visited_edges.add(specific_edges[specific_edge_index])
-        list(self.nodes.values())[basis_node_index].potential = 0
-        A[basis_node_index][basis_node_index] = 1
+        basis_node_index, specific_edge = self.choose_basis_node(specific_edges)
+        if specific_edge is not None:
+            visited_edges.add(specific_edge)
+        if not specific_edges:
+            return basis_node_index, self.find_edge_rows(basis_node_index)
         specific_nodes = {}
-        for edge in specific_edges:
+        # особые ветви обходятся в порядке ветвей графа: порядок слагаемых при сборке матрицы
+        # не зависит от порядка обхода множества, и результат расчёта повторяется бит в бит
+        for edge in (edge for edge in self.edges.values() if edge in specific_edges):
             if edge.current_direction.start_node.label not in specific_nodes:
                 specific_nodes[edge.current_direction.start_node.label] = [edge]
             else:
@@ -182,58 +300,191 @@ class CircuitGraph:
                 specific_nodes[edge.current_direction.end_node.label] = [edge]
             else:
                 specific_nodes[edge.current_direction.end_node.label].append(edge)
+        # строки, в уравнения которых входит ток ветви: {ветвь: {индекс узла: знак}}
+        edge_rows = {}
         for node in self.nodes.values():
             if node.index == basis_node_index:
                 continue
+            edge_terms = {}
             is_calc_second_potential_found = False
             if node.label in specific_nodes:
                 for edge in specific_nodes[node.label]:
                     if edge in visited_edges:
                         is_calc_second_potential_found = True
-                        phi, c = edge.form_phi_equation(n)
-                        A[node.index] += phi
-                        b[node.index] -= c
+                        add_terms(edge_terms, {edge: 1})
             if not is_calc_second_potential_found:
                 for _, edge in node.children:
                     if edge not in specific_edges:
-                        phi, c = edge.form_phi_equation(n)
+                        terms = {edge: 1}
                     else:
                         other_node = edge.current_direction.end_node if edge.current_direction.start_node is node \
                             else edge.current_direction.start_node
-                        phi, c = self.find_current_in_specific(other_node, specific_edges, edge)
+                        terms = self.find_current_in_specific(other_node, specific_edges, edge)
                         visited_edges.add(edge)
                     if edge.current_direction.end_node.label == node.label:
-                        A[node.index] += phi
-                        b[node.index] -= c
+                        add_terms(edge_terms, terms)
                     else:
-                        A[node.index] -= phi
-                        b[node.index] += c
+                        add_terms(edge_terms, terms, -1)
+            for edge, sign in edge_terms.items():
+                edge_rows.setdefault(edge, {})[node.index] = sign
+        return basis_node_index, edge_rows
+
+    # Строки уравнений узлов цепи без особых ветвей: ток ветви входит в уравнение её конечного узла со знаком +1,
+    # начального – со знаком -1 (уравнение базового узла не составляется); обход узлов не нужен
+    def find_edge_rows(self, basis_node_index):
+        edge_rows = {}
+        for edge in self.edges.values():
+            direction = edge.current_direction
+            start_index, end_index = direction.start_node.index, direction.end_node.index
+            if start_index == end_index:
+                # ток ветви-петли входит в уравнение её узла дважды с разными знаками
+                continue
+            if start_index == basis_node_index:
+                edge_rows[edge] = {end_index: 1}
+            elif end_index == basis_node_index:
+                edge_rows[edge] = {start_index: -1}
+            else:
+                edge_rows[edge] = {end_index: 1, start_index: -1}
+        return edge_rows
+
+    # Базовый узел по правилу выбора (см. set_basis_policy). Если в цепи есть особые ветви, базовым
+    # может быть только узел особой ветви: возвращается индекс узла и эта ветвь (иначе None)
+    def choose_basis_node(self, specific_edges):
+        if specific_edges:
+            candidates = [(node, edge) for edge in self.edges.values() if edge in specific_edges
+                          for node in (edge.direction.start_node, edge.direction.end_node)]
+        else:
+            candidates = [(node, None) for node in self.nodes.values()]
+        requested = [candidate for candidate in candidates if candidate[0].label == self.basis_node]
+        if requested:
+            node, edge = requested[0]
+        elif self.basis_policy == 'seed':
+            node, edge = candidates[np.random.default_rng(self.seed).integers(len(candidates))]
+        else:
+            node, edge = max(candidates, key=lambda candidate: len(candidate[0].children))
+        return node.index, edge
+
+    # Потенциалы относительно узла basis_node, если он задан явно, но не стал базовым
+    # (узел не принадлежит особой ветви); potentials – по узлам в последнем измерении
+    def shift_to_basis_node(self, potentials, basis_node_index):
+        if self.basis_node is None or self.nodes[self.basis_node].index == basis_node_index:
+            return potentials
+        reference_index = self.nodes[self.basis_node].index
+        return potentials - potentials[..., reference_index:reference_index + 1]
+
+    def restore_phi_equation_terms(self):
+        self.basis_node_index = self.nodes[self.structure['basis_node']].index
+        self.edge_rows = {
+            self.edges[edge_label]: {self.nodes[node_label].index: sign for node_label, sign in rows.items()}
+            for edge_label, rows in self.structure['edge_rows'].items()
+        }
+
+    # Структура решения, зависящая только от топологии цепи: базовый узел и строки уравнений узлов,
+    # остовное дерево и независимые контуры, упорядочивание столбцов при факторизации
+    def export_structure(self):
+        analyzing_method = getattr(self, 'analyzing_method', None)
+        node_labels = list(self.nodes)
+        structure = {'analyzing_method': analyzing_method}
+        if getattr(self, 'method_selection', None) is not None:
+            structure['selected_method'] = self.method_selection['method']
+        if analyzing_method == 'modified nodal analysis':
+            structure['basis_node'] = node_labels[self.basis_node_index]
+            structure['edge_rows'] = {
+                edge.label: {node_labels[row]: sign for row, sign in rows.items()}
+                for edge, rows in self.edge_rows.items()
+            }
+        elif analyzing_method == 'mesh current analysis':
+            structure['spanning_tree'] = [edge.label for edge in self.spanning_tree]
+            structure['loops'] = [[(node.label, edge.label) for node, edge in loop] for loop in self.loops]
+        column_order = getattr(getattr(self, 'factorization', None), 'column_order', None)
+        if column_order is not None:
+            # для уравнений узлов упорядочивание хранится через метки узлов
+            structure['column_order'] = [node_labels[i] for i in column_order] \
+                if analyzing_method == 'modified nodal analysis' else list(column_order)
+        return structure
+
+    def restore_column_order(self):
+        if self.structure is None or 'column_order' not in self.structure:
+            return None
+        if self.structure['analyzing_method'] == 'modified nodal analysis':
+            return np.array([self.nodes[label].index for label in self.structure['column_order']])
+        return np.array(self.structure['column_order'])
+
+    def form_phi_equations(self):
+        if self.structure is not None and 'edge_rows' in self.structure:
+            self.restore_phi_equation_terms()
+        else:
+            self.basis_node_index, self.edge_rows = self.find_phi_equation_terms()
+        list(self.nodes.values())[self.basis_node_index].potential = 0
+        return self.assemble_phi_equations(self.basis_node_index, self.edge_rows)
+
+    # Матрица и правая часть уравнений узлов по их структуре (см. find_phi_equation_terms).
+    # Слагаемое ветви в уравнении строки row со знаком sign – sign * (g (phi_s - phi_t) + c), как в
+    # Edge.form_phi_equation; слагаемые всех ветвей собираются массивами NumPy в формате COO
+    def assemble_phi_equations(self, basis_node_index, edge_rows):
+        # число уравнений в СЛАУ
+        n = len(self.nodes)
+        edges = list(edge_rows)
+        counts = np.fromiter(map(len, edge_rows.values()), dtype=np.int64, count=len(edges))
+        num_terms = int(counts.sum())
+        rows = np.fromiter(chain.from_iterable(edge_rows.values()), dtype=np.int64, count=num_terms)
+        signs = np.fromiter(chain.from_iterable(map(dict.values, edge_rows.values())), dtype=float, count=num_terms)
+        # узлы ветвей в направлении current_direction, проводимость и вклад источников
+        # (при нулевом сопротивлении знаменатель принимается равным 1, как в Edge.form_phi_equation)
+        edge_values = np.array([(edge.current_direction.start_node.index, edge.current_direction.end_node.index,
+                                 edge.resistance_sum, edge.voltage_sum, edge.current_sum) for edge in edges],
+                               dtype=float).reshape(-1, 5)
+        start_indices, end_indices = edge_values[:, 0].astype(np.int64), edge_values[:, 1].astype(np.int64)
+        resistance, voltage, current = edge_values[:, 2], edge_values[:, 3], edge_values[:, 4]
+        g = 1 / np.where(resistance == 0, 1, resistance)
+        c = voltage * g + current
+        # ветвь каждого слагаемого; матрица собирается в формате COO, единица – на диагонали базового узла
+        term_edges = np.repeat(np.arange(len(edges)), counts)
+        values = signs * g[term_edges]
+        A = sp.csr_matrix((
+            np.concatenate([[1], values, -values]),
+            (np.concatenate([[basis_node_index], rows, rows]),
+             np.concatenate([[basis_node_index], start_indices[term_edges], end_indices[term_edges]]))
+        ), shape=(n, n))
+        b = -np.bincount(rows, weights=signs * c[term_edges], minlength=n)
+        metrics.record(nnz=A.nnz)
         return A, b
     
+    # Ток особой ветви выражается через токи остальных ветвей узла: {ветвь: знак}
+    # Цепочки особых ветвей раскрываются с явным стеком: в стеке узел, ветвь, по которой в него пришли,
+    # и знак, с которым ток этой ветви входит в результат
     def find_current_in_specific(self, node, specific_edges, little_edge=None):
-        phis, cs = np.zeros(len(self.nodes)), 0
-        for _, edge in node.children:
-            if edge not in specific_edges:
-                phi, c = edge.form_phi_equation(len(self.nodes))
-            elif edge is not little_edge:
-                other_node = edge.current_direction.end_node if edge.current_direction.start_node is node \
-                    else edge.current_direction.start_node
-                phi, c = self.find_current_in_specific(other_node, specific_edges, edge)
-            if edge is not little_edge:
+        edge_terms = {}
+        expanded = {little_edge}
+        stack = [(node, little_edge, 1)]
+        while stack:
+            node, little_edge, sign = stack.pop()
+            for _, edge in node.children:
+                if edge is little_edge:
+                    continue
                 if edge.current_direction.start_node.label == little_edge.current_direction.start_node.label or \
                     edge.current_direction.end_node.label == little_edge.current_direction.end_node.label:
-                    phis -= phi
-                    cs -= c
+                    edge_sign = -sign
                 else:
-                    phis += phi
-                    cs += c
-        return phis, cs
+                    edge_sign = sign
+                if edge not in specific_edges:
+                    add_terms(edge_terms, {edge: edge_sign})
+                else:
+                    if edge in expanded:
+                        raise Exception('current in a loop of zero-resistance branches is undefined')
+                    expanded.add(edge)
+                    other_node = edge.current_direction.end_node if edge.current_direction.start_node is node \
+                        else edge.current_direction.start_node
+                    stack.append((other_node, edge, edge_sign))
+        return edge_terms
         
     # Метод контурных токов
     # Поиск максимального остовного дерева с использованием алгоритма Прима
     def find_maximum_spanning_tree(self):
         if not self.nodes:
             return []
+        if self.structure is not None and 'spanning_tree' in self.structure:
+            return [self.edges[label] for label in self.structure['spanning_tree']]
         
         max_spanning_tree = []
         start_node = next(iter(self.nodes))
@@ -257,27 +508,61 @@ class CircuitGraph:
                         heapq.heappush(edges_heap, (-next_edge.weight, next_edge))
         return max_spanning_tree
     
-    def find_path_in_tree(self, start_node, end_node, tree_edges):
-        # DFS для поиска пути в дереве
-        def dfs(current_node, target_node, path):
-            if current_node.label == target_node.label:
-                return path
-            
-            for child, edge in current_node.children:
-                if child not in visited and edge in tree_edges:
-                    visited.add(child)
-                    res = dfs(child, target_node, path + [(child, edge)])
-                    if res is not None:
-                        return res
-                    
+    # Корневое представление остовного дерева: для каждого узла – родитель, ветвь к родителю и глубина.
+    # Дерево обходится в ширину с явной очередью, рекурсия не используется
+    def root_spanning_tree(self, tree_edges, root=None):
+        if root is None:
+            root = next(iter(self.nodes.values()))
+        parents, parent_edges, depths = {root: None}, {root: None}, {root: 0}
+        queue = deque([root])
+        while queue:
+            node = queue.popleft()
+            for child, edge in node.children:
+                if edge in tree_edges and child not in parents:
+                    parents[child] = node
+                    parent_edges[child] = edge
+                    depths[child] = depths[node] + 1
+                    queue.append(child)
+        return parents, parent_edges, depths
+
+    # Путь в дереве от start_node к end_node через их наименьшего общего предка:
+    # список пар (узел, ветвь, по которой в него пришли)
+    def find_path_in_tree(self, start_node, end_node, tree_edges, rooted_tree=None):
+        if rooted_tree is None:
+            rooted_tree = self.root_spanning_tree(tree_edges, start_node)
+        parents, parent_edges, depths = rooted_tree
+        if start_node not in depths or end_node not in depths:
             return None
-        
-        visited = set([start_node])
-        return dfs(start_node, end_node, [])
+        up_path, down_path = [], []
+        while depths[start_node] > depths[end_node]:
+            up_path.append((parents[start_node], parent_edges[start_node]))
+            start_node = parents[start_node]
+        while depths[end_node] > depths[start_node]:
+            down_path.append((end_node, parent_edges[end_node]))
+            end_node = parents[end_node]
+        while start_node is not end_node:
+            up_path.append((parents[start_node], parent_edges[start_node]))
+            start_node = parents[start_node]
+            down_path.append((end_node, parent_edges[end_node]))
+            end_node = parents[end_node]
+        return up_path + down_path[::-1]
 
     def build_independent_loops(self):
-        max_spanning_tree = self.find_maximum_spanning_tree()
+        with metrics.stage('spanning_tree'):
+            max_spanning_tree = self.spanning_tree if self.spanning_tree is not None \
+                else self.find_maximum_spanning_tree()
+        self.spanning_tree = max_spanning_tree
+        with metrics.stage('loops'):
+            independent_loops = self.find_independent_loops(max_spanning_tree)
+        metrics.record(loops=len(independent_loops))
+        return independent_loops
+
+    def find_independent_loops(self, max_spanning_tree):
+        if self.structure is not None and 'loops' in self.structure:
+            return [[(self.nodes[node_label], self.edges[edge_label]) for node_label, edge_label in loop]
+                    for loop in self.structure['loops']]
         tree_edges = set(max_spanning_tree)
+        rooted_tree = self.root_spanning_tree(tree_edges)
         visited_edges = set()
 
         independent_loops = []
@@ -285,82 +570,101 @@ class CircuitGraph:
         for node in self.nodes.values():
             for child, edge in node.children:
                 if edge not in tree_edges and edge not in visited_edges:
-                    path = self.find_path_in_tree(node, child, tree_edges)
+                    path = self.find_path_in_tree(node, child, tree_edges, rooted_tree)
                     if path is not None:
                         loop = path + [(node, edge)]
                         independent_loops.append(loop)
                     visited_edges.add(edge)
         return independent_loops
     
-    def form_kirchhoff2_matrix(self, loops):
-        num_loops = len(loops)
-        A = np.zeros((num_loops, num_loops))
-        b = np.zeros(num_loops)
-
-        edges_to_direction_nodes_map = {i: dict((edge, node) for node, edge in loop) for i, loop in enumerate(loops)}
+    # Матрица инцидентности контуров и ветвей B (число ветвей x число контуров):
+    # 1, если контур обходит ветвь в её исходном направлении, -1 – если в противоположном
+    def form_loop_matrix(self, loops):
+        self.edge_indices = {edge: k for k, edge in enumerate(self.edges.values())}
+        rows, cols, signs = [], [], []
         for i, loop in enumerate(loops):
             for direction_node, edge in loop:
+                rows.append(self.edge_indices[edge])
+                cols.append(i)
+                signs.append(1 if direction_node.label == edge.direction.end_node.label else -1)
+        return sp.csr_matrix((signs, (rows, cols)), shape=(len(self.edges), len(loops)), dtype=float)
 
-                A[i][i] += sum(element.resistance for element in edge.elements if isinstance(element, Resistor))
-
-                for element in edge.elements:
-                    if isinstance(element, VoltageSource):
-                        if element.direction.end_node == direction_node.label:
-                            b[i] += element.voltage
-                        else:
-                            b[i] -= element.voltage
-
-            for j, other_loop in enumerate(loops):
-                if i > j:
-                    loop_edges = set(map(lambda x: x[1], loop))
-                    other_loop_edges = set(map(lambda x: x[1], other_loop))
-                    common_edges = loop_edges.intersection(other_loop_edges)
-                    for edge in common_edges:
-                        if (edges_to_direction_nodes_map[i][edge].label == edges_to_direction_nodes_map[j][edge].label):
-                            is_loops_direction_common = 1
-                        else:
-                            is_loops_direction_common = -1
-                        resistance_sum = sum(element.resistance for element in edge.elements if isinstance(element, Resistor))
-                        A[i][j] += resistance_sum * is_loops_direction_common
-                        A[j][i] += resistance_sum * is_loops_direction_common
+    # Уравнения второго закона Кирхгофа для контурных токов: B^T diag(R) B I = B^T E,
+    # R и E – сопротивление и напряжение источников ветвей в исходных направлениях
+    def form_kirchhoff2_matrix(self, loops):
+        self.loop_matrix = self.form_loop_matrix(loops)
+        resistance = np.array([edge.resistance_sum for edge in self.edges.values()], dtype=float)
+        voltage = np.array([edge.voltage_sum for edge in self.edges.values()], dtype=float)
+        A = (self.loop_matrix.T @ sp.diags(resistance) @ self.loop_matrix).tocsc()
+        b = self.loop_matrix.T @ voltage
+        metrics.record(nnz=A.nnz)
         return A, b
-    
-    def calculate_edge_currents(self, loops, loop_currents):
-        edge_currents = {edge.label: 0 for node in self.nodes.values() for _, edge in node.children}
-
-        for i, loop in enumerate(loops):
-            current = loop_currents[i]
-            for direction_node, edge in loop:
-                if direction_node.label == edge.current_direction.end_node.label:
-                    edge_currents[edge.label] += current
-                else:
-                    edge_currents[edge.label] -= current
-
-        visited = set()
-        for node in self.nodes.values():
-            for _, edge in node.children:
-                if edge not in visited:
-                    edge.current_direction = edge.current_direction if edge_currents[edge.label] > 0 \
-                        else Direction(edge.current_direction.end_node, edge.current_direction.start_node)
-                    edge.current_strength = abs(edge_currents[edge.label])
-                    visited.add(edge)
 
-        for edge in visited:
-            print(str(edge))
+    # Токи ветвей – сумма контурных токов: I_edges = B I_loops
+    def calculate_edge_currents(self, loop_currents):
+        edge_currents = self.loop_matrix @ loop_currents
+        for edge, current in zip(self.edges.values(), edge_currents):
+            edge.current_direction = edge.direction if current > 0 \
+                else Direction(edge.direction.end_node, edge.direction.start_node)
+            edge.current_strength = abs(current)
+            logger.debug('%s', edge)
 
     def solve_circuit_using_ohm_law(self):
         resistance_sum = sum(element.resistance for element in self.elements if isinstance(element, Resistor))
         voltage_sum = sum(element.voltage for element in self.elements if isinstance(element, VoltageSource))
         return voltage_sum / resistance_sum
 
-    def solve_circuit_using_mna(self):
-        A, b = self.form_phi_equations()
-        print(f'A: {A}')
-        print(f'b: {b}')
-        L, U = LU_decomposition(A)
-        node_potentials = solve_LU(A, b, L, U)
-        print(f'potentials: {node_potentials}')
+    # solver – 'direct' (LU-разложение), 'cg' (метод сопряжённых градиентов) или None (выбор по размеру цепи);
+    # tol, maxiter, preconditioner ('jacobi' или 'ic') – параметры метода сопряжённых градиентов
+    def solve_circuit_using_mna(self, solver=None, tol=CG_TOLERANCE, maxiter=None, preconditioner='jacobi'):
+        self.solver_options = {'solver': solver, 'tol': tol, 'maxiter': maxiter, 'preconditioner': preconditioner}
+        # потенциалы предыдущего расчёта – начальное приближение итерационного метода
+        previous_potentials = [node.potential for node in self.nodes.values()]
+        with metrics.stage('assembly'):
+            A, b = self.form_phi_equations()
+        logger.debug('A: %s', A)
+        logger.debug('b: %s', b)
+        # матрица симметрична и положительно определена только для цепи без особых ветвей
+        has_specific_edges = any(edge.is_specific() for edge in self.edges.values())
+        if solver is None:
+            solver = 'cg' if len(self.nodes) > ITERATIVE_THRESHOLD and not has_specific_edges else 'direct'
+        if solver == 'cg':
+            if has_specific_edges:
+                raise Exception('conjugate gradient requires a circuit without branches of zero resistance')
+            self.factorization = None
+            with metrics.stage('solve'):
+                node_potentials = self.solve_mna_iteratively(A, b, previous_potentials, tol, maxiter, preconditioner)
+        elif solver == 'direct':
+            # факторизация сохраняется для последующих изменений номиналов элементов
+            with metrics.stage('factorization'):
+                self.factorization = UpdatableFactorization(A, column_order=self.restore_column_order())
+            self.solver_info = None
+            with metrics.stage('solve'):
+                node_potentials = self.factorization.solve(b)
+        else:
+            raise Exception(f'unknown solver "{solver}"')
+        metrics.record(solver=solver)
+        self.b = b
+        logger.debug('potentials: %s', node_potentials)
+        with metrics.stage('currents'):
+            self.calculate_currents_from_potentials(node_potentials)
+
+    def solve_mna_iteratively(self, A, b, previous_potentials, tol, maxiter, preconditioner):
+        # Строки уравнений узлов – взятые с обратным знаком строки матрицы проводимостей:
+        # без уравнения и потенциала базового узла получается симметричная положительно определённая система
+        keep = np.flatnonzero(np.arange(len(self.nodes)) != self.basis_node_index)
+        x0 = None
+        if all(potential is not None for potential in previous_potentials):
+            previous_potentials = np.array(previous_potentials, dtype=float)
+            x0 = (previous_potentials - previous_potentials[self.basis_node_index])[keep]
+        x, self.solver_info = solve_iteratively(-A[keep][:, keep], -b[keep], x0, tol, maxiter, preconditioner)
+        self.solver_info['name'] = 'conjugate gradient'
+        node_potentials = np.zeros(len(self.nodes))
+        node_potentials[keep] = x
+        return node_potentials
 
+    def calculate_currents_from_potentials(self, node_potentials):
+        node_potentials = self.shift_to_basis_node(node_potentials, self.basis_node_index)
         for node in self.nodes.values():
             node.potential = node_potentials[node.index]
 
@@ -373,56 +677,729 @@ class CircuitGraph:
 
     def solve_circuit_using_mca(self):
         independent_loops = self.build_independent_loops()
-        A, b = self.form_kirchhoff2_matrix(independent_loops)
-        print(f'A: {A}')
-        print(f'b: {b}')
-        L, U = LU_decomposition(A)
-        loop_currents = solve_LU(A, b, L, U)
-        print(f'loop currents: {loop_currents}')
-        self.calculate_edge_currents(independent_loops, loop_currents)
-
-    def solve_circuit(self):
-        # Если число узлов меньше числа независимых контуров
-        # эффективнее использовать ММУП, иначе – МКТ
-        # частный случай – один контур => закон Ома
-        loop_count = self.num_edges - self.num_nodes + 1
-        if loop_count == 1:
-            current = self.solve_circuit_using_ohm_law()
-            analyzing_method = "Ohm's law" 
-        elif self.num_nodes < self.num_edges - self.num_nodes + 1:
-            self.solve_circuit_using_mna()
-            analyzing_method = 'modified nodal analysis'
+        with metrics.stage('assembly'):
+            A, b = self.form_kirchhoff2_matrix(independent_loops)
+        logger.debug('A: %s', A)
+        logger.debug('b: %s', b)
+        self.loops = independent_loops
+        with metrics.stage('factorization'):
+            self.factorization = UpdatableFactorization(A, column_order=self.restore_column_order())
+        self.b = b
+        with metrics.stage('solve'):
+            loop_currents = self.factorization.solve(b)
+        logger.debug('loop currents: %s', loop_currents)
+        with metrics.stage('currents'):
+            self.calculate_edge_currents(loop_currents)
+
+    def has_nonlinear_elements(self):
+        return any(edge.nonlinear_elements for edge in self.edges.values())
+
+    # Рабочая точка цепи с диодами и нелинейными резисторами: метод Ньютона на уравнениях узлов
+    # (см. newton). Уравнения линейных ветвей собираются один раз, как в form_phi_equations;
+    # modified, source_stepping, tol, max_iterations – параметры newton.solve_nonlinear.
+    # Начальное приближение – потенциалы предыдущего расчёта, если они есть
+    def solve_circuit_using_newton(self, modified=True, source_stepping=True, tol=newton.NEWTON_TOLERANCE,
+                                   max_iterations=newton.MAX_ITERATIONS):
+        previous_potentials = [node.potential for node in self.nodes.values()]
+        for edge in self.edges.values():
+            if edge.nonlinear_elements and len(edge.elements) > 1:
+                raise Exception(f'edge "{edge.label}": a nonlinear element must be the only element of the edge')
+            edge.reset_current_strength()
+        with metrics.stage('assembly'):
+            self.basis_node_index, self.edge_rows = self.find_phi_equation_terms()
+            n = len(self.nodes)
+            rows, cols, values = [self.basis_node_index], [self.basis_node_index], [1]
+            b = np.zeros(n)
+            elements = []
+            for edge, edge_rows in self.edge_rows.items():
+                if edge.nonlinear_elements:
+                    element = edge.nonlinear_elements[0]
+                    elements.append((element, edge.source_sign(element), edge.direction.start_node.index,
+                                     edge.direction.end_node.index, edge_rows))
+                    continue
+                phi, c = edge.form_phi_equation()
+                for row, sign in edge_rows.items():
+                    for index, coefficient in phi.items():
+                        rows.append(row)
+                        cols.append(index)
+                        values.append(sign * coefficient)
+                    b[row] -= sign * c
+            system = newton.NonlinearSystem(sp.csr_matrix((values, (rows, cols)), shape=(n, n)), b, elements)
+        metrics.record(nnz=system.A.nnz)
+        x0 = None
+        if all(potential is not None for potential in previous_potentials):
+            x0 = np.array(previous_potentials, dtype=float)
+            x0 -= x0[self.basis_node_index]
+        node_potentials, self.solver_info = newton.solve_nonlinear(system, x0, modified, source_stepping, tol,
+                                                                   max_iterations)
+        self.factorization = None
+        logger.debug('potentials: %s', node_potentials)
+        with metrics.stage('currents'):
+            self.calculate_currents_from_potentials(node_potentials)
+
+    # Изменение номинала одного элемента ветви без повторной сборки и факторизации матрицы:
+    # изменение проводимости ветви – поправка ранга 1 к матрице, источников – только к правой части
+    def find_element(self, edge_label, element_type, element_index=0):
+        if edge_label not in self.edges:
+            raise Exception(f'edge "{edge_label}" is not an edge of the graph')
+        edge = self.edges[edge_label]
+        elements = [element for element in edge.elements if isinstance(element, element_type)]
+        if element_index >= len(elements):
+            raise Exception(f'edge "{edge_label}" has no {element_type.__name__} with index {element_index}')
+        return edge, elements[element_index]
+
+    def update_element(self, edge_label, element_type, value, element_index=0):
+        edge, element = self.find_element(edge_label, element_type, element_index)
+        for other_edge in self.edges.values():
+            other_edge.reset_current_strength()
+        analyzing_method = getattr(self, 'analyzing_method', None)
+        if analyzing_method == 'block decomposition':
+            return self.update_block_element(edge, element_type, value, element_index)
+        if analyzing_method == 'modified nodal analysis':
+            old_phi, old_c = edge.form_phi_equation()
+        elif analyzing_method == 'mesh current analysis':
+            old_resistance, old_voltage = edge.resistance_sum, edge.voltage_sum
+
+        setattr(element, ELEMENT_VALUE_ATTRIBUTES[element_type], value)
+        edge.voltage_sum, edge.resistance_sum, edge.current_sum = edge.calculate_element_contribution()
+
+        if analyzing_method == 'modified nodal analysis' and self.factorization is None:
+            # итерационный расчёт повторяется с начальным приближением из предыдущего решения
+            self.solve_circuit_using_mna(**self.solver_options)
+        elif analyzing_method == 'modified nodal analysis':
+            new_phi, new_c = edge.form_phi_equation()
+            rows = self.edge_rows.get(edge, {})
+            u, v = np.zeros(len(self.nodes)), np.zeros(len(self.nodes))
+            for row, sign in rows.items():
+                u[row] = sign
+                self.b[row] -= sign * (new_c - old_c)
+            for index, coefficient in old_phi.items():
+                v[index] -= coefficient
+            for index, coefficient in new_phi.items():
+                v[index] += coefficient
+            if u.any() and v.any():
+                self.factorization.update(u, v)
+            self.calculate_currents_from_potentials(self.factorization.solve(self.b))
+        elif analyzing_method == 'mesh current analysis':
+            u = self.loop_matrix[self.edge_indices[edge]].toarray().ravel()
+            self.b += (edge.voltage_sum - old_voltage) * u
+            if u.any() and edge.resistance_sum != old_resistance:
+                self.factorization.update((edge.resistance_sum - old_resistance) * u, u)
+            self.calculate_edge_currents(self.factorization.solve(self.b))
+        elif self.has_capacitors():
+            # цепь с конденсаторами в режиме постоянного тока не рассчитывается (см. check_dc_elements):
+            # номинал сохраняется для следующего AC-анализа
+            return {'method': 'element update', 'edge': int(edge.label), 'value': value}
+        else:
+            return self.solve_circuit()
+        return self.form_result(analyzing_method)
+
+    # Пакетный расчёт вариантов цепи с одной топологией методом узловых потенциалов
+    # parameters – список (метка ветви, тип элемента, номер элемента этого типа в ветви),
+    # values – матрица номиналов (число вариантов x число параметров)
+    # Возвращает матрицу токов (число вариантов x число ветвей) в исходных направлениях ветвей self.edges
+    def sweep(self, parameters, values):
+        if not self.edges:
+            raise Exception('sweep requires a circuit graph with nodes and edges')
+        if self.has_nonlinear_elements():
+            raise Exception('sweep requires a circuit without nonlinear elements')
+        self.check_dc_elements()
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        if values.shape[1] != len(parameters):
+            raise Exception(f'expected {len(parameters)} values per variant, got {values.shape[1]}')
+        edges = list(self.edges.values())
+        edge_indices = {edge: i for i, edge in enumerate(edges)}
+        n, m = len(self.nodes), len(edges)
+
+        # номиналы ветвей во всех вариантах
+        base_resistance = np.array([edge.resistance_sum for edge in edges], dtype=float)
+        resistance = np.tile(base_resistance, (len(values), 1))
+        voltage = np.tile(np.array([edge.voltage_sum for edge in edges], dtype=float), (len(values), 1))
+        current = np.tile(np.array([edge.current_sum for edge in edges], dtype=float), (len(values), 1))
+        for j, (edge_label, element_type, element_index) in enumerate(parameters):
+            edge, element = self.find_element(edge_label, element_type, element_index)
+            k = edge_indices[edge]
+            if element_type is Resistor:
+                resistance[:, k] += values[:, j] - element.resistance
+            elif element_type is VoltageSource:
+                voltage[:, k] += edge.source_sign(element) * (values[:, j] - element.voltage)
+            elif element_type is CurrentSource:
+                current[:, k] += edge.source_sign(element) * (values[:, j] - element.current)
+            else:
+                raise Exception(f'sweep does not support {element_type.__name__} parameters')
+        if np.any((resistance == 0) != (base_resistance == 0)):
+            raise Exception('sweep cannot change which edges have zero resistance')
+        conductance = 1 / np.where(resistance == 0, 1, resistance)
+
+        # структура уравнений узлов общая для всех вариантов: элемент (row, col) матрицы A – сумма вкладов
+        # sign * g проводимостей ветвей (stamp), b = -U c
+        for edge in edges:
+            edge.reset_current_strength()
+        self.form_phi_equations()
+        stamp_rows, stamp_cols, stamp_edges, stamp_signs = [], [], [], []
+        u_rows, u_cols, u_values = [], [], []
+        for edge, rows in self.edge_rows.items():
+            k = edge_indices[edge]
+            start_index, end_index = edge.direction.start_node.index, edge.direction.end_node.index
+            for row, sign in rows.items():
+                stamp_rows.extend([row, row])
+                stamp_cols.extend([start_index, end_index])
+                stamp_edges.extend([k, k])
+                stamp_signs.extend([sign, -sign])
+                u_rows.append(row)
+                u_cols.append(k)
+                u_values.append(sign)
+        stamp_rows, stamp_cols = np.array(stamp_rows, dtype=np.int64), np.array(stamp_cols, dtype=np.int64)
+        stamp_edges, stamp_signs = np.array(stamp_edges, dtype=np.int64), np.array(stamp_signs, dtype=float)
+        U = sp.csr_matrix((u_values, (u_rows, u_cols)), shape=(n, m))
+        b = -np.asarray(U @ (voltage * conductance + current).T)
+        # единицы на диагонали: строка базового узла и заземление остальных компонент связности
+        grounded = np.array([self.basis_node_index, *self.find_floating_nodes(edges)], dtype=np.int64)
+
+        def assemble(variant_conductance):
+            data = np.concatenate([stamp_signs * variant_conductance[stamp_edges], np.ones(len(grounded))])
+            return sp.csc_matrix((data, (np.concatenate([stamp_rows, grounded]),
+                                         np.concatenate([stamp_cols, grounded]))), shape=(n, n))
+
+        if (conductance == conductance[0]).all():
+            # меняются только источники: матрица раскладывается один раз, варианты – столбцы правой части
+            factorization = factorize(assemble(conductance[0]), column_order=self.restore_column_order())
+            potentials = np.asarray(factorization.solve(b)).T
+        elif n <= DENSE_THRESHOLD:
+            # небольшие системы всех вариантов собираются в плотный пакет и решаются одним вызовом LAPACK
+            S = sp.csr_matrix((stamp_signs, (stamp_rows * n + stamp_cols, stamp_edges)), shape=(n * n, m))
+            potentials = np.empty((len(values), n))
+            chunk_size = max(1, SWEEP_CHUNK_ELEMENTS // (n * n))
+            for chunk_start in range(0, len(values), chunk_size):
+                chunk = slice(chunk_start, chunk_start + chunk_size)
+                A = np.asarray((S @ conductance[chunk].T).T).reshape(-1, n, n)
+                A[:, grounded, grounded] += 1
+                try:
+                    potentials[chunk] = np.linalg.solve(A, b[:, chunk].T[..., None])[..., 0]
+                except np.linalg.LinAlgError as e:
+                    raise SingularMatrixError(f'matrix is singular: {e}') from e
+        else:
+            # большие системы раскладываются разреженным LU-разложением: структура матриц вариантов одинакова,
+            # поэтому упорядочивание столбцов находится один раз и используется для всех вариантов
+            potentials = np.empty((len(values), n))
+            column_order = self.restore_column_order()
+            for i in range(len(values)):
+                factorization = SparseFactorization(assemble(conductance[i]), column_order=column_order)
+                column_order = factorization.column_order
+                potentials[i] = factorization.solve(b[:, i])
+        if not np.all(np.isfinite(potentials)):
+            raise SingularMatrixError('matrix is singular: solution is not finite')
+
+        start_indices = np.array([edge.direction.start_node.index for edge in edges])
+        end_indices = np.array([edge.direction.end_node.index for edge in edges])
+        currents = conductance * (potentials[:, start_indices] - potentials[:, end_indices] + voltage) + current
+
+        specific_edges = set(edge for edge in edges if edge.resistance_sum == 0)
+        self.calculate_specific_currents(edges, currents, current, specific_edges)
+        return currents
+
+    # Токи ветвей без сопротивления находятся из первого закона Кирхгофа для конечного узла ветви:
+    # currents – матрица токов (число вариантов x число ветвей edges), столбцы specific_edges заполняются,
+    # current – токи источников тока ветвей
+    def calculate_specific_currents(self, edges, currents, current, specific_edges):
+        edge_indices = {edge: i for i, edge in enumerate(edges)}
+        calculated = set(edge for edge in edges if edge not in specific_edges)
+        def calculate_specific_current(edge):
+            k = edge_indices[edge]
+            currents[:, k] = current[:, k]
+            for _, other_edge in edge.direction.end_node.children:
+                if other_edge is not edge:
+                    if other_edge.direction.end_node is edge.direction.end_node:
+                        currents[:, k] -= currents[:, edge_indices[other_edge]]
+                    else:
+                        currents[:, k] += currents[:, edge_indices[other_edge]]
+            calculated.add(edge)
+        # зависимости между ветвями без сопротивления обходятся с явным стеком, как в Edge.calculate_current_strength
+        for edge in edges:
+            stack = [edge]
+            in_progress = set()
+            while stack:
+                specific_edge = stack[-1]
+                if specific_edge in calculated:
+                    stack.pop()
+                    continue
+                dependencies = [other_edge for _, other_edge in specific_edge.direction.end_node.children
+                                if other_edge is not specific_edge and other_edge not in calculated]
+                if dependencies and specific_edge not in in_progress:
+                    in_progress.add(specific_edge)
+                    for other_edge in dependencies:
+                        if other_edge in in_progress:
+                            raise Exception('current in a loop of zero-resistance branches is undefined')
+                        stack.append(other_edge)
+                else:
+                    calculate_specific_current(specific_edge)
+                    stack.pop()
+
+    # Чувствительность выходов к номиналам методом сопряжённой системы: dy/dp = ∂y/∂p - λ^T ∂F/∂p, A^T λ = ∂y/∂x –
+    # одно решение для всех выходов вместо расчёта цепи на каждый параметр.
+    # outputs – ('current', метка ветви) или ('potential', метка узла[, метка опорного узла]);
+    # parameters – (метка ветви, тип элемента, номер элемента), как в sweep, по умолчанию – все резисторы и источники.
+    # Производная по сопротивлению ветви с нулевым суммарным сопротивлением не определена (nan)
+    # Возвращает матрицу производных (число выходов x число параметров)
+    def sensitivity(self, outputs, parameters=None):
+        if not self.edges:
+            raise Exception('sensitivity requires a circuit graph with nodes and edges')
+        if self.has_nonlinear_elements():
+            raise Exception('sensitivity requires a circuit without nonlinear elements')
+        if getattr(self, 'analyzing_method', None) is None:
+            self.analyze_circuit()
+        parameters = self.find_sensitivity_parameters() if parameters is None else parameters
+        edges = list(self.edges.values())
+        edge_indices = {edge: k for k, edge in enumerate(edges)}
+        n, m = len(self.nodes), len(edges)
+
+        if self.analyzing_method == 'modified nodal analysis' and self.factorization is not None:
+            factorization, basis_node_index, edge_rows = self.factorization, self.basis_node_index, self.edge_rows
+            x = np.array([node.potential for node in self.nodes.values()], dtype=float)
+            x -= x[basis_node_index]
+        else:
+            if decomposition.find_biconnected_blocks(self)[1] > 1:
+                raise Exception('sensitivity requires a connected circuit')
+            with metrics.stage('assembly'):
+                basis_node_index, edge_rows, A, b = self.form_sensitivity_equations()
+            with metrics.stage('factorization'):
+                factorization = factorize(A)
+            with metrics.stage('solve'):
+                x = factorization.solve(b)
+
+        # напряжения ветвей с учётом источников напряжения и проводимости в исходных направлениях ветвей
+        resistance = np.array([edge.resistance_sum for edge in edges], dtype=float)
+        conductance = 1 / np.where(resistance == 0, 1, resistance)
+        start_indices = np.array([edge.direction.start_node.index for edge in edges])
+        end_indices = np.array([edge.direction.end_node.index for edge in edges])
+        voltage = x[start_indices] - x[end_indices] + np.array([edge.voltage_sum for edge in edges], dtype=float)
+
+        # производная слагаемого ветви f = g (phi_s - phi_t + E) + J уравнений узлов по каждому параметру
+        parameter_edges = np.empty(len(parameters), dtype=np.int64)
+        derivatives = np.empty(len(parameters))
+        # параметр – источник тока: знак источника в ветви, иначе 0
+        current_signs = np.zeros(len(parameters))
+        for j, (edge_label, element_type, element_index) in enumerate(parameters):
+            edge, element = self.find_element(edge_label, element_type, element_index)
+            k = edge_indices[edge]
+            parameter_edges[j] = k
+            if element_type is Resistor:
+                derivatives[j] = -voltage[k] / resistance[k] ** 2 if resistance[k] != 0 else np.nan
+            elif element_type is VoltageSource:
+                derivatives[j] = conductance[k] * edge.source_sign(element)
+            elif element_type is CurrentSource:
+                derivatives[j] = current_signs[j] = edge.source_sign(element)
+            else:
+                raise Exception(f'sensitivity does not support {element_type.__name__} parameters')
+
+        # производные выходов по потенциалам (столбцы) и по параметрам при неизменных потенциалах
+        gradients = np.zeros((len(outputs), len(parameters)))
+        C = np.zeros((n, len(outputs)))
+        for i, output in enumerate(outputs):
+            if output[0] == 'potential':
+                node_label = output[1]
+                reference = output[2] if len(output) > 2 and output[2] is not None else self.basis_node
+                for label in (node_label, reference):
+                    if label is not None and label not in self.nodes:
+                        raise Exception(f'node "{label}" is not a node of the graph')
+                C[self.nodes[node_label].index, i] += 1
+                C[self.nodes[reference].index if reference is not None else basis_node_index, i] -= 1
+            elif output[0] == 'current':
+                if output[1] not in self.edges:
+                    raise Exception(f'edge "{output[1]}" is not an edge of the graph')
+                for edge, weight in self.find_current_terms(self.edges[output[1]]).items():
+                    k = edge_indices[edge]
+                    # ветвь без сопротивления входит в сумму только током своих источников тока
+                    if resistance[k] != 0:
+                        C[start_indices[k], i] += weight * conductance[k]
+                        C[end_indices[k], i] -= weight * conductance[k]
+                        gradients[i] += weight * np.where(parameter_edges == k, derivatives, 0)
+                    else:
+                        gradients[i] += weight * np.where(parameter_edges == k, current_signs, 0)
+            else:
+                raise Exception(f'unknown sensitivity output "{output[0]}"')
+
+        # λ^T ∂F/∂p = (U^T λ)_k df_k/dp, U – строки уравнений, в которые входит слагаемое ветви k
+        u_rows, u_cols, u_values = [], [], []
+        for edge, rows in edge_rows.items():
+            for row, sign in rows.items():
+                u_rows.append(row)
+                u_cols.append(edge_indices[edge])
+                u_values.append(sign)
+        U = sp.csr_matrix((u_values, (u_rows, u_cols)), shape=(n, m))
+        with metrics.stage('sensitivity'):
+            adjoint = factorization.solve_transposed(C)
+        gradients -= (U.T @ adjoint)[parameter_edges].T * derivatives
+        return gradients
+
+    # Параметры чувствительности по умолчанию: все резисторы и источники цепи
+    def find_sensitivity_parameters(self):
+        parameters = []
+        for edge in self.edges.values():
+            for element_type in (Resistor, VoltageSource, CurrentSource):
+                count = sum(1 for element in edge.elements if isinstance(element, element_type))
+                parameters.extend((edge.label, element_type, element_index) for element_index in range(count))
+        return parameters
+
+    # Уравнения узлов в исходных направлениях ветвей для цепи, рассчитанной другим методом:
+    # направления токов, найденные расчётом, на время составления уравнений не учитываются
+    def form_sensitivity_equations(self):
+        current_directions = [edge.current_direction for edge in self.edges.values()]
+        for edge in self.edges.values():
+            edge.current_direction = edge.direction
+        try:
+            basis_node_index, edge_rows = self.find_phi_equation_terms()
+            A, b = self.assemble_phi_equations(basis_node_index, edge_rows)
+        finally:
+            for edge, current_direction in zip(self.edges.values(), current_directions):
+                edge.current_direction = current_direction
+        return basis_node_index, edge_rows, A, b
+
+    # Ток ветви в её исходном направлении как сумма слагаемых ветвей уравнений узлов: {ветвь: коэффициент}.
+    # Ток ветви без сопротивления выражается по первому закону Кирхгофа для её конечного узла,
+    # как в calculate_specific_currents
+    def find_current_terms(self, edge):
+        terms = {}
+        expanded = set()
+        stack = [(edge, 1)]
+        while stack:
+            edge, weight = stack.pop()
+            add_terms(terms, {edge: weight})
+            if edge.resistance_sum != 0:
+                continue
+            if edge in expanded:
+                raise Exception('current in a loop of zero-resistance branches is undefined')
+            expanded.add(edge)
+            for _, other_edge in edge.direction.end_node.children:
+                if other_edge is not edge:
+                    stack.append((other_edge, -weight if other_edge.direction.end_node is edge.direction.end_node
+                                  else weight))
+        return terms
+
+    # Ветвь с конденсатором в режиме постоянного тока разомкнута: такие ветви рассчитываются
+    # в компактном представлении цепи (CompactCircuit) или AC-анализом
+    def has_capacitors(self):
+        return any(isinstance(element, Capacitor) for edge in self.edges.values() for element in edge.elements)
+
+    def check_dc_elements(self):
+        for edge in self.edges.values():
+            if any(isinstance(element, Capacitor) for element in edge.elements):
+                raise Exception(f'edge "{edge.label}" has a capacitor: DC analysis requires the compact circuit '
+                                f'representation')
+
+    # AC-анализ малого сигнала на частотах frequencies (Гц): номиналы источников – комплексные амплитуды
+    # с нулевой фазой, сопротивление ветви Z = R + jωL + 1 / (jωC).
+    # Уравнения узлов составляются как в form_phi_equations, но с комплексными проводимостями ветвей;
+    # структура матрицы общая для всех частот, упорядочивание столбцов разреженного LU-разложения ищется один раз.
+    # Частоты делятся на блоки, которые решаются в пуле из max_workers потоков
+    # Возвращает комплексные матрицы потенциалов узлов (число частот x число узлов self.nodes)
+    # и токов ветвей в исходных направлениях (число частот x число ветвей self.edges)
+    def ac_sweep(self, frequencies, max_workers=None):
+        if not self.edges:
+            raise Exception('AC analysis requires a circuit graph with nodes and edges')
+        if self.has_nonlinear_elements():
+            raise Exception('AC analysis requires a circuit without nonlinear elements')
+        frequencies = np.atleast_1d(np.asarray(frequencies, dtype=float))
+        if frequencies.ndim != 1 or np.any(frequencies <= 0):
+            raise Exception('AC analysis requires a list of positive frequencies')
+        edges = list(self.edges.values())
+        edge_indices = {edge: i for i, edge in enumerate(edges)}
+        n, m = len(self.nodes), len(edges)
+        resistance = np.array([edge.resistance_sum for edge in edges], dtype=float)
+        voltage = np.array([edge.voltage_sum for edge in edges], dtype=float)
+        current = np.array([edge.current_sum for edge in edges], dtype=float)
+        inductance = np.array([sum(element.inductance for element in edge.elements if isinstance(element, Inductor))
+                               for edge in edges], dtype=float)
+        elastance = np.array([sum(1 / element.capacitance for element in edge.elements
+                                  if isinstance(element, Capacitor)) for edge in edges], dtype=float)
+        # особые ветви – ветви с нулевым сопротивлением на любой частоте
+        is_specific = (resistance == 0) & (inductance == 0) & (elastance == 0)
+        for edge in edges:
+            edge.reset_current_strength()
+        basis_node_index, edge_rows = self.find_phi_equation_terms([edges[k] for k in np.flatnonzero(is_specific)])
+
+        # элементы матрицы (в порядке CSC) – комбинации проводимостей ветвей: data = P y, b = -U (y E + J);
+        # последний столбец P – единица на диагонали базового узла
+        stamp_keys = [basis_node_index * n + basis_node_index]
+        stamp_edges, stamp_signs = [m], [1]
+        u_rows, u_cols, u_values = [], [], []
+        for edge, rows in edge_rows.items():
+            k = edge_indices[edge]
+            start_index, end_index = edge.direction.start_node.index, edge.direction.end_node.index
+            for row, sign in rows.items():
+                stamp_keys.extend([start_index * n + row, end_index * n + row])
+                stamp_edges.extend([k, k])
+                stamp_signs.extend([sign, -sign])
+                u_rows.append(row)
+                u_cols.append(k)
+                u_values.append(sign)
+        keys, positions = np.unique(stamp_keys, return_inverse=True)
+        indices, columns = keys % n, keys // n
+        indptr = np.searchsorted(columns, np.arange(n + 1))
+        P = sp.csr_matrix((stamp_signs, (positions, stamp_edges)), shape=(len(keys), m + 1))
+        U = sp.csr_matrix((u_values, (u_rows, u_cols)), shape=(n, m))
+
+        def find_admittance(chunk_frequencies):
+            omega = 2 * np.pi * chunk_frequencies[:, None]
+            with np.errstate(divide='ignore'):
+                impedance = resistance + 1j * omega * inductance + elastance / (1j * omega)
+                admittance = 1 / np.where(is_specific, 1, impedance)
+            return admittance
+
+        def solve_chunk(chunk_frequencies):
+            admittance = find_admittance(chunk_frequencies)
+            data = (P @ np.hstack([admittance, np.ones((len(chunk_frequencies), 1))]).T).T
+            b = -(U @ (admittance * voltage + current).T).T
+            if n <= DENSE_THRESHOLD:
+                A = np.zeros((len(chunk_frequencies), n * n), dtype=complex)
+                A[:, indices * n + columns] = data
+                try:
+                    return np.linalg.solve(A.reshape(-1, n, n), b[..., None])[..., 0]
+                except np.linalg.LinAlgError as e:
+                    raise SingularMatrixError(f'matrix is singular: {e}') from e
+            return np.array([
+                SparseFactorization(sp.csc_matrix((data_i, indices, indptr), shape=(n, n)),
+                                    column_order=column_order).solve(b_i)
+                for data_i, b_i in zip(data, b)
+            ])
+
+        column_order = None
+        if n > DENSE_THRESHOLD:
+            # символьный этап (поиск упорядочивания столбцов) выполняется только для первой частоты
+            data = P @ np.append(find_admittance(frequencies[:1])[0], 1)
+            column_order = SparseFactorization(sp.csc_matrix((data, indices, indptr), shape=(n, n))).column_order
+        max_workers = max_workers or os.cpu_count() or 1
+        chunk_size = len(frequencies) // max_workers + 1
+        if n <= DENSE_THRESHOLD:
+            chunk_size = min(chunk_size, max(1, SWEEP_CHUNK_ELEMENTS // (n * n)))
+        chunks = [frequencies[i:i + chunk_size] for i in range(0, len(frequencies), chunk_size)]
+        if len(chunks) == 1 or max_workers == 1:
+            potentials = np.concatenate([solve_chunk(chunk) for chunk in chunks])
         else:
-            self.solve_circuit_using_mca()
-            analyzing_method = 'mesh current analysis'
+            # NumPy и SciPy освобождают GIL на время факторизации, поэтому блоки решаются параллельно
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                potentials = np.concatenate(list(executor.map(solve_chunk, chunks)))
+        if not np.all(np.isfinite(potentials)):
+            raise SingularMatrixError('matrix is singular: solution is not finite')
+        potentials = self.shift_to_basis_node(potentials, basis_node_index)
+
+        admittance = find_admittance(frequencies)
+        start_indices = np.array([edge.direction.start_node.index for edge in edges])
+        end_indices = np.array([edge.direction.end_node.index for edge in edges])
+        currents = admittance * (potentials[:, start_indices] - potentials[:, end_indices] + voltage) + current
+        self.calculate_specific_currents(edges, currents, np.broadcast_to(current, currents.shape),
+                                         set(edges[k] for k in np.flatnonzero(is_specific)))
+        return potentials, currents
+
+    # Узлы, заземляемые при пакетном расчёте несвязной цепи: по одному узлу в каждой компоненте связности,
+    # кроме компоненты базового узла, – по возможности без ветвей без сопротивления.
+    # Уравнения узлов такой компоненты в сумме дают ноль, поэтому единица на диагонали строки её узла
+    # не меняет решения (потенциал узла становится нулевым), но делает матрицу невырожденной
+    def find_floating_nodes(self, edges):
+        n = len(self.nodes)
+        start_indices = [edge.direction.start_node.index for edge in edges]
+        end_indices = [edge.direction.end_node.index for edge in edges]
+        adjacency = sp.csr_matrix((np.ones(len(edges)), (start_indices, end_indices)), shape=(n, n))
+        _, labels = csgraph.connected_components(adjacency, directed=False)
+        specific_nodes = set()
+        for edge in edges:
+            if edge.resistance_sum == 0:
+                specific_nodes.update((edge.direction.start_node.index, edge.direction.end_node.index))
+        floating = {}
+        for index in range(n):
+            label = labels[index]
+            if label == labels[self.basis_node_index]:
+                continue
+            if label not in floating or floating[label] in specific_nodes and index not in specific_nodes:
+                floating[label] = index
+        return sorted(floating.values())
 
-        # Подготовка данных к отправке клиенту
+    # solver_options передаются методу узловых потенциалов (см. solve_circuit_using_mna)
+    def solve_circuit(self, **solver_options):
+        analyzing_method = self.analyze_circuit(**solver_options)
         if analyzing_method == "Ohm's law":
             result = {
                 'method': "Ohm's law",
-                'current': current
+                'current': self.ohm_law_current
             }
             return result
-        elif analyzing_method == 'modified nodal analysis':
+        with metrics.stage('result'):
+            return self.form_result(analyzing_method)
+
+    # Каждый блок рассчитывается как отдельная цепь, потенциалы блоков согласуются по шарнирным узлам.
+    # Графы блоков, рассчитанных в этом процессе, сохраняют факторизацию для изменения номиналов
+    def solve_circuit_by_blocks(self, blocks, max_workers=None, solver_options=None):
+        solver_options = solver_options or {}
+        bridges = [block[0] for block in blocks if decomposition.is_bridge(block)]
+        with metrics.stage('decomposition'):
+            self.blocks = [decomposition.form_block_graph(self, block) for block in blocks
+                           if not decomposition.is_bridge(block)]
+        self.block_solutions, self.block_solved = decomposition.solve_blocks(self.blocks, solver_options, max_workers)
+        self.block_solutions += [decomposition.solve_bridge(edge) for edge in bridges]
+        # номер решения блока для каждой ветви: блоки с контурами, затем мосты
+        self.block_indices = {edge_label: i for i, block_graph in enumerate(self.blocks)
+                              for edge_label in block_graph.edges}
+        self.block_indices.update({edge.label: len(self.blocks) + i for i, edge in enumerate(bridges)})
+        self.assign_block_solutions()
+        metrics.record(blocks=len(blocks), nodes=self.num_nodes, edges=self.num_edges)
+
+    def assign_block_solutions(self):
+        with metrics.stage('stitching'):
+            for _, currents, _ in self.block_solutions:
+                for edge_label, current in currents.items():
+                    edge = self.edges[edge_label]
+                    edge.current_direction = edge.direction if current >= 0 \
+                        else Direction(edge.direction.end_node, edge.direction.start_node)
+                    edge.current_strength = abs(current)
+            potentials = decomposition.stitch_potentials([potentials for _, _, potentials in self.block_solutions],
+                                                         self.basis_node)
+            for node in self.nodes.values():
+                # изолированный узел не входит ни в один блок
+                node.potential = potentials.get(node.label, 0.0)
+
+    # Изменение номинала элемента цепи, рассчитанной по блокам: пересчитывается только блок ветви элемента
+    def update_block_element(self, edge, element_type, value, element_index=0):
+        i = self.block_indices[edge.label]
+        if i < len(self.blocks):
+            block_graph = self.blocks[i]
+            # элементы ветвей общие с графом блока; блок, рассчитанный в пуле процессов, рассчитывается заново
+            block_graph.update_element(edge.label, element_type, value, element_index)
+            self.block_solved[i] = True
+            self.block_solutions[i] = decomposition.read_block_solution(block_graph, block_graph.analyzing_method)
+        else:
+            _, element = self.find_element(edge.label, element_type, element_index)
+            setattr(element, ELEMENT_VALUE_ATTRIBUTES[element_type], value)
+        edge.voltage_sum, edge.resistance_sum, edge.current_sum = edge.calculate_element_contribution()
+        if i >= len(self.blocks):
+            self.block_solutions[i] = decomposition.solve_bridge(edge)
+        self.assign_block_solutions()
+        return self.form_result(self.analyzing_method)
+
+    # Метод расчёта выбирается по оценке стоимости (см. method_selector); при известной структуре решения
+    # цепи с той же топологией используется метод, для которого эта структура построена
+    def select_method(self, solver=None):
+        if self.structure is not None and self.structure.get('selected_method') is not None:
+            return self.structure['selected_method']
+        with metrics.stage('selection'):
+            method, self.method_selection = get_cost_model().select(self, solver)
+        return method
+
+    # Расчёт цепи без подготовки результата; возвращает название метода расчёта.
+    # decompose – расчёт несвязной цепи или цепи из нескольких блоков по блокам (см. decomposition),
+    # max_workers – число процессов для расчёта блоков
+    def analyze_circuit(self, decompose=True, max_workers=None, **solver_options):
+        self.check_dc_elements()
+        # Метод выбирается по оценке стоимости (см. select_method);
+        # частный случай – цепь из элементов без узлов => закон Ома
+        self.method_selection = None
+        # цепь с нелинейными элементами рассчитывается методом Ньютона целиком, без выбора метода и разбиения
+        nonlinear = self.has_nonlinear_elements()
+        blocks, components = decomposition.find_biconnected_blocks(self) \
+            if decompose and self.edges and not nonlinear else ([], 1)
+        if not self.edges:
+            self.ohm_law_current = self.solve_circuit_using_ohm_law()
+            analyzing_method = "Ohm's law" 
+        elif nonlinear:
+            self.solve_circuit_using_newton(**self.newton_options)
+            analyzing_method = 'nonlinear nodal analysis'
+        elif decomposition.should_decompose(blocks, components):
+            self.solve_circuit_by_blocks(blocks, max_workers, solver_options)
+            analyzing_method = 'block decomposition'
+        else:
+            method = self.select_method(solver_options.get('solver'))
+            if method == 'mca':
+                self.solve_circuit_using_mca()
+            else:
+                self.solve_circuit_using_mna(**{**solver_options, 'solver': 'cg' if method == 'cg' else 'direct'})
+            analyzing_method = ANALYZING_METHODS[method]
+        self.analyzing_method = analyzing_method
+        metrics.record(method=analyzing_method, nodes=self.num_nodes, edges=self.num_edges)
+        return analyzing_method
+
+    # Результат расчёта в виде массивов – для передачи клиенту по частям без построения полного результата.
+    # node_labels, edge_labels – узлы и ветви, результаты которых нужны (по умолчанию – все);
+    # потенциалы узлов есть в результате всех методов, кроме закона Ома
+    def export_solution(self, node_labels=None, edge_labels=None):
+        node_labels = list(self.nodes) if node_labels is None else [str(label) for label in node_labels]
+        edge_labels = list(self.edges) if edge_labels is None else [str(label) for label in edge_labels]
+        for label in node_labels:
+            if label not in self.nodes:
+                raise Exception(f'node "{label}" is not a node of the graph')
+        for label in edge_labels:
+            if label not in self.edges:
+                raise Exception(f'edge "{label}" is not an edge of the graph')
+        edges = [self.edges[label] for label in edge_labels]
+        solution = {
+            'method': self.analyzing_method,
+            'nodes': np.fromiter(map(int, node_labels), dtype=np.int64, count=len(node_labels)),
+            'branches': np.fromiter((int(edge.label) for edge in edges), dtype=np.int64, count=len(edges)),
+            'from': np.fromiter((int(edge.current_direction.start_node.label) for edge in edges),
+                                dtype=np.int64, count=len(edges)),
+            'to': np.fromiter((int(edge.current_direction.end_node.label) for edge in edges),
+                              dtype=np.int64, count=len(edges)),
+            'currents': np.fromiter((edge.current_strength for edge in edges), dtype=float, count=len(edges)),
+        }
+        if self.analyzing_method in ('modified nodal analysis', 'block decomposition', 'nonlinear nodal analysis'):
+            solution['node_potentials'] = np.fromiter((self.nodes[label].potential for label in node_labels),
+                                                      dtype=float, count=len(node_labels))
+        elif self.analyzing_method == 'mesh current analysis':
+            # метод контурных токов не находит потенциалы: они восстанавливаются по токам ветвей, как для блоков,
+            # относительно узла, который был бы базовым в уравнениях узлов
+            currents = {edge.label: decomposition.signed_current(edge) for edge in self.edges.values()}
+            specific_edges = set(edge for edge in self.edges.values() if edge.is_specific())
+            basis_node_index, _ = self.choose_basis_node(specific_edges)
+            potentials = decomposition.stitch_potentials([decomposition.recover_potentials(self, currents)],
+                                                         list(self.nodes)[basis_node_index])
+            solution['node_potentials'] = np.fromiter((potentials[label] for label in node_labels),
+                                                      dtype=float, count=len(node_labels))
+        return solution
+
+    # Подготовка данных к отправке клиенту
+    def form_result(self, analyzing_method):
+        if analyzing_method == 'modified nodal analysis':
             result = {
                 'method': 'modified nodal analysis',
                 'node_potentials': {},
                 'branch_currents': []
             }
+            # число итераций и невязка итерационного метода
+            if getattr(self, 'solver_info', None) is not None:
+                result['solver'] = self.solver_info
         elif analyzing_method == 'mesh current analysis':
             result = {
                 'method': 'mesh current analysis',
                 'branch_currents': []
             }
+        elif analyzing_method == 'block decomposition':
+            # потенциалы согласованы по шарнирным узлам, в каждой связной части свой опорный узел
+            result = {
+                'method': 'block decomposition',
+                'node_potentials': {int(node.label): node.potential for node in self.nodes.values()},
+                'branch_currents': [],
+                'blocks': [{'nodes': block_graph.num_nodes, 'edges': block_graph.num_edges, 'method': method}
+                           for block_graph, (method, _, _) in zip(self.blocks, self.block_solutions)],
+                'bridges': len(self.block_solutions) - len(self.blocks)
+            }
+        elif analyzing_method == 'nonlinear nodal analysis':
+            # число итераций и разложений матрицы Якоби, шагов по номиналам источников
+            result = {
+                'method': 'nonlinear nodal analysis',
+                'node_potentials': {int(node.label): node.potential for node in self.nodes.values()},
+                'branch_currents': [],
+                'solver': self.solver_info
+            }
+        # методы-кандидаты и оценки их стоимости, по которым выбран метод расчёта
+        if getattr(self, 'method_selection', None) is not None:
+            result['selection'] = self.method_selection
 
         visited = set()
         for node in self.nodes.values():
-            if analyzing_method == 'mna':
+            if analyzing_method == 'modified nodal analysis':
                 result['node_potentials'][int(node.label)] = node.potential
             for _, edge in node.children:
                 if edge not in visited:
                     visited.add(edge)
-                    print(str(edge))
+                    logger.debug('%s', edge)
 
                     branch_current = {
                         'id': int(edge.label),
@@ -1,14 +1,42 @@
+import io
+import os
+import struct
+import zipfile
+
+import numpy as np
+
 from .circuit_graph import (
     Direction,
     CircuitGraph
 )
+from .compact_circuit import CompactCircuit
+from .transient import TransientAnalysis
 
 from .components import (
     Resistor,
     VoltageSource,
     CurrentSource,
+    Capacitor,
+    Inductor,
+    Diode,
+    NonlinearResistor,
 )
 
+ELEMENT_TYPES = {
+    'resistor': Resistor,
+    'voltageSource': VoltageSource,
+    'currentSource': CurrentSource,
+    'capacitor': Capacitor,
+    'inductor': Inductor,
+    'diode': Diode,
+}
+
+# Нелинейные элементы рассчитываются только в представлении цепи графом (CircuitGraph)
+NONLINEAR_ELEMENT_TYPES = ('diode', 'nonlinearResistor')
+
+# Коды типов элементов в двоичном формате цепи: код – индекс в кортеже
+BINARY_ELEMENT_TYPES = ('resistor', 'voltageSource', 'currentSource', 'capacitor', 'inductor')
+
 def add_elements(graph_elements):
     elements = []
     for element in graph_elements:
@@ -22,14 +50,31 @@ def add_elements(graph_elements):
         elif element['type'] == 'currentSource':
             direction = Direction(str(element['direction']['from']), str(element['direction']['to']))
             elements.append(CurrentSource(current=element['value'], direction=direction))
+        elif element['type'] == 'capacitor':
+            elements.append(Capacitor(capacitance=element['value']))
+        elif element['type'] == 'inductor':
+            elements.append(Inductor(inductance=element['value']))
+        elif element['type'] == 'diode':
+            # номинал диода – ток насыщения, направление – от анода к катоду
+            direction = Direction(str(element['direction']['from']), str(element['direction']['to']))
+            elements.append(Diode(saturation_current=element['value'], direction=direction,
+                                  emission_coefficient=element.get('emissionCoefficient', 1.0)))
+        elif element['type'] == 'nonlinearResistor':
+            # вольт-амперная характеристика I = sum(a_k V^k), "coefficients": [a_1, a_2, ...]
+            direction = Direction(str(element['direction']['from']), str(element['direction']['to']))
+            elements.append(NonlinearResistor(coefficients=element['coefficients'], direction=direction))
     return elements
 
-def parse_circuit(data):
+# compact=True – цепь строится сразу в компактном представлении (CompactCircuit), без объектов элементов
+def parse_circuit(data, compact=False):
     if 'nodes' not in data and 'elements' in data:
         elements = add_elements(data['elements'])
         circuit = CircuitGraph(elements=elements)
         return circuit
 
+    if compact:
+        return parse_compact_circuit(data)
+
     circuit = CircuitGraph()
 
     # Создание узлов
@@ -46,4 +91,261 @@ def parse_circuit(data):
 
         circuit.add_edge(edge_label, from_node_label, to_node_label, *elements)
 
-    return circuit
\ No newline at end of file
+    # Выбор базового узла, например "basisNode": 1 или "basisPolicy": "seed", "seed": 42
+    # (по умолчанию – узел с наибольшим числом ветвей, см. CircuitGraph.set_basis_policy)
+    circuit.set_basis_policy(data.get('basisNode'), data.get('basisPolicy', 'max_degree'), data.get('seed', 0))
+    circuit.newton_options = parse_newton_options(data)
+
+    return circuit
+
+# Параметры метода Ньютона для цепи с нелинейными элементами, например
+# "newton": {"modified": true, "sourceStepping": true, "tolerance": 1e-9, "maxIterations": 100}
+def parse_newton_options(data):
+    options = data.get('newton', {})
+    names = {'modified': 'modified', 'sourceStepping': 'source_stepping', 'tolerance': 'tol',
+             'maxIterations': 'max_iterations'}
+    for name in options:
+        if name not in names:
+            raise Exception(f'unknown Newton option "{name}"')
+    return {names[name]: value for name, value in options.items()}
+
+def _id_order(node_id):
+    return (0, node_id, '') if isinstance(node_id, (int, float)) else (1, 0, str(node_id))
+
+# Каноническое представление сообщения с цепью: узлы и ветви упорядочены по идентификаторам.
+# Цепь рассчитывается в этом представлении, поэтому результат не зависит от порядка узлов и ветвей
+# в сообщении и может браться из кэша по содержимому сообщения (см. solve_cache.message_key)
+def canonicalize_circuit(data):
+    canonical = dict(data)
+    if 'nodes' in data:
+        canonical['nodes'] = sorted(data['nodes'], key=_id_order)
+    if 'edges' in data:
+        canonical['edges'] = sorted(data['edges'], key=lambda edge: _id_order(edge['id']))
+    return canonical
+
+def parse_compact_circuit(data):
+    node_labels = [str(node_id) for node_id in data['nodes']]
+    node_indices = {}
+    for index, node_label in enumerate(node_labels):
+        if node_label in node_indices:
+            raise Exception(f'node "{node_label}" is already in the circuit graph')
+        node_indices[node_label] = index
+
+    num_edges = len(data['edges'])
+    edge_labels = []
+    start_nodes, end_nodes = np.empty(num_edges, dtype=np.int32), np.empty(num_edges, dtype=np.int32)
+    resistance, voltage, current = np.zeros(num_edges), np.zeros(num_edges), np.zeros(num_edges)
+    has_current_source = np.zeros(num_edges, dtype=bool)
+    elastance, inductance = np.zeros(num_edges), np.zeros(num_edges)
+    for i, edge in enumerate(data['edges']):
+        edge_labels.append(str(edge['id']))
+        from_node_label = str(edge['from'])
+        to_node_label = str(edge['to'])
+        for node_label in (from_node_label, to_node_label):
+            if node_label not in node_indices:
+                raise Exception(f'node "{node_label}" is not a node of the graph:')
+        start_nodes[i], end_nodes[i] = node_indices[from_node_label], node_indices[to_node_label]
+        for element in edge['elements']:
+            if element['type'] == 'resistor':
+                resistance[i] += element['value']
+            elif element['type'] in ('voltageSource', 'currentSource'):
+                # знак источника – относительно направления ветви
+                sign = 1 if str(element['direction']['from']) == from_node_label else -1
+                if element['type'] == 'voltageSource':
+                    voltage[i] += sign * element['value']
+                else:
+                    current[i] += sign * element['value']
+                    has_current_source[i] = True
+            elif element['type'] == 'capacitor':
+                # последовательно соединённые конденсаторы: 1 / C = sum(1 / C_i)
+                elastance[i] += 1 / element['value']
+            elif element['type'] == 'inductor':
+                inductance[i] += element['value']
+            elif element['type'] in NONLINEAR_ELEMENT_TYPES:
+                raise Exception(f'edge "{edge["id"]}": {element["type"]} is not supported '
+                                f'in the compact circuit representation')
+
+    circuit = CompactCircuit(node_labels, edge_labels, start_nodes, end_nodes,
+                             resistance, voltage, current, has_current_source, elastance, inductance)
+    # базовый узел задаётся так же, как в parse_circuit
+    circuit.set_basis_policy(data.get('basisNode'), data.get('basisPolicy', 'max_degree'), data.get('seed', 0))
+    return circuit
+
+# Массивы архива .npz, сохранённого без сжатия (np.savez), отображаются в память (mmap_mode='r'):
+# np.load отображает в память только файлы .npy, поэтому смещение каждого массива находится по заголовкам zip.
+# Сжатые массивы (np.savez_compressed) читаются целиком
+def load_binary_arrays(path):
+    arrays = np.load(path, mmap_mode='r', allow_pickle=False)
+    if not isinstance(arrays, np.lib.npyio.NpzFile):
+        raise Exception('binary circuit must be a .npz archive')
+    with arrays, open(path, 'rb') as file:
+        mapped = {}
+        for info in arrays.zip.infolist():
+            name = info.filename[:-len('.npy')] if info.filename.endswith('.npy') else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                mapped[name] = arrays[name]
+                continue
+            # локальный заголовок zip: 30 байт, затем имя файла и дополнительное поле
+            file.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack('<HH', file.read(4))
+            file.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(file)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) \
+                else np.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_header(file)
+            if dtype.hasobject:
+                raise Exception(f'array "{name}" must not contain objects')
+            if 0 in shape:
+                mapped[name] = np.empty(shape, dtype=dtype)
+                continue
+            mapped[name] = np.memmap(file, dtype=dtype, mode='r', offset=file.tell(), shape=shape,
+                                     order='F' if fortran_order else 'C')
+    return mapped
+
+# Двоичный столбцовый формат цепи – архив NumPy (.npz) с массивами:
+# nodes – номера узлов; edges, edge_from, edge_to – номера ветвей и их узлов;
+# element_edge – индекс ветви (позиция в edges) каждого элемента, element_type – код типа (BINARY_ELEMENT_TYPES),
+# element_value – номинал, element_direction – 1, если источник направлен как ветвь, -1 – если противоположно.
+# source – байты (двоичное сообщение WebSocket), путь к файлу (массивы отображаются в память,
+# см. load_binary_arrays) или файловый объект.
+# Цепь строится сразу в компактном представлении без объектов Python для узлов, ветвей и элементов
+def parse_binary_circuit(source):
+    if isinstance(source, (str, os.PathLike)):
+        arrays = load_binary_arrays(source)
+    else:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        with np.load(source, allow_pickle=False) as archive:
+            arrays = {name: archive[name] for name in archive.files}
+    nodes = arrays['nodes']
+    edges, edge_from, edge_to = arrays['edges'], arrays['edge_from'], arrays['edge_to']
+    element_edge, element_type = arrays['element_edge'], arrays['element_type']
+    element_value, element_direction = arrays['element_value'], arrays['element_direction']
+
+    num_edges = len(edges)
+    if not (len(edge_from) == len(edge_to) == num_edges):
+        raise Exception('edges, edge_from and edge_to must have the same length')
+    if not (len(element_type) == len(element_value) == len(element_direction) == len(element_edge)):
+        raise Exception('element arrays must have the same length')
+    node_order = np.argsort(nodes, kind='stable')
+    sorted_nodes = nodes[node_order]
+    duplicates = sorted_nodes[1:][sorted_nodes[1:] == sorted_nodes[:-1]]
+    if len(duplicates):
+        raise Exception(f'node "{duplicates[0]}" is already in the circuit graph')
+
+    def find_node_indices(node_ids):
+        positions = np.minimum(np.searchsorted(sorted_nodes, node_ids), max(len(nodes) - 1, 0))
+        missing = sorted_nodes[positions] != node_ids if len(nodes) else np.ones(len(node_ids), dtype=bool)
+        if np.any(missing):
+            raise Exception(f'node "{node_ids[np.argmax(missing)]}" is not a node of the graph:')
+        return node_order[positions]
+
+    start_nodes, end_nodes = find_node_indices(edge_from), find_node_indices(edge_to)
+    if len(element_edge) and (element_edge.min() < 0 or element_edge.max() >= num_edges):
+        raise Exception('element_edge refers to a missing edge')
+    if len(element_type) and (element_type.min() < 0 or element_type.max() >= len(BINARY_ELEMENT_TYPES)):
+        raise Exception('unknown element type code')
+    is_source = (element_type == 1) | (element_type == 2)
+    if np.any(np.abs(element_direction[is_source]) != 1):
+        raise Exception('source direction must be 1 or -1')
+
+    # вклад элементов суммируется по ветвям, как в parse_compact_circuit
+    def sum_by_edge(mask, weights):
+        return np.bincount(element_edge[mask], weights=weights[mask], minlength=num_edges)
+
+    element_value = element_value.astype(float)
+    signed_value = element_value * element_direction
+    with np.errstate(divide='ignore'):
+        inverse_value = 1 / element_value
+    return CompactCircuit(
+        nodes, edges, start_nodes, end_nodes,
+        resistance=sum_by_edge(element_type == 0, element_value),
+        voltage=sum_by_edge(element_type == 1, signed_value),
+        current=sum_by_edge(element_type == 2, signed_value),
+        has_current_source=np.bincount(element_edge[element_type == 2], minlength=num_edges) > 0,
+        elastance=sum_by_edge(element_type == 3, inverse_value),
+        inductance=sum_by_edge(element_type == 4, element_value),
+    )
+
+# Преобразование цепи из JSON в двоичный формат (см. parse_binary_circuit)
+def form_binary_circuit(data):
+    elements = [(i, edge, element) for i, edge in enumerate(data['edges']) for element in edge['elements']]
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        nodes=np.array(data['nodes'], dtype=np.int64),
+        edges=np.array([edge['id'] for edge in data['edges']], dtype=np.int64),
+        edge_from=np.array([edge['from'] for edge in data['edges']], dtype=np.int64),
+        edge_to=np.array([edge['to'] for edge in data['edges']], dtype=np.int64),
+        element_edge=np.array([i for i, _, _ in elements], dtype=np.int64),
+        element_type=np.array([BINARY_ELEMENT_TYPES.index(element['type']) for _, _, element in elements],
+                              dtype=np.int8),
+        element_value=np.array([element['value'] for _, _, element in elements], dtype=float),
+        element_direction=np.array([
+            (1 if str(element['direction']['from']) == str(edge['from']) else -1) if 'direction' in element else 0
+            for _, edge, element in elements
+        ], dtype=np.int8),
+    )
+    return buffer.getvalue()
+
+def parse_element_reference(data):
+    if data['element'] not in ELEMENT_TYPES:
+        raise Exception(f'unknown element type "{data["element"]}"')
+    return str(data['edge']), ELEMENT_TYPES[data['element']], data.get('index', 0)
+
+# Изменение номинала элемента ветви, например {"type": "update", "edge": 17, "element": "resistor", "value": 220}
+# необязательное поле "index" – номер элемента этого типа в ветви
+def parse_update(data):
+    edge_label, element_type, element_index = parse_element_reference(data)
+    return edge_label, element_type, data['value'], element_index
+
+# Пакетный расчёт вариантов цепи, например
+# {"type": "sweep", "parameters": [{"edge": 17, "element": "resistor"}, ...], "values": [[220, ...], ...]}
+# каждая строка values – номиналы параметров в одном варианте
+def parse_sweep(data):
+    parameters = [parse_element_reference(parameter) for parameter in data['parameters']]
+    return parameters, data['values']
+
+# Чувствительность токов ветвей и потенциалов узлов к номиналам элементов, например
+# {"type": "sensitivity", "outputs": [{"edge": 17}, {"node": 3}, {"node": 3, "reference": 1}],
+#  "parameters": [{"edge": 17, "element": "resistor"}, ...]}
+# без "parameters" – по всем резисторам и источникам цепи (см. CircuitGraph.sensitivity)
+def parse_sensitivity(data):
+    outputs = []
+    for output in data['outputs']:
+        if 'edge' in output:
+            outputs.append(('current', str(output['edge'])))
+        elif 'node' in output:
+            reference = output.get('reference')
+            outputs.append(('potential', str(output['node']), None if reference is None else str(reference)))
+        else:
+            raise Exception('sensitivity output must have an "edge" or a "node"')
+    if 'parameters' not in data:
+        return outputs, None
+    return outputs, [parse_element_reference(parameter) for parameter in data['parameters']]
+
+# Расчёт переходного процесса, например
+# {"type": "transient", "nodes": [...], "edges": [...], "timeStep": 1e-6, "steps": 100000, "method": "trapezoidal"}
+# необязательное поле "every" – в результаты попадает каждый every-й шаг
+def parse_transient(data):
+    circuit = parse_compact_circuit(data)
+    analysis = TransientAnalysis(circuit, data['timeStep'], data.get('method', 'trapezoidal'))
+    every = data.get('every', 1)
+    if not isinstance(every, int) or isinstance(every, bool) or every < 1:
+        raise Exception('every must be a positive number of steps')
+    return analysis, data['steps'], every
+
+# AC-анализ на списке частот (Гц), например {"type": "ac", "frequencies": [10, 100, 1000]};
+# цепь передаётся в том же сообщении или берётся последняя полученная
+def parse_ac(data):
+    return data['frequencies']
+
+# Передача результата расчёта цепи по частям: поле "stream" в сообщении с цепью, например
+# {"nodes": [...], "edges": [...], "stream": {"chunkSize": 10000, "nodes": [1, 2], "branches": [17]}}
+# или "stream": true; необязательные "nodes" и "branches" – узлы и ветви, результаты которых нужны клиенту
+def parse_stream_options(data):
+    options = data['stream'] if isinstance(data['stream'], dict) else {}
+    chunk_size = options.get('chunkSize')
+    if chunk_size is not None and chunk_size < 1:
+        raise Exception('chunkSize must be a positive number')
+    return chunk_size, options.get('nodes'), options.get('branches')
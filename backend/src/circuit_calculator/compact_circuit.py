@@ -0,0 +1,210 @@
+import io
+
+import numpy as np
+import scipy.sparse as sp
+
+from . import metrics
+from .circuit_graph import BASIS_POLICIES
+from .linear_solver import CG_TOLERANCE, solve_iteratively, solve_linear_system
+from .method_selector import get_cost_model
+
+
+# Компактное представление цепи: вместо объектов узлов, ветвей и элементов –
+# массивы NumPy по ветвям (структура массивов) и CSR-смежность узлов.
+# Вклад элементов ветви хранится суммарно, напряжение и ток источников – относительно направления ветви.
+# Ёмкости ветви хранятся как суммарная обратная ёмкость (elastance, 0 – ёмкостей нет), индуктивности – суммой
+class CompactCircuit:
+    def __init__(self, node_labels, edge_labels, start_nodes, end_nodes,
+                 resistance, voltage, current, has_current_source, elastance=None, inductance=None):
+        self.node_labels = np.asarray(node_labels, dtype=str)
+        self.edge_labels = np.asarray(edge_labels, dtype=str)
+        self.start_nodes = np.asarray(start_nodes, dtype=np.int32)
+        self.end_nodes = np.asarray(end_nodes, dtype=np.int32)
+        self.resistance = np.asarray(resistance, dtype=float)
+        self.voltage = np.asarray(voltage, dtype=float)
+        self.current = np.asarray(current, dtype=float)
+        self.has_current_source = np.asarray(has_current_source, dtype=bool)
+        self.num_nodes = len(self.node_labels)
+        self.num_edges = len(self.edge_labels)
+        self.elastance = np.zeros(self.num_edges) if elastance is None else np.asarray(elastance, dtype=float)
+        self.inductance = np.zeros(self.num_edges) if inductance is None else np.asarray(inductance, dtype=float)
+        self.node_potentials = None
+        self.edge_currents = None
+        self.solver_info = None
+        self.method_selection = None
+        # выбор базового узла (см. set_basis_policy)
+        self.basis_node = None
+        self.basis_policy = 'max_degree'
+        self.seed = 0
+        self.build_adjacency()
+
+    # Правило выбора базового узла – как в CircuitGraph.set_basis_policy
+    def set_basis_policy(self, basis_node=None, policy='max_degree', seed=0):
+        if basis_node is not None and str(basis_node) not in self.node_labels:
+            raise Exception(f'basis node "{basis_node}" is not a node of the graph')
+        if policy not in BASIS_POLICIES:
+            raise Exception(f'unknown basis node policy "{policy}"')
+        self.basis_node = None if basis_node is None else str(basis_node)
+        self.basis_policy = policy
+        self.seed = int(seed)
+
+    # Индекс базового узла. Токи идеальных источников напряжения – отдельные неизвестные,
+    # поэтому, в отличие от CircuitGraph, базовым может быть любой узел
+    def choose_basis_node(self):
+        if self.basis_node is not None:
+            return int(np.flatnonzero(self.node_labels == self.basis_node)[0])
+        if self.basis_policy == 'seed':
+            return int(np.random.default_rng(self.seed).integers(self.num_nodes))
+        return int(np.argmax(np.diff(self.adjacency_indptr)))
+
+    # CSR-смежность: для узла i соседние узлы adjacent_nodes[indptr[i]:indptr[i + 1]],
+    # соединяющие их ветви – adjacent_edges[indptr[i]:indptr[i + 1]]
+    def build_adjacency(self):
+        edge_indices = np.arange(self.num_edges, dtype=np.int32)
+        nodes = np.concatenate([self.start_nodes, self.end_nodes])
+        order = np.argsort(nodes, kind='stable')
+        self.adjacency_indptr = np.zeros(self.num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(nodes, minlength=self.num_nodes), out=self.adjacency_indptr[1:])
+        self.adjacent_nodes = np.concatenate([self.end_nodes, self.start_nodes])[order]
+        self.adjacent_edges = np.concatenate([edge_indices, edge_indices])[order]
+
+    # Сопротивления ветвей в режиме постоянного тока: ветвь с конденсатором разомкнута (бесконечное сопротивление),
+    # индуктивность – короткое замыкание
+    def find_dc_resistance(self):
+        return np.where(self.elastance > 0, np.inf, self.resistance)
+
+    # Ветви с нулевым сопротивлением без источника тока – идеальные источники напряжения (или провода):
+    # их токи входят в число неизвестных, а напряжения – в уравнения связи потенциалов
+    def find_voltage_edges(self, resistance):
+        return np.flatnonzero((resistance == 0) & ~self.has_current_source)
+
+    # Уравнения метода узловых потенциалов:
+    # [A diag(g) A^T  A_v] [phi]   [-A (g E + J)]
+    # [A_v^T          0  ] [I_v] = [-E_v        ]
+    # A – матрица инцидентности (+1 в начальном узле ветви, -1 в конечном), уравнение базового узла исключается.
+    # resistance и voltage по умолчанию – режим постоянного тока; при расчёте переходных процессов
+    # передаются параметры эквивалентных схем замещения реактивных элементов
+    def form_nodal_equations(self, basis_node_index=0, resistance=None, voltage=None):
+        resistance = self.find_dc_resistance() if resistance is None else resistance
+        voltage = self.voltage if voltage is None else voltage
+        return self.form_nodal_matrix(resistance, basis_node_index), \
+            self.form_nodal_vector(resistance, voltage, basis_node_index)
+
+    def form_nodal_matrix(self, resistance, basis_node_index=0):
+        n = self.num_nodes
+        start, end = self.start_nodes, self.end_nodes
+        conductive = np.flatnonzero(resistance != 0)
+        voltage_edges = self.find_voltage_edges(resistance)
+        k = len(voltage_edges)
+        g = 1 / resistance[conductive]
+        voltage_rows = n + np.arange(k)
+
+        s, t = start[conductive], end[conductive]
+        s_v, t_v = start[voltage_edges], end[voltage_edges]
+        rows = np.concatenate([s, t, s, t, s_v, t_v, voltage_rows, voltage_rows])
+        cols = np.concatenate([s, t, t, s, voltage_rows, voltage_rows, s_v, t_v])
+        values = np.concatenate([g, g, -g, -g, np.ones(k), -np.ones(k), np.ones(k), -np.ones(k)])
+        A = sp.csr_matrix((values, (rows, cols)), shape=(n + k, n + k))
+
+        keep = np.flatnonzero(np.arange(n + k) != basis_node_index)
+        return A[keep][:, keep]
+
+    def form_nodal_vector(self, resistance, voltage, basis_node_index=0):
+        n = self.num_nodes
+        conductive = np.flatnonzero(resistance != 0)
+        voltage_edges = self.find_voltage_edges(resistance)
+        b = np.zeros(n + len(voltage_edges))
+        # вклад источников ветвей без идеальных источников напряжения
+        source = self.current.copy()
+        source[conductive] += voltage[conductive] / resistance[conductive]
+        source[voltage_edges] = 0
+        np.add.at(b, self.start_nodes, -source)
+        np.add.at(b, self.end_nodes, source)
+        b[n:] = -voltage[voltage_edges]
+        return np.delete(b, basis_node_index)
+
+    # Потенциалы узлов и токи ветвей по решению уравнений метода узловых потенциалов
+    def calculate_edge_currents(self, x, resistance, voltage, basis_node_index=0):
+        x = np.insert(x, basis_node_index, 0)
+        n = self.num_nodes
+        node_potentials = x[:n]
+        conductive = resistance != 0
+        g = np.where(conductive, 1 / np.where(conductive, resistance, 1), 0)
+        potential_difference = node_potentials[self.start_nodes] - node_potentials[self.end_nodes]
+        edge_currents = g * (potential_difference + voltage) + self.current
+        edge_currents[self.find_voltage_edges(resistance)] = x[n:]
+        return node_potentials, edge_currents
+
+    # solver – 'direct' (LU-разложение), 'cg' (метод сопряжённых градиентов) или None (выбор по оценке стоимости,
+    # см. CostModel.select_compact); tol, maxiter, preconditioner – параметры метода сопряжённых градиентов.
+    # Без идеальных источников напряжения матрица A diag(g) A^T симметрична и положительно определена.
+    # basis_node_index по умолчанию – по правилу выбора базового узла (см. choose_basis_node)
+    def solve_circuit(self, basis_node_index=None, solver=None, tol=CG_TOLERANCE, maxiter=None,
+                      preconditioner='jacobi'):
+        if basis_node_index is None:
+            basis_node_index = self.choose_basis_node()
+        resistance = self.find_dc_resistance()
+        self.solver_info = None
+        self.method_selection = None
+        if solver is None:
+            with metrics.stage('selection'):
+                method, self.method_selection = get_cost_model().select_compact(self, resistance)
+            solver = 'cg' if method == 'cg' else 'direct'
+        if solver not in ('direct', 'cg'):
+            raise Exception(f'unknown solver "{solver}"')
+        if solver == 'cg' and len(self.find_voltage_edges(resistance)):
+            raise Exception('conjugate gradient requires a circuit without branches of zero resistance')
+        with metrics.stage('assembly'):
+            A, b = self.form_nodal_equations(basis_node_index, resistance)
+        metrics.record(method='modified nodal analysis', nodes=self.num_nodes, edges=self.num_edges, nnz=A.nnz,
+                       solver=solver)
+        with metrics.stage('solve'):
+            if solver == 'cg':
+                x, self.solver_info = solve_iteratively(A, b, None, tol, maxiter, preconditioner)
+                self.solver_info['name'] = 'conjugate gradient'
+            else:
+                x = solve_linear_system(A, b)
+        with metrics.stage('currents'):
+            self.node_potentials, self.edge_currents = self.calculate_edge_currents(
+                x, resistance, self.voltage, basis_node_index)
+        with metrics.stage('result'):
+            return self.form_result()
+
+    # Подготовка данных к отправке клиенту в том же формате, что и для CircuitGraph
+    def form_result(self):
+        is_reversed = self.edge_currents < 0
+        from_nodes = np.where(is_reversed, self.end_nodes, self.start_nodes)
+        to_nodes = np.where(is_reversed, self.start_nodes, self.end_nodes)
+        node_labels = self.node_labels.astype(np.int64)
+        result = {
+            'method': 'modified nodal analysis',
+            'node_potentials': dict(zip(node_labels.tolist(), self.node_potentials.tolist())),
+            'branch_currents': [
+                {'id': edge_id, 'from': from_node, 'to': to_node, 'current': current}
+                for edge_id, from_node, to_node, current in zip(
+                    self.edge_labels.astype(np.int64).tolist(),
+                    node_labels[from_nodes].tolist(),
+                    node_labels[to_nodes].tolist(),
+                    np.abs(self.edge_currents).tolist(),
+                )
+            ]
+        }
+        # число итераций и невязка итерационного метода, кандидаты и оценки их стоимости – как для CircuitGraph
+        if self.solver_info is not None:
+            result['solver'] = self.solver_info
+        if self.method_selection is not None:
+            result['selection'] = self.method_selection
+        return result
+
+    # Результат в двоичном формате – архив NumPy (.npz): номера и потенциалы узлов,
+    # номера ветвей и токи в направлениях ветвей (отрицательный ток – против направления ветви)
+    def form_binary_result(self):
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            nodes=self.node_labels.astype(np.int64),
+            node_potentials=self.node_potentials,
+            branches=self.edge_labels.astype(np.int64),
+            currents=self.edge_currents,
+        )
+        return buffer.getvalue()
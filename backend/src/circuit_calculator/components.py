@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class Resistor:
     def __init__(self, resistance):
         self.resistance = resistance
@@ -12,4 +15,59 @@ class VoltageSource:
 class CurrentSource:
     def __init__(self, current, direction):
         self.current = current
-        self.direction = direction
\ No newline at end of file
+        self.direction = direction
+
+
+class Capacitor:
+    def __init__(self, capacitance):
+        self.capacitance = capacitance
+
+
+class Inductor:
+    def __init__(self, inductance):
+        self.inductance = inductance
+
+
+# Тепловой потенциал kT/q при 300 K, В
+THERMAL_VOLTAGE = 0.025852
+# Проводимость, параллельная каждому нелинейному элементу (как в SPICE): без неё матрица Якоби
+# вырождена, если узел соединён с остальной цепью только запертыми диодами
+GMIN = 1e-12
+
+
+# Диод (модель Шокли): I = Is (exp(V / (n Vt)) - 1) + GMIN V, V – напряжение от анода (direction.start_node)
+# к катоду (direction.end_node)
+class Diode:
+    def __init__(self, saturation_current, direction, emission_coefficient=1.0):
+        self.saturation_current = saturation_current
+        self.direction = direction
+        self.emission_coefficient = emission_coefficient
+
+    def parameters(self):
+        return self.saturation_current, self.emission_coefficient
+
+    # ток и дифференциальная проводимость dI/dV при напряжении voltage
+    def evaluate(self, voltage):
+        thermal_voltage = self.emission_coefficient * THERMAL_VOLTAGE
+        exponent = np.exp(voltage / thermal_voltage)
+        return (self.saturation_current * (exponent - 1) + GMIN * voltage,
+                self.saturation_current * exponent / thermal_voltage + GMIN)
+
+
+# Нелинейный резистор с полиномиальной вольт-амперной характеристикой I = sum(a_k V^k) + GMIN V, k = 1, 2, ...;
+# V – напряжение от direction.start_node к direction.end_node
+class NonlinearResistor:
+    def __init__(self, coefficients, direction):
+        self.coefficients = coefficients
+        self.direction = direction
+
+    def parameters(self):
+        return tuple(self.coefficients)
+
+    def evaluate(self, voltage):
+        # коэффициенты полинома по возрастанию степени, свободный член равен нулю
+        polynomial = np.polynomial.Polynomial([0, *self.coefficients])
+        return polynomial(voltage) + GMIN * voltage, polynomial.deriv()(voltage) + GMIN
+
+
+NONLINEAR_ELEMENTS = (Diode, NonlinearResistor)
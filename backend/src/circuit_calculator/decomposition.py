@@ -0,0 +1,229 @@
+import os
+
+from .components import VoltageSource
+
+# Разбиение цепи на блоки (компоненты двусвязности) по шарнирным узлам: ток между блоками не течёт,
+# потенциалы блоков согласуются по общим узлам. Мост (блок из одной ветви) рассчитывается без решения уравнений
+
+# Суммарное число ветвей блоков, начиная с которого блоки рассчитываются в пуле процессов
+PARALLEL_MIN_EDGES = 20000
+# Наименьшее число ветвей блока, который передаётся в пул процессов (меньшие блоки рассчитываются на месте)
+PARALLEL_MIN_BLOCK_EDGES = 1000
+
+_executor = None
+_executor_workers = None
+
+
+# Блоки графа – списки ветвей – и число связных частей (включая изолированные узлы);
+# обход в глубину по алгоритму Хопкрофта – Тарьяна с явным стеком.
+# Параллельные ветви различаются как объекты, петля (ветвь из узла в него же) – отдельный блок
+def find_biconnected_blocks(circuit_graph):
+    index, low = {}, {}
+    blocks = []
+    self_loops = set()
+    components = 0
+    for root in circuit_graph.nodes.values():
+        if root in index:
+            continue
+        components += 1
+        index[root] = low[root] = len(index)
+        edge_stack = []
+        stack = [(root, None, iter(root.children))]
+        while stack:
+            node, parent_edge, children = stack[-1]
+            descended = False
+            for child, edge in children:
+                if edge is parent_edge:
+                    continue
+                if child is node:
+                    if edge not in self_loops:
+                        self_loops.add(edge)
+                        blocks.append([edge])
+                elif child not in index:
+                    index[child] = low[child] = len(index)
+                    edge_stack.append(edge)
+                    stack.append((child, edge, iter(child.children)))
+                    descended = True
+                    break
+                elif index[child] < index[node]:
+                    # обратная ветвь к предку
+                    low[node] = min(low[node], index[child])
+                    edge_stack.append(edge)
+            if descended:
+                continue
+            stack.pop()
+            if stack:
+                parent = stack[-1][0]
+                low[parent] = min(low[parent], low[node])
+                if low[node] >= index[parent]:
+                    # parent – шарнирный узел (или корень): ветви над ним образуют блок
+                    block = []
+                    while True:
+                        edge = edge_stack.pop()
+                        block.append(edge)
+                        if edge is parent_edge:
+                            break
+                    blocks.append(block)
+    return blocks, components
+
+
+# Разбиение имеет смысл для несвязной цепи и для цепи из нескольких блоков с контурами:
+# мосты к единственному блоку с контурами рассчитываются вместе с ним
+def should_decompose(blocks, components):
+    return components > 1 or sum(1 for block in blocks if len(block) > 1) > 1
+
+
+# Мост – блок из одной ветви между разными узлами
+def is_bridge(block):
+    return len(block) == 1 and block[0].direction.start_node is not block[0].direction.end_node
+
+
+# Граф блока того же класса, что и исходный; элементы ветвей общие с исходным графом,
+# базовый узел блока выбирается по тому же правилу
+def form_block_graph(circuit_graph, block):
+    block_graph = type(circuit_graph)()
+    block_graph.basis_policy, block_graph.seed = circuit_graph.basis_policy, circuit_graph.seed
+    for edge in block:
+        for node in (edge.direction.start_node, edge.direction.end_node):
+            if node.label not in block_graph.nodes:
+                block_graph.add_node(node.label)
+        block_graph.add_edge(edge.label, edge.direction.start_node.label, edge.direction.end_node.label,
+                             *edge.elements)
+    return block_graph
+
+
+# Разность потенциалов начального и конечного узлов ветви по её току I (в направлении ветви):
+# I = (phi_s - phi_t + E) / R + J; для ветви без сопротивления phi_s - phi_t = -E.
+# Ветвь без сопротивления и без источника напряжения (идеальный источник тока) разность не определяет
+def find_potential_difference(edge, current):
+    if edge.resistance_sum != 0:
+        return (current - edge.current_sum) * edge.resistance_sum - edge.voltage_sum
+    if any(isinstance(element, VoltageSource) for element in edge.elements):
+        return -edge.voltage_sum
+    return None
+
+
+def signed_current(edge):
+    return edge.current_strength if edge.current_direction.start_node is edge.direction.start_node \
+        else -edge.current_strength
+
+
+# Потенциалы узлов блока по токам ветвей: обход от первого узла с нулевым потенциалом
+def recover_potentials(block_graph, currents):
+    potentials = {}
+    for root in block_graph.nodes.values():
+        if root.label in potentials:
+            continue
+        potentials[root.label] = 0.0
+        queue = [root]
+        while queue:
+            node = queue.pop()
+            for child, edge in node.children:
+                if child.label in potentials:
+                    continue
+                difference = find_potential_difference(edge, currents[edge.label])
+                if difference is None:
+                    continue
+                potentials[child.label] = potentials[node.label] - difference \
+                    if node is edge.direction.start_node else potentials[node.label] + difference
+                queue.append(child)
+    return potentials
+
+
+# Расчёт блока: метод расчёта, токи ветвей в их направлениях и потенциалы узлов блока.
+# Выполняется в пуле процессов, поэтому возвращаются только метки и числа
+def solve_block(block_graph, solver_options):
+    analyzing_method = block_graph.analyze_circuit(decompose=False, **solver_options)
+    return read_block_solution(block_graph, analyzing_method)
+
+
+def read_block_solution(block_graph, analyzing_method):
+    currents = {edge.label: signed_current(edge) for edge in block_graph.edges.values()}
+    if analyzing_method == 'modified nodal analysis':
+        potentials = {node.label: node.potential for node in block_graph.nodes.values()}
+    else:
+        potentials = recover_potentials(block_graph, currents)
+    return analyzing_method, currents, potentials
+
+
+# Мост: ток равен нулю, потенциал конечного узла – по разности потенциалов ветви
+def solve_bridge(edge):
+    difference = find_potential_difference(edge, 0)
+    if difference is None:
+        if edge.current_sum != 0:
+            raise Exception(f'current source in edge "{edge.label}" has no closed path')
+        difference = 0
+    potentials = {edge.direction.start_node.label: 0.0, edge.direction.end_node.label: -difference}
+    return 'bridge', {edge.label: 0.0}, potentials
+
+
+# Согласование потенциалов блоков: блоки обходятся по общим шарнирным узлам, потенциалы очередного блока
+# сдвигаются так, чтобы потенциал общего узла совпал с уже найденным.
+# Потенциал узла reference (если задан) равен нулю, в остальных связных частях опорный узел – узел первого блока
+def stitch_potentials(block_potentials, reference=None):
+    node_blocks = {}
+    for i, potentials in enumerate(block_potentials):
+        for label in potentials:
+            node_blocks.setdefault(label, []).append(i)
+    result = {}
+    stitched = set()
+    order = list(range(len(block_potentials)))
+    if reference in node_blocks:
+        order.insert(0, node_blocks[reference][0])
+    for first in order:
+        if first in stitched:
+            continue
+        stitched.add(first)
+        shift = -block_potentials[first][reference] if reference in block_potentials[first] else 0.0
+        queue = [(first, shift)]
+        while queue:
+            i, shift = queue.pop()
+            for label, potential in block_potentials[i].items():
+                result[label] = potential + shift
+            for label in block_potentials[i]:
+                for j in node_blocks[label]:
+                    if j not in stitched:
+                        stitched.add(j)
+                        queue.append((j, result[label] - block_potentials[j][label]))
+    return result
+
+
+# Пул процессов создаётся (и модуль multiprocessing загружается) только для больших цепей
+def get_executor(max_workers):
+    global _executor, _executor_workers
+    from concurrent.futures import ProcessPoolExecutor
+    if _executor is None or _executor_workers != max_workers:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = ProcessPoolExecutor(max_workers=max_workers)
+        _executor_workers = max_workers
+    return _executor
+
+
+def shutdown_executor():
+    global _executor, _executor_workers
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor, _executor_workers = None, None
+
+
+# Расчёт блоков: большие блоки – в пуле из max_workers процессов (по умолчанию – по числу ядер),
+# если цепь достаточно велика; остальные – в текущем процессе.
+# Возвращает решения блоков и признак того, что граф блока рассчитан на месте (и хранит факторизацию)
+def solve_blocks(block_graphs, solver_options, max_workers=None):
+    max_workers = max_workers or os.cpu_count() or 1
+    total_edges = sum(block_graph.num_edges for block_graph in block_graphs)
+    parallel = max_workers > 1 and total_edges >= PARALLEL_MIN_EDGES
+    futures = {}
+    if parallel:
+        executor = get_executor(max_workers)
+        for i, block_graph in enumerate(block_graphs):
+            if block_graph.num_edges >= PARALLEL_MIN_BLOCK_EDGES:
+                futures[i] = executor.submit(solve_block, block_graph, solver_options)
+    solutions = [None] * len(block_graphs)
+    for i, block_graph in enumerate(block_graphs):
+        if i not in futures:
+            solutions[i] = solve_block(block_graph, solver_options)
+    for i, future in futures.items():
+        solutions[i] = future.result()
+    return solutions, [i not in futures for i in range(len(block_graphs))]
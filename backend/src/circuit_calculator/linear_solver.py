@@ -0,0 +1,223 @@
+import warnings
+import numpy as np
+import scipy.linalg
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+# Системы размерностью не больше порога решаются плотной LAPACK-факторизацией,
+# для больших систем используется разреженное LU-разложение
+DENSE_THRESHOLD = 200
+# Упорядочивание, уменьшающее заполнение при разреженном LU-разложении:
+# матрицы узловых и контурных уравнений структурно почти симметричны, поэтому упорядочивается A^T + A
+PERMC_SPEC = 'MMD_AT_PLUS_A'
+# Относительная невязка, при которой итерационное решение считается найденным
+CG_TOLERANCE = 1e-10
+# Число накопленных малоранговых поправок, после которого выполняется полная перефакторизация
+MAX_UPDATE_RANK = 32
+
+
+class SingularMatrixError(Exception):
+    pass
+
+
+class ConvergenceError(Exception):
+    pass
+
+
+def _check_pivots(pivots: np.ndarray, scales: np.ndarray):
+    # Нулевой (с точностью до машинного эпсилон) ведущий элемент означает вырожденную матрицу:
+    # как правило, цепь несвязна или содержит контур только из идеальных источников.
+    # Ведущий элемент сравнивается с наибольшим элементом своего столбца, а не всей матрицы:
+    # проводимости ветвей одной цепи могут различаться на много порядков
+    pivots = np.abs(pivots)
+    tolerance = np.finfo(float).eps * len(pivots) * scales
+    singular = ~np.isfinite(pivots) | (pivots <= tolerance)
+    if np.any(singular):
+        index = int(np.argmax(singular))
+        raise SingularMatrixError(f'matrix is singular: zero pivot in row {index}')
+
+
+# Тип элементов факторизации: комплексные матрицы (AC-анализ) раскладываются без приведения к float
+def _factorization_dtype(matrix):
+    return complex if np.iscomplexobj(matrix) else float
+
+
+class DenseFactorization:
+    def __init__(self, matrix: np.ndarray):
+        self.dtype = _factorization_dtype(matrix)
+        matrix = np.asarray(matrix, dtype=self.dtype)
+        self.shape = matrix.shape
+        with warnings.catch_warnings():
+            # о вырожденности сообщает _check_pivots
+            warnings.simplefilter('ignore', scipy.linalg.LinAlgWarning)
+            self.lu, self.piv = scipy.linalg.lu_factor(matrix, check_finite=False)
+        _check_pivots(np.diag(self.lu), np.abs(matrix).max(axis=0, initial=0))
+
+    def solve(self, b: np.ndarray) -> np.ndarray:
+        return scipy.linalg.lu_solve((self.lu, self.piv), b, check_finite=False)
+
+    # Решение системы с транспонированной матрицей A^T x = b (без комплексного сопряжения)
+    def solve_transposed(self, b: np.ndarray) -> np.ndarray:
+        return scipy.linalg.lu_solve((self.lu, self.piv), b, trans=1, check_finite=False)
+
+
+class SparseFactorization:
+    # column_order – упорядочивание столбцов, найденное при факторизации матрицы с той же структурой:
+    # если оно задано, символьный этап (поиск упорядочивания) не выполняется
+    def __init__(self, matrix, permc_spec: str = PERMC_SPEC, column_order: np.ndarray = None):
+        self.dtype = _factorization_dtype(matrix.data if sp.issparse(matrix) else matrix)
+        matrix = sp.csc_matrix(matrix, dtype=self.dtype)
+        self.shape = matrix.shape
+        try:
+            if column_order is None:
+                self.lu = spla.splu(matrix, permc_spec=permc_spec)
+                self.column_order = np.argsort(self.lu.perm_c)
+                self.is_reordered = False
+            else:
+                self.lu = spla.splu(matrix[:, column_order], permc_spec='NATURAL')
+                self.column_order = np.asarray(column_order)
+                self.is_reordered = True
+        except RuntimeError as e:
+            raise SingularMatrixError(f'matrix is singular: {e}') from e
+        _check_pivots(self.lu.U.diagonal(), abs(matrix).max(axis=0).toarray().ravel()[self.column_order])
+
+    def solve(self, b: np.ndarray) -> np.ndarray:
+        y = self.lu.solve(np.asarray(b, dtype=self.dtype))
+        if not self.is_reordered:
+            return y
+        x = np.empty_like(y)
+        x[self.column_order] = y
+        return x
+
+    # Разложена матрица A Q (Q – перестановка столбцов), поэтому A^T x = b равносильно (A Q)^T x = Q^T b
+    def solve_transposed(self, b: np.ndarray) -> np.ndarray:
+        b = np.asarray(b, dtype=self.dtype)
+        return self.lu.solve(b[self.column_order] if self.is_reordered else b, trans='T')
+
+
+def factorize(matrix, dense_threshold: int = DENSE_THRESHOLD, column_order: np.ndarray = None):
+    n = matrix.shape[0]
+    if matrix.shape != (n, n):
+        raise Exception(f'matrix must be square, got shape {matrix.shape}')
+    if n <= dense_threshold:
+        return DenseFactorization(matrix.toarray() if sp.issparse(matrix) else matrix)
+    return SparseFactorization(matrix, column_order=column_order)
+
+
+def solve_linear_system(matrix, b: np.ndarray, dense_threshold: int = DENSE_THRESHOLD) -> np.ndarray:
+    x = factorize(matrix, dense_threshold).solve(b)
+    if not np.all(np.isfinite(x)):
+        raise SingularMatrixError('matrix is singular: solution is not finite')
+    return x
+
+
+class UpdatableFactorization:
+    # Факторизация матрицы A = A0 + U V^T: A0 разложена один раз,
+    # поправки U V^T учитываются по формуле Шермана – Моррисона – Вудбери
+    def __init__(self, matrix, max_rank: int = MAX_UPDATE_RANK, dense_threshold: int = DENSE_THRESHOLD,
+                 column_order: np.ndarray = None):
+        self.matrix = sp.csr_matrix(matrix, dtype=float)
+        self.shape = self.matrix.shape
+        self.max_rank = max_rank
+        self.dense_threshold = dense_threshold
+        self.column_order = column_order
+        self.refactorize()
+
+    def refactorize(self):
+        self.base = factorize(self.matrix, self.dense_threshold, self.column_order)
+        # структура матрицы при обновлениях не меняется – упорядочивание переиспользуется
+        self.column_order = getattr(self.base, 'column_order', None)
+        # столбцы U, V и Z = A0^-1 U
+        self.U, self.V, self.Z = [], [], []
+
+    def update(self, u: np.ndarray, v: np.ndarray):
+        # A <- A + u v^T
+        u_index, v_index = np.flatnonzero(u), np.flatnonzero(v)
+        rows = np.repeat(u_index, len(v_index))
+        cols = np.tile(v_index, len(u_index))
+        values = np.outer(u[u_index], v[v_index]).ravel()
+        self.matrix = self.matrix + sp.csr_matrix((values, (rows, cols)), shape=self.shape)
+        if len(self.U) >= self.max_rank:
+            self.refactorize()
+            return
+        self.U.append(u)
+        self.V.append(v)
+        self.Z.append(self.base.solve(u))
+
+    def solve(self, b: np.ndarray) -> np.ndarray:
+        y = self.base.solve(b)
+        if self.U:
+            V, Z = np.column_stack(self.V), np.column_stack(self.Z)
+            capacitance = np.eye(len(self.U)) + V.T @ Z
+            try:
+                y = y - Z @ np.linalg.solve(capacitance, V.T @ y)
+            except np.linalg.LinAlgError:
+                # поправки сделали систему плохо обусловленной относительно A0 – разлагаем заново
+                self.refactorize()
+                y = self.base.solve(b)
+        if not np.all(np.isfinite(y)):
+            raise SingularMatrixError('matrix is singular: solution is not finite')
+        return y
+
+    # A^T = A0^T + V U^T: поправки учитываются по той же формуле с переставленными U и V
+    def solve_transposed(self, b: np.ndarray) -> np.ndarray:
+        y = self.base.solve_transposed(b)
+        if self.U:
+            U = np.column_stack(self.U)
+            W = np.column_stack([self.base.solve_transposed(v) for v in self.V])
+            capacitance = np.eye(len(self.U)) + U.T @ W
+            try:
+                y = y - W @ np.linalg.solve(capacitance, U.T @ y)
+            except np.linalg.LinAlgError:
+                self.refactorize()
+                y = self.base.solve_transposed(b)
+        if not np.all(np.isfinite(y)):
+            raise SingularMatrixError('matrix is singular: solution is not finite')
+        return y
+
+
+def make_preconditioner(matrix, preconditioner: str):
+    if preconditioner is None:
+        return None
+    if preconditioner == 'jacobi':
+        diagonal = matrix.diagonal()
+        if np.any(diagonal == 0):
+            raise SingularMatrixError('matrix is singular: zero on the diagonal')
+        return sp.diags(1 / diagonal)
+    if preconditioner == 'ic':
+        # неполное разложение Холецкого A ~ U^T D^-1 U: U берётся из неполного LU-разложения
+        # без перестановок и масштабирования (для симметричной матрицы U ~ D L^T)
+        ilu = spla.spilu(sp.csc_matrix(matrix), drop_tol=1e-3, fill_factor=30, permc_spec='NATURAL',
+                         diag_pivot_thresh=0, options={'Equil': False, 'SymmetricMode': True})
+        U = sp.csc_matrix(ilu.U)
+        diagonal = U.diagonal()
+        if np.any(diagonal <= 0):
+            raise Exception('incomplete Cholesky preconditioner requires a positive definite matrix')
+        # треугольные системы решаются через SuperLU: разложение треугольной матрицы без перестановок тривиально
+        triangular_options = {'permc_spec': 'NATURAL', 'diag_pivot_thresh': 0, 'options': {'SymmetricMode': True}}
+        U_factor = spla.splu(U, **triangular_options)
+        U_transposed_factor = spla.splu(sp.csc_matrix(U.T), **triangular_options)
+        return spla.LinearOperator(matrix.shape, dtype=float,
+                                   matvec=lambda x: U_factor.solve(diagonal * U_transposed_factor.solve(x)))
+    raise Exception(f'unknown preconditioner "{preconditioner}"')
+
+
+# Метод сопряжённых градиентов для симметричных положительно определённых систем:
+# не требует факторизации, поэтому применим к системам, для которых LU-разложение не помещается в память
+def solve_iteratively(matrix, b: np.ndarray, x0: np.ndarray = None, tol: float = CG_TOLERANCE,
+                      maxiter: int = None, preconditioner: str = 'jacobi') -> tuple[np.ndarray, dict]:
+    matrix = sp.csr_matrix(matrix, dtype=float)
+    iterations = 0
+
+    def count_iteration(_):
+        nonlocal iterations
+        iterations += 1
+
+    x, info = spla.cg(matrix, b, x0=x0, rtol=tol, atol=0, maxiter=maxiter,
+                      M=make_preconditioner(matrix, preconditioner), callback=count_iteration)
+    norm_b = np.linalg.norm(b)
+    residual = float(np.linalg.norm(b - matrix @ x) / (norm_b if norm_b else 1))
+    if info != 0:
+        raise ConvergenceError(f'conjugate gradient did not converge in {iterations} iterations, '
+                               f'relative residual {residual:.3e}')
+    return x, {'iterations': iterations, 'residual': residual}
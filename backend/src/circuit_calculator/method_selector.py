@@ -0,0 +1,389 @@
+import json
+import logging
+import math
+import time
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse import csgraph
+
+from . import metrics
+from .components import CurrentSource
+from .linear_solver import DENSE_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+# Выбор метода расчёта по оценке стоимости: время этапа – калиброванный коэффициент этапа,
+# умноженный на его признак (число ветвей, ненулевых элементов, оценка заполнения и т. п.).
+# Длина контуров уточняется по остовному дереву, только если метод контурных токов может оказаться дешевле
+METHODS = ('mna', 'cg', 'mca')
+ANALYZING_METHODS = {
+    'mna': 'modified nodal analysis',
+    'cg': 'modified nodal analysis',
+    'mca': 'mesh current analysis',
+}
+
+# Длина кратчайшего контура (без параллельных ветвей) и число контуров, по которым оценивается средняя длина
+MIN_LOOP_LENGTH = 3
+LOOP_LENGTH_SAMPLES = 64
+# Разделитель, меньше которого трудоёмкость факторизации на ненулевой элемент не уменьшается
+MIN_SEPARATOR = 32
+# Жёсткие ограничения прямых методов (при применимом методе сопряжённых градиентов):
+# число узлов и размер плотного блока множителей, образуемого разделителем графа (элементов)
+ITERATIVE_THRESHOLD = 100000
+FILL_LIMIT = 5 * 10 ** 7
+
+# Коэффициенты этапов, полученные калибровкой (CostModel.calibrate) на генераторах circuit_generators
+# (цепи от 100 до 30000 узлов); коэффициент уточнения длины контуров – по цепям до 100000 узлов,
+# на которых время обхода дерева растёт быстрее числа ветвей
+DEFAULT_COEFFICIENTS = {
+    'mna': {'assembly': 3.0e-06, 'factorization': 5.8e-10, 'solve': 7.8e-10, 'currents': 1.1e-06},
+    'cg': {'assembly': 3.2e-06, 'solve': 3.1e-09, 'currents': 1.1e-06},
+    'mca': {'spanning_tree': 1.0e-07, 'loops': 2.8e-07, 'assembly': 6.4e-08, 'factorization': 4.9e-10,
+            'solve': 6.9e-11, 'currents': 3.6e-08, 'probe': 7.0e-07},
+}
+
+
+# Размер и оценка числа ненулевых элементов матрицы метода контурных токов:
+# независимый контур проходит в среднем по loop_length ветвям, контуры распределены по ветвям равномерно
+def _estimate_mesh_nonzeros(num_edges, num_loops, loop_length):
+    if num_loops <= 0:
+        return 0
+    loop_edges = num_loops * loop_length
+    return min(num_loops ** 2, num_loops + loop_edges ** 2 / max(num_edges, 1))
+
+
+# Оценка трудоёмкости факторизации: плотная матрица – size^3 / 3, разреженная – nnz * separator
+# (separator – размер разделителя графа матрицы: его строки исключаются последними и заполняются почти полностью)
+def _estimate_factorization(size, nonzeros, separator):
+    if size <= DENSE_THRESHOLD:
+        return size ** 3 / 3
+    return nonzeros * max(separator, MIN_SEPARATOR)
+
+
+# Оценка заполнения множителей: плотная матрица – size^2, разреженная – nnz * sqrt(separator)
+def _estimate_fill(size, nonzeros, separator):
+    if size <= DENSE_THRESHOLD:
+        return size ** 2
+    return nonzeros * math.sqrt(max(separator, MIN_SEPARATOR))
+
+
+# Оценка размера разделителя графа цепи: наибольшая ширина уровня обхода в ширину от псевдопериферийного узла
+# (самого удалённого от произвольного узла). Уровень обхода разделяет граф, поэтому его ширина – оценка сверху
+# разделителя, который найдёт упорядочивание при факторизации. Для несвязной цепи – по компоненте первого узла
+def estimate_separator(circuit_graph):
+    edges = circuit_graph.edges.values()
+    start_indices = np.fromiter((edge.direction.start_node.index for edge in edges), np.int64, len(edges))
+    end_indices = np.fromiter((edge.direction.end_node.index for edge in edges), np.int64, len(edges))
+    return find_separator(circuit_graph.num_nodes, start_indices, end_indices)
+
+
+# Оценка разделителя по номерам начальных и конечных узлов ветвей (см. estimate_separator)
+def find_separator(num_nodes, start_indices, end_indices):
+    if num_nodes < 2:
+        return num_nodes
+    adjacency = sp.csr_matrix((np.ones(len(start_indices)), (start_indices, end_indices)),
+                              shape=(num_nodes, num_nodes))
+    distances = csgraph.shortest_path(adjacency, directed=False, unweighted=True, indices=0)
+    peripheral_node = int(np.argmax(np.where(np.isfinite(distances), distances, -1)))
+    distances = csgraph.shortest_path(adjacency, directed=False, unweighted=True, indices=peripheral_node)
+    return int(np.bincount(distances[np.isfinite(distances)].astype(np.int64)).max())
+
+
+# Признаки цепи за один обход ветвей: размеры, особые ветви (без сопротивления) и источники тока;
+# loop_length – средняя длина независимого контура (по умолчанию – оценка снизу)
+def estimate_features(circuit_graph, loop_length=MIN_LOOP_LENGTH):
+    nodes, edges = circuit_graph.num_nodes, circuit_graph.num_edges
+    specific_edges = [edge for edge in circuit_graph.edges.values() if edge.is_specific()]
+    specific_degrees = {}
+    for edge in specific_edges:
+        for node in (edge.direction.start_node, edge.direction.end_node):
+            specific_degrees[node] = specific_degrees.get(node, 0) + 1
+    current_sources = sum(1 for edge in circuit_graph.edges.values()
+                          if any(isinstance(element, CurrentSource) for element in edge.elements))
+    loops = max(edges - nodes + 1, 0)
+    # ветвь без сопротивления объединяет уравнения двух узлов: строки её узлов содержат ветви обоих узлов
+    specific_terms = sum(len(edge.direction.start_node.children) + len(edge.direction.end_node.children)
+                         for edge in specific_edges)
+    features = {
+        'nodes': nodes,
+        'edges': edges,
+        'loops': loops,
+        'specific_edges': len(specific_edges),
+        'specific_terms': specific_terms,
+        # узел, в котором сходятся несколько ветвей без сопротивления, делает уравнения узлов вырожденными
+        'specific_chains': sum(1 for degree in specific_degrees.values() if degree > 1),
+        'current_sources': current_sources,
+        'separator': estimate_separator(circuit_graph),
+        'mna_nonzeros': nodes + 4 * edges + 2 * specific_terms,
+    }
+    return with_loop_length(features, loop_length)
+
+
+# Признаки цепи в компактном представлении (CompactCircuit) при сопротивлениях ветвей resistance:
+# идеальные источники напряжения – отдельные неизвестные (строка и столбец матрицы на ветвь),
+# а не объединение уравнений узлов, как в графе цепи, поэтому цепочки таких ветвей допустимы
+def estimate_compact_features(circuit, resistance):
+    nodes, edges = circuit.num_nodes, circuit.num_edges
+    voltage_edges = len(circuit.find_voltage_edges(resistance))
+    features = {
+        'nodes': nodes,
+        'edges': edges,
+        'loops': max(edges - nodes + 1, 0),
+        'specific_edges': voltage_edges,
+        'specific_terms': 0,
+        'specific_chains': 0,
+        'current_sources': int(np.count_nonzero(circuit.has_current_source)),
+        'separator': find_separator(nodes, circuit.start_nodes, circuit.end_nodes),
+        'mna_nonzeros': nodes + 4 * edges + 5 * voltage_edges,
+    }
+    return with_loop_length(features, MIN_LOOP_LENGTH)
+
+
+# Признаки метода контурных токов при средней длине контура loop_length: контур пересекает разделитель графа
+# цепи примерно loop_length / MIN_LOOP_LENGTH раз, разделитель матрицы контуров больше во столько же
+def with_loop_length(features, loop_length):
+    features = dict(features, loop_length=loop_length)
+    features['mca_nonzeros'] = _estimate_mesh_nonzeros(features['edges'], features['loops'], loop_length)
+    features['mca_separator'] = min(features['loops'], features['separator'] * loop_length / MIN_LOOP_LENGTH)
+    return features
+
+
+# Средняя длина независимого контура по выборке хорд максимального остовного дерева (контур хорды –
+# путь между её узлами в дереве и сама хорда). Дерево сохраняется в графе для расчёта методом контурных токов
+def estimate_loop_length(circuit_graph, samples=LOOP_LENGTH_SAMPLES):
+    circuit_graph.spanning_tree = circuit_graph.find_maximum_spanning_tree()
+    tree_edges = set(circuit_graph.spanning_tree)
+    chords = [edge for edge in circuit_graph.edges.values() if edge not in tree_edges]
+    if not chords:
+        return MIN_LOOP_LENGTH
+    rooted_tree = circuit_graph.root_spanning_tree(tree_edges)
+    lengths = []
+    for edge in chords[::max(1, len(chords) // samples)]:
+        path = circuit_graph.find_path_in_tree(edge.direction.start_node, edge.direction.end_node,
+                                               tree_edges, rooted_tree)
+        if path is not None:
+            lengths.append(len(path) + 1)
+    return sum(lengths) / len(lengths) if lengths else MIN_LOOP_LENGTH
+
+
+# Признак уточнения длины контуров (estimate_loop_length): построение дерева алгоритмом Прима
+def probe_feature(features):
+    return features['edges'] * math.log2(max(features['edges'], 2))
+
+
+# Признаки этапов каждого метода (названия этапов – как в профиле расчёта, см. metrics)
+def stage_features(features):
+    nodes, edges, loops = features['nodes'], features['edges'], features['loops']
+    mna_nonzeros, mca_nonzeros = features['mna_nonzeros'], features['mca_nonzeros']
+    loop_edges = loops * features['loop_length']
+    return {
+        'mna': {
+            'assembly': nodes + edges + features['specific_terms'],
+            'factorization': _estimate_factorization(nodes, mna_nonzeros, features['separator']),
+            'solve': _estimate_fill(nodes, mna_nonzeros, features['separator']),
+            'currents': edges,
+        },
+        'cg': {
+            'assembly': nodes + edges,
+            # число итераций метода сопряжённых градиентов с предобуславливанием Якоби для матриц
+            # узловых уравнений растёт примерно как sqrt(nodes)
+            'solve': mna_nonzeros * math.sqrt(nodes),
+            'currents': edges,
+        },
+        'mca': {
+            'spanning_tree': probe_feature(features),
+            'loops': nodes + edges + loop_edges,
+            'assembly': loop_edges + mca_nonzeros,
+            'factorization': _estimate_factorization(loops, mca_nonzeros, features['mca_separator']),
+            'solve': _estimate_fill(loops, mca_nonzeros, features['mca_separator']),
+            'currents': loop_edges + edges,
+        },
+    }
+
+
+# Методы, применимые к цепи: метод контурных токов не учитывает источники тока,
+# уравнения узлов вырождены при цепочках ветвей без сопротивления,
+# метод сопряжённых градиентов требует симметричной положительно определённой матрицы (без особых ветвей)
+def find_applicable_methods(features):
+    methods = []
+    if not features['specific_chains']:
+        methods.append('mna')
+        if not features['specific_edges']:
+            methods.append('cg')
+    if not features['current_sources']:
+        methods.append('mca')
+    return methods
+
+
+# Жёсткие ограничения сверх оценки стоимости: если применим метод сопряжённых градиентов, прямые методы
+# не используются для цепей больше ITERATIVE_THRESHOLD узлов и при плотном блоке разделителя больше FILL_LIMIT –
+# на таких цепях ошибка оценки стоит минут расчёта и гигабайтов памяти
+def limit_methods(methods, features):
+    if 'cg' not in methods:
+        return methods
+    if features['nodes'] > ITERATIVE_THRESHOLD:
+        return ['cg']
+    separators = {'mna': features['separator'], 'mca': features['mca_separator']}
+    return [method for method in methods if method == 'cg' or separators[method] ** 2 <= FILL_LIMIT]
+
+
+class CostModel:
+    def __init__(self, coefficients=None):
+        self.coefficients = {method: dict(stages)
+                             for method, stages in (coefficients or DEFAULT_COEFFICIENTS).items()}
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f)['coefficients'])
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({'coefficients': self.coefficients}, f, indent=2)
+
+    # Оценка времени расчёта каждым методом, секунд
+    def estimate(self, features):
+        costs = {}
+        for method, stages in stage_features(features).items():
+            coefficients = self.coefficients.get(method, {})
+            costs[method] = sum(coefficients.get(stage, 0) * value for stage, value in stages.items())
+        return costs
+
+    # Оценка времени уточнения длины контуров по остовному дереву, секунд; в модели, подобранной без этого
+    # коэффициента, используется коэффициент по умолчанию
+    def estimate_probe(self, features):
+        coefficient = self.coefficients.get('mca', {}).get('probe', DEFAULT_COEFFICIENTS['mca']['probe'])
+        return coefficient * probe_feature(features)
+
+    # Выбор самого дешёвого применимого метода; solver ('direct' или 'cg') задаёт решатель метода узловых
+    # потенциалов, и выбор ограничивается им. Возвращает метод и описание решения для результата расчёта
+    def select(self, circuit_graph, solver=None):
+        features = estimate_features(circuit_graph)
+        costs = self.estimate(features)
+        methods = find_applicable_methods(features)
+        if solver is not None:
+            # явно заданный решатель относится к методу узловых потенциалов: 'direct' – LU-разложение, 'cg' –
+            # метод сопряжённых градиентов; если он неприменим к цепи, расчёт не подменяется другим методом
+            if solver not in ('direct', 'cg'):
+                raise Exception(f'unknown solver "{solver}"')
+            method = 'cg' if solver == 'cg' else 'mna'
+            if method not in methods:
+                raise Exception(f'solver "{solver}" is not applicable to this circuit')
+            methods = [method]
+        if not methods:
+            # ни один метод заведомо не применим – выбор по числу уравнений, как без оценки стоимости
+            methods = ['mna' if features['nodes'] < features['loops'] else 'mca']
+        methods = limit_methods(methods, features)
+        # длина контуров уточняется, только если метод контурных токов дешевле остальных с запасом на уточнение;
+        # без уточнения его стоимость известна только снизу, поэтому он не выбирается
+        other_costs = [costs[method] for method in methods if method != 'mca']
+        if 'mca' in methods and other_costs:
+            if costs['mca'] + self.estimate_probe(features) < min(other_costs):
+                features = with_loop_length(features, estimate_loop_length(circuit_graph))
+                costs = self.estimate(features)
+                methods = limit_methods(methods, features)
+            else:
+                methods = [method for method in methods if method != 'mca']
+        method = min(methods, key=lambda candidate: costs[candidate])
+        selection = {
+            'method': method,
+            'candidates': methods,
+            'estimated_costs': costs,
+            'nodes': features['nodes'],
+            'loops': features['loops'],
+            'separator': features['separator'],
+            'loop_length': features['loop_length'],
+        }
+        metrics.record(selected_method=method, estimated_cost=costs[method])
+        return method, selection
+
+    # Выбор решателя для цепи в компактном представлении: метод контурных токов для неё не реализован,
+    # поэтому кандидаты – LU-разложение ('mna') и метод сопряжённых градиентов ('cg', без идеальных источников
+    # напряжения) с теми же жёсткими ограничениями, что и для графа цепи (см. limit_methods)
+    def select_compact(self, circuit, resistance):
+        features = estimate_compact_features(circuit, resistance)
+        costs = self.estimate(features)
+        methods = [method for method in find_applicable_methods(features) if method != 'mca']
+        methods = limit_methods(methods, features)
+        method = min(methods, key=lambda candidate: costs[candidate])
+        selection = {
+            'method': method,
+            'candidates': methods,
+            'estimated_costs': {candidate: costs[candidate] for candidate in ('mna', 'cg')},
+            'nodes': features['nodes'],
+            'loops': features['loops'],
+            'separator': features['separator'],
+        }
+        metrics.record(selected_method=method, estimated_cost=costs[method])
+        return method, selection
+
+    # Подбор коэффициентов по времени этапов на цепях circuits (сообщения клиента):
+    # каждая цепь рассчитывается каждым применимым методом repeat раз (берётся минимальное время),
+    # коэффициент этапа – решение задачи наименьших квадратов t = c * f по всем цепям.
+    # Так же подбирается коэффициент уточнения длины контуров (см. estimate_probe)
+    @classmethod
+    def calibrate(cls, circuits, repeat=3):
+        # парсер импортирует граф цепи, который использует этот модуль
+        from .circuit_parser import parse_circuit
+        sums = {}
+
+        def add_sample(method, stage, seconds, value):
+            if value > 0:
+                # вклад цепи нормируется на её время, чтобы ошибка оценки была относительной
+                weight = 1 / max(seconds, 1e-6) ** 2
+                products, squares = sums.get((method, stage), (0.0, 0.0))
+                sums[(method, stage)] = (products + weight * seconds * value, squares + weight * value ** 2)
+
+        for data in circuits:
+            circuit_graph = parse_circuit(data)
+            probe_time = math.inf
+            for _ in range(repeat):
+                start = time.perf_counter()
+                loop_length = estimate_loop_length(circuit_graph)
+                probe_time = min(probe_time, time.perf_counter() - start)
+            features = estimate_features(circuit_graph, loop_length)
+            add_sample('mca', 'probe', probe_time, probe_feature(features))
+            features_by_stage = stage_features(features)
+            # прямые методы на цепях сверх жёстких ограничений не рассчитываются (см. limit_methods)
+            for method in limit_methods(find_applicable_methods(features), features):
+                times = {}
+                try:
+                    for _ in range(repeat):
+                        circuit_graph = parse_circuit(data)
+                        with metrics.profile() as profile:
+                            solve_with_method(circuit_graph, method)
+                        for stage, seconds in profile.stages.items():
+                            times[stage] = min(times.get(stage, seconds), seconds)
+                except Exception as e:
+                    # время неудавшегося расчёта не учитывается: метод пропускается для этой цепи целиком
+                    logger.warning('calibration: method %s failed on a circuit of %d nodes and %d edges, skipped: %s',
+                                   method, features['nodes'], features['edges'], e)
+                    continue
+                for stage, value in features_by_stage[method].items():
+                    if stage in times:
+                        add_sample(method, stage, times[stage], value)
+        coefficients = {method: dict(stages) for method, stages in DEFAULT_COEFFICIENTS.items()}
+        for (method, stage), (products, squares) in sums.items():
+            if squares > 0:
+                coefficients[method][stage] = products / squares
+        return cls(coefficients)
+
+
+def solve_with_method(circuit_graph, method):
+    if method == 'mca':
+        circuit_graph.solve_circuit_using_mca()
+    else:
+        circuit_graph.solve_circuit_using_mna(solver='cg' if method == 'cg' else 'direct')
+
+
+# Модель, по которой выбирается метод в CircuitGraph.analyze_circuit
+_cost_model = CostModel()
+
+
+def get_cost_model():
+    return _cost_model
+
+
+def set_cost_model(cost_model):
+    global _cost_model
+    _cost_model = cost_model
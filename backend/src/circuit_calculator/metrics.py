@@ -0,0 +1,173 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Профилирование расчёта: время этапов (разбор, построение остовного дерева и контуров, сборка матрицы,
+# факторизация, решение, восстановление токов, подготовка результата) и размеры задачи
+# (узлы, ветви, контуры, ненулевые элементы матрицы, метод расчёта).
+# Профиль текущего расчёта хранится в контекстной переменной: вне profile() этапы не измеряются
+
+_current_profile = contextvars.ContextVar('circuit_profile', default=None)
+
+# Границы корзин гистограмм: время этапов в секундах и размеры задачи
+TIME_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 60)
+SIZE_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000, 10000000)
+# Размеры задачи из профиля, которые учитываются в метриках
+SIZE_COUNTERS = ('nodes', 'edges', 'loops', 'nnz')
+
+
+class Profile:
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+
+    def to_dict(self):
+        return {'stages': dict(self.stages), **self.counters}
+
+
+@contextmanager
+def profile():
+    current = Profile()
+    token = _current_profile.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.counters['total_time'] = time.perf_counter() - start
+        _current_profile.reset(token)
+
+
+# Время этапа суммируется, если этап выполняется несколько раз за расчёт
+@contextmanager
+def stage(name):
+    current = _current_profile.get()
+    if current is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        current.stages[name] = current.stages.get(name, 0) + time.perf_counter() - start
+
+
+def record(**counters):
+    current = _current_profile.get()
+    if current is not None:
+        current.counters.update(counters)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self.values.items()):
+            lines.append(f'{self.name}{_format_labels(labels)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        # по набору меток – счётчики корзин, сумма и число наблюдений
+        self.values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        if key not in self.values:
+            self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+        bucket_counts, _, _ = entry = self.values[key]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                bucket_counts[i] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        for labels, (bucket_counts, total, count) in sorted(self.values.items()):
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                bucket_labels = labels + (('le', _format_value(bound)),)
+                lines.append(f'{self.name}_bucket{_format_labels(bucket_labels)} {bucket_count}')
+            lines.append(f'{self.name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {count}')
+        return lines
+
+
+# Метрики расчётов сервера в текстовом формате Prometheus.
+# Профили расчётов, выполненных в других потоках или процессах, передаются в observe_profile
+class SolveMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = Counter('circuit_requests_total', 'Processed requests by type and analysis method')
+        self.errors = Counter('circuit_errors_total', 'Requests that failed by error kind')
+        self.dropped = Counter('circuit_dropped_total', 'Requests dropped without calculation by reason')
+        self.request_seconds = Histogram('circuit_request_seconds', 'Total time of request processing',
+                                         TIME_BUCKETS)
+        self.stage_seconds = Histogram('circuit_stage_seconds', 'Time spent in solve pipeline stages',
+                                       TIME_BUCKETS)
+        self.size = Histogram('circuit_size', 'Circuit sizes: nodes, edges, loops and matrix nonzeros',
+                              SIZE_BUCKETS)
+
+    def observe_profile(self, profile):
+        request_type = profile.get('type', 'circuit')
+        method = profile.get('method', '')
+        with self.lock:
+            self.requests.inc(type=request_type, method=method)
+            if 'total_time' in profile:
+                self.request_seconds.observe(profile['total_time'], type=request_type)
+            for name, seconds in profile.get('stages', {}).items():
+                self.stage_seconds.observe(seconds, stage=name)
+            for name in SIZE_COUNTERS:
+                if name in profile:
+                    self.size.observe(profile[name], quantity=name)
+
+    def observe_stage(self, name, seconds):
+        with self.lock:
+            self.stage_seconds.observe(seconds, stage=name)
+
+    def count_error(self, kind):
+        with self.lock:
+            self.errors.inc(kind=kind)
+
+    def count_dropped(self, reason, amount=1):
+        with self.lock:
+            self.dropped.inc(amount, reason=reason)
+
+    # values – дополнительные значения на момент запроса метрик: {имя: (тип, описание, значение)}
+    def render(self, values=None):
+        with self.lock:
+            lines = []
+            for metric in (self.requests, self.errors, self.dropped, self.request_seconds, self.stage_seconds,
+                           self.size):
+                lines.extend(metric.render())
+        for name, (metric_type, description, value) in (values or {}).items():
+            lines.extend([f'# HELP {name} {description}', f'# TYPE {name} {metric_type}',
+                          f'{name} {_format_value(value)}'])
+        return '\n'.join(lines) + '\n'
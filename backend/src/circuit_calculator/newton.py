@@ -0,0 +1,198 @@
+import numpy as np
+import scipy.sparse as sp
+
+from . import metrics
+from .components import GMIN, THERMAL_VOLTAGE, Diode
+from .linear_solver import ConvergenceError, SingularMatrixError, factorize
+
+# Рабочая точка цепи с нелинейными элементами методом Ньютона – Рафсона на уравнениях узлов:
+# F(x) = A x - s b + U i(D x), матрица Якоби J = A + U diag(di/dv) D. Структура J одна на всех итерациях,
+# пересчитываются только значения. Если расчёт не сходится, номиналы источников увеличиваются от нуля шагами
+
+# Допустимые изменение потенциалов (В) и невязка уравнений на последней итерации (относительно 1 + масштаб)
+NEWTON_TOLERANCE = 1e-9
+MAX_ITERATIONS = 100
+# Разложение матрицы Якоби обновляется, если невязка уменьшилась меньше чем в 1 / SLOW_CONVERGENCE_RATIO раз
+SLOW_CONVERGENCE_RATIO = 0.5
+# Начальный и наименьший шаг доли номиналов источников
+SOURCE_STEP = 0.1
+MIN_SOURCE_STEP = 1e-3
+
+
+# Нелинейные элементы: element – элемент ветви, sign – направление элемента относительно ветви,
+# start_index, end_index – узлы ветви, rows – строки уравнений, в которые входит ток ветви ({строка: знак})
+class NonlinearSystem:
+    def __init__(self, A, b, elements):
+        self.A = sp.csr_matrix(A)
+        self.b = b
+        self.n = A.shape[0]
+        self.elements = [element for element, _, _, _, _ in elements]
+        self.signs = np.array([sign for _, sign, _, _, _ in elements], dtype=float)
+        self.start_indices = np.array([start for _, _, start, _, _ in elements], dtype=np.int64)
+        self.end_indices = np.array([end for _, _, _, end, _ in elements], dtype=np.int64)
+        # характеристики элементов вычисляются векторно: диоды – по параметрам модели Шокли,
+        # нелинейные резисторы – по матрице коэффициентов полиномов (дополненной нулями до наибольшей степени)
+        self.diodes = np.array([isinstance(element, Diode) for element in self.elements], dtype=bool)
+        diodes = [element for element in self.elements if isinstance(element, Diode)]
+        self.saturation_current = np.array([diode.saturation_current for diode in diodes], dtype=float)
+        self.thermal_voltage = np.array([diode.emission_coefficient for diode in diodes], dtype=float) \
+            * THERMAL_VOLTAGE
+        # критическое напряжение диода, выше которого шаг по напряжению ограничивается (как в SPICE)
+        self.critical_voltage = self.thermal_voltage * np.log(
+            self.thermal_voltage / (np.sqrt(2) * self.saturation_current))
+        resistors = [element for element in self.elements if not isinstance(element, Diode)]
+        degree = max((len(resistor.coefficients) for resistor in resistors), default=0)
+        self.coefficients = np.zeros((len(resistors), degree))
+        for k, resistor in enumerate(resistors):
+            self.coefficients[k, :len(resistor.coefficients)] = resistor.coefficients
+
+        m = len(self.elements)
+        u_rows, u_cols, u_values = [], [], []
+        for k, (_, _, _, _, rows) in enumerate(elements):
+            for row, sign in rows.items():
+                u_rows.append(row)
+                u_cols.append(k)
+                u_values.append(sign)
+        self.U = sp.csr_matrix((u_values, (u_rows, u_cols)), shape=(self.n, m))
+        # элементы матрицы Якоби в порядке CSC: ненулевые элементы A и вклады проводимостей нелинейных ветвей
+        A = self.A.tocoo()
+        stamp_keys, stamp_edges, stamp_signs = [], [], []
+        for row, k, sign in zip(u_rows, u_cols, u_values):
+            stamp_keys.extend([self.start_indices[k] * self.n + row, self.end_indices[k] * self.n + row])
+            stamp_edges.extend([k, k])
+            stamp_signs.extend([sign, -sign])
+        keys, positions = np.unique(np.concatenate([A.col.astype(np.int64) * self.n + A.row,
+                                                    np.array(stamp_keys, dtype=np.int64)]),
+                                    return_inverse=True)
+        self.indices, columns = keys % self.n, keys // self.n
+        self.indptr = np.searchsorted(columns, np.arange(self.n + 1))
+        self.base_data = np.bincount(positions[:A.nnz], weights=A.data, minlength=len(keys))
+        self.P = sp.csr_matrix((stamp_signs, (positions[A.nnz:], stamp_edges)), shape=(len(keys), m))
+        self.column_order = None
+        self.iterations = 0
+        self.factorizations = 0
+
+    # Напряжения нелинейных элементов (в их направлениях) при потенциалах x
+    def find_voltages(self, x):
+        return self.signs * (x[self.start_indices] - x[self.end_indices])
+
+    # Токи нелинейных элементов в направлениях ветвей и их проводимости (как в evaluate элементов)
+    def evaluate(self, voltages):
+        currents, conductance = np.empty(len(voltages)), np.empty(len(voltages))
+        if self.diodes.any():
+            exponent = np.exp(voltages[self.diodes] / self.thermal_voltage)
+            currents[self.diodes] = self.saturation_current * (exponent - 1) + GMIN * voltages[self.diodes]
+            conductance[self.diodes] = self.saturation_current * exponent / self.thermal_voltage + GMIN
+        if not self.diodes.all():
+            # схема Горнера для I(V) / V и производной I'(V)
+            v = voltages[~self.diodes]
+            quotient, derivative = np.zeros(len(v)), np.zeros(len(v))
+            for k in range(self.coefficients.shape[1] - 1, -1, -1):
+                derivative = derivative * v + (k + 1) * self.coefficients[:, k]
+                quotient = quotient * v + self.coefficients[:, k]
+            currents[~self.diodes] = quotient * v + GMIN * v
+            conductance[~self.diodes] = derivative + GMIN
+        return self.signs * currents, conductance
+
+    # Невязка при потенциалах x, нелинейные элементы линеаризованы при напряжениях voltages
+    # (совпадающих с напряжениями при x, если шаг не ограничивался)
+    def find_residual(self, x, voltages, scale):
+        currents, conductance = self.evaluate(voltages)
+        currents += self.signs * conductance * (self.find_voltages(x) - voltages)
+        return self.A @ x - scale * self.b + self.U @ currents, conductance
+
+    # Разложение матрицы Якоби: структура общая, упорядочивание столбцов находится при первом разложении
+    def factorize(self, conductance):
+        data = self.base_data + self.P @ conductance
+        with metrics.stage('factorization'):
+            factorization = factorize(sp.csc_matrix((data, self.indices, self.indptr), shape=(self.n, self.n)),
+                                      column_order=self.column_order)
+        self.column_order = getattr(factorization, 'column_order', None)
+        self.factorizations += 1
+        return factorization
+
+    # Ограничение напряжений диодов, при которых элементы линеаризуются на следующей итерации (как в SPICE):
+    # напряжение выше критического растёт не быстрее логарифма, и экспонента не переполняется
+    def limit_voltages(self, new_voltages, old_voltages):
+        if not self.diodes.any():
+            return new_voltages
+        new, old = new_voltages[self.diodes], old_voltages[self.diodes]
+        thermal_voltage = self.thermal_voltage
+        limited = new.copy()
+        large = (new > self.critical_voltage) & (np.abs(new - old) > 2 * thermal_voltage)
+        conducting = large & (old > 0)
+        argument = 1 + (new[conducting] - old[conducting]) / thermal_voltage[conducting]
+        limited[conducting] = np.where(
+            argument > 0,
+            old[conducting] + thermal_voltage[conducting] * np.log(np.maximum(argument, 1e-300)),
+            self.critical_voltage[conducting])
+        blocking = large & (old <= 0)
+        limited[blocking] = thermal_voltage[blocking] * np.log(new[blocking] / thermal_voltage[blocking])
+        voltages = new_voltages.copy()
+        voltages[self.diodes] = limited
+        return voltages
+
+    # Метод Ньютона при доле номиналов источников scale от начального приближения x;
+    # modified – разложение матрицы Якоби обновляется, только когда ограничение шага не действует
+    # и невязка убывает достаточно быстро
+    def solve(self, x, scale, modified, tol, max_iterations):
+        factorization = None
+        previous_norm = None
+        limited = True
+        voltages = self.find_voltages(x)
+        residual_scale = 1 + scale * np.abs(self.b).max(initial=0)
+        for _ in range(max_iterations):
+            residual, conductance = self.find_residual(x, voltages, scale)
+            norm = np.abs(residual).max(initial=0)
+            if not np.isfinite(norm):
+                raise ConvergenceError('Newton iterations diverged')
+            if not modified or limited or norm > SLOW_CONVERGENCE_RATIO * previous_norm:
+                factorization = self.factorize(conductance)
+            with metrics.stage('solve'):
+                dx = -factorization.solve(residual)
+            self.iterations += 1
+            x = x + dx
+            new_voltages = self.find_voltages(x)
+            voltages = self.limit_voltages(new_voltages, voltages)
+            limited = np.any(voltages != new_voltages)
+            if not limited and np.abs(dx).max(initial=0) <= tol * (1 + np.abs(x).max(initial=0)) \
+                    and norm <= tol * residual_scale:
+                return x, norm
+            previous_norm = norm
+        raise ConvergenceError(f'Newton iterations did not converge in {max_iterations} iterations')
+
+
+# Решение системы с продолжением по номиналам источников; x0 – начальное приближение (по умолчанию нули).
+# Возвращает потенциалы узлов и сведения о расчёте
+def solve_nonlinear(system, x0=None, modified=True, source_stepping=True, tol=NEWTON_TOLERANCE,
+                    max_iterations=MAX_ITERATIONS):
+    x = np.zeros(system.n) if x0 is None else np.asarray(x0, dtype=float)
+    source_steps = 0
+    try:
+        x, norm = system.solve(x, 1.0, modified, tol, max_iterations)
+    except (ConvergenceError, SingularMatrixError):
+        if not source_stepping:
+            raise
+        # при нулевых номиналах источников решение – нулевые потенциалы
+        x, scale, step = np.zeros(system.n), 0.0, SOURCE_STEP
+        while scale < 1:
+            next_scale = min(1.0, scale + step)
+            try:
+                x, norm = system.solve(x, next_scale, modified, tol, max_iterations)
+            except (ConvergenceError, SingularMatrixError):
+                step /= 4
+                if step < MIN_SOURCE_STEP:
+                    raise ConvergenceError(f'source stepping did not converge at {scale:.4f} of source values')
+                continue
+            scale = next_scale
+            source_steps += 1
+            step *= 2
+    info = {
+        'name': 'modified Newton' if modified else 'Newton',
+        'iterations': system.iterations,
+        'factorizations': system.factorizations,
+        'source_steps': source_steps,
+        'residual': float(norm),
+    }
+    metrics.record(iterations=system.iterations, factorizations=system.factorizations)
+    return x, info
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict
+
+# Ограничение памяти кэша по умолчанию, байт
+DEFAULT_MAX_BYTES = 256 * 2 ** 20
+
+
+def _hash(parts):
+    return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+
+def _sorted_edges(circuit_graph):
+    return sorted(circuit_graph.edges.values(), key=lambda edge: edge.label)
+
+
+# Каноническое представление топологии: узлы, ветви с их направлениями, типы элементов,
+# направления источников, выбор базового узла и параметры метода Ньютона – всё, что не меняется при изменении номиналов
+def topology_key(circuit_graph):
+    parts = ['nodes ' + ' '.join(sorted(circuit_graph.nodes)),
+             f'basis {circuit_graph.basis_node} {circuit_graph.basis_policy} {circuit_graph.seed}',
+             f'newton {sorted(circuit_graph.newton_options.items())}']
+    for edge in _sorted_edges(circuit_graph):
+        elements = []
+        for element in edge.elements:
+            element_description = type(element).__name__
+            if getattr(element, 'direction', None) is not None:
+                element_description += f'({element.direction.start_node}>{element.direction.end_node})'
+            elements.append(element_description)
+        parts.append(f'{edge.label} {edge.direction.start_node.label}>{edge.direction.end_node.label} '
+                     + ' '.join(elements))
+    return _hash(parts)
+
+
+def values_key(circuit_graph):
+    # модуль уже загружен: граф цепи построен
+    from .circuit_graph import ELEMENT_VALUE_ATTRIBUTES
+    parts = []
+    for edge in _sorted_edges(circuit_graph):
+        # у нелинейных элементов несколько параметров
+        values = [repr(element.parameters()) if hasattr(element, 'parameters')
+                  else repr(float(getattr(element, ELEMENT_VALUE_ATTRIBUTES[type(element)])))
+                  for element in edge.elements]
+        parts.append(f'{edge.label} ' + ' '.join(values))
+    return _hash(parts)
+
+
+# Поля сообщения, не влияющие на результат расчёта
+MESSAGE_IGNORED_FIELDS = ('profile',)
+
+
+# Ключ сообщения клиента по его содержимому: хэш двоичного сообщения
+# или JSON цепи с упорядоченными полями (см. circuit_parser.canonicalize_circuit)
+def message_key(data):
+    if isinstance(data, bytes):
+        return hashlib.sha256(data).hexdigest()
+    content = {key: value for key, value in data.items() if key not in MESSAGE_IGNORED_FIELDS}
+    return _hash([json.dumps(content, sort_keys=True, separators=(',', ':'))])
+
+
+# Кэш создаётся при запуске сервера, а NumPy и модули расчёта загружаются при первом расчёте (см. __init__):
+# массив NumPy может оказаться в записи кэша, только если NumPy уже загружен
+def estimate_size(obj):
+    numpy = sys.modules.get('numpy')
+    if numpy is not None and isinstance(obj, numpy.ndarray):
+        return sys.getsizeof(obj) + (obj.nbytes if obj.base is not None else 0)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(key) + estimate_size(value) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(estimate_size(item) for item in obj)
+    return size
+
+
+# Кэш решений: совпадение топологии и номиналов – готовый результат, совпадение только топологии –
+# структура решения (остовное дерево, контуры, строки уравнений узлов, упорядочивание столбцов),
+# совпадение содержимого сообщения – готовый ответ (get_message).
+# Записи вытесняются в порядке давности использования (LRU) при превышении max_bytes
+class SolveCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.topology_hits = 0
+        self.misses = 0
+        self.message_hits = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+
+    def put(self, key, value):
+        size = estimate_size(value)
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self.entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    # Ответ на сообщение с тем же содержимым (key – message_key сообщения)
+    def get_message(self, key):
+        response = self.get(('message', key))
+        if response is not None:
+            with self.lock:
+                self.message_hits += 1
+        return response
+
+    def put_message(self, key, response):
+        self.put(('message', key), response)
+
+    # Поиск по ключам цепи (topology_key, values_key): готовый результат или, если его нет,
+    # структура решения цепи с той же топологией (None, если топология не встречалась)
+    def lookup(self, topology, values):
+        result = self.get(('result', topology, values))
+        if result is not None:
+            with self.lock:
+                self.hits += 1
+            return result, None
+        structure = self.get(('topology', topology))
+        with self.lock:
+            if structure is not None:
+                self.topology_hits += 1
+            else:
+                self.misses += 1
+        return None, structure
+
+    # structure – структура решения, если топология встретилась впервые
+    def store(self, topology, values, result, structure=None):
+        if structure is not None:
+            self.put(('topology', topology), structure)
+        self.put(('result', topology, values), result)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'topology_hits': self.topology_hits,
+            'misses': self.misses,
+            'message_hits': self.message_hits,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'size': self.size,
+            'max_size': self.max_bytes,
+        }
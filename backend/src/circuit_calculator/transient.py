@@ -0,0 +1,104 @@
+import numpy as np
+
+from .linear_solver import factorize
+
+INTEGRATION_METHODS = ('backward_euler', 'trapezoidal')
+
+
+# Расчёт переходного процесса в компактном представлении цепи (CompactCircuit) с нулевыми начальными условиями.
+# Ветвь – последовательная цепочка R, L, C и источника напряжения E, источник тока J – параллельно цепочке:
+# phi_s - phi_t + E = R i + L di/dt + u_C, C du_C/dt = i, ток ветви I = i + J.
+# На каждом шаге реактивные элементы заменяются эквивалентными схемами (сопротивление и источник напряжения),
+# и цепь рассчитывается методом узловых потенциалов. Матрица зависит только от шага по времени,
+# поэтому факторизуется один раз и используется на всех шагах.
+# basis_node_index по умолчанию – по правилу выбора базового узла цепи (см. CompactCircuit.choose_basis_node)
+class TransientAnalysis:
+    def __init__(self, circuit, time_step, method='trapezoidal', basis_node_index=None):
+        if method not in INTEGRATION_METHODS:
+            raise Exception(f'unknown integration method "{method}"')
+        if time_step <= 0:
+            raise Exception('time step must be positive')
+        self.circuit = circuit
+        self.time_step = time_step
+        self.method = method
+        self.basis_node_index = circuit.choose_basis_node() if basis_node_index is None else basis_node_index
+        self.time = 0.0
+        self.step_count = 0
+        # состояние реактивных элементов: ток цепочки ветви (без источника тока),
+        # напряжения на ёмкостях и индуктивностях ветви в направлении ветви
+        self.branch_current = np.zeros(circuit.num_edges)
+        self.capacitor_voltage = np.zeros(circuit.num_edges)
+        self.inductor_voltage = np.zeros(circuit.num_edges)
+        self.factorizations = {}
+
+    # Факторизации не сериализуются (например, при передаче в пул процессов) и строятся заново при следующем шаге
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['factorizations'] = {}
+        return state
+
+    # Неявный метод Эйлера: u_L = L (i - i_prev) / h, u_C = u_C_prev + h i / C
+    # метод трапеций: u_L = 2 L (i - i_prev) / h - u_L_prev, u_C = u_C_prev + h (i + i_prev) / (2 C)
+    def find_companion_resistance(self, method):
+        h = self.time_step
+        circuit = self.circuit
+        if method == 'backward_euler':
+            return circuit.resistance + circuit.inductance / h + h * circuit.elastance
+        return circuit.resistance + 2 * circuit.inductance / h + h * circuit.elastance / 2
+
+    def find_companion_voltage(self, method):
+        h = self.time_step
+        circuit = self.circuit
+        if method == 'backward_euler':
+            return circuit.voltage + circuit.inductance / h * self.branch_current - self.capacitor_voltage
+        return circuit.voltage + (2 * circuit.inductance / h - h * circuit.elastance / 2) * self.branch_current \
+            + self.inductor_voltage - self.capacitor_voltage
+
+    # Шаг расчёта; возвращает момент времени, потенциалы узлов и токи ветвей в их направлениях
+    def step(self):
+        # напряжения индуктивностей в начальный момент неизвестны, поэтому первый шаг метода трапеций
+        # выполняется неявным методом Эйлера (матрица этого шага факторизуется отдельно)
+        method = 'backward_euler' if self.step_count == 0 else self.method
+        h = self.time_step
+        circuit = self.circuit
+        resistance = self.find_companion_resistance(method)
+        voltage = self.find_companion_voltage(method)
+        if method not in self.factorizations:
+            self.factorizations[method] = factorize(circuit.form_nodal_matrix(resistance, self.basis_node_index))
+        b = circuit.form_nodal_vector(resistance, voltage, self.basis_node_index)
+        node_potentials, edge_currents = circuit.calculate_edge_currents(
+            self.factorizations[method].solve(b), resistance, voltage, self.basis_node_index)
+
+        branch_current = edge_currents - circuit.current
+        if method == 'backward_euler':
+            self.inductor_voltage = circuit.inductance / h * (branch_current - self.branch_current)
+            self.capacitor_voltage = self.capacitor_voltage + h * circuit.elastance * branch_current
+        else:
+            self.inductor_voltage = 2 * circuit.inductance / h * (branch_current - self.branch_current) \
+                - self.inductor_voltage
+            self.capacitor_voltage = self.capacitor_voltage \
+                + h * circuit.elastance / 2 * (branch_current + self.branch_current)
+        self.branch_current = branch_current
+        self.step_count += 1
+        self.time = self.step_count * h
+        return self.time, node_potentials, edge_currents
+
+    # Генератор результатов: num_steps шагов, выдаётся каждый every-й шаг.
+    # Результаты не накапливаются, поэтому память не зависит от числа шагов
+    def run(self, num_steps, every=1):
+        if every < 1:
+            raise Exception('every must be a positive number of steps')
+        for i in range(1, num_steps + 1):
+            result = self.step()
+            if i % every == 0:
+                yield result
+
+    # Следующие num_steps шагов одним блоком: моменты времени, потенциалы и токи каждого every-го шага
+    def advance(self, num_steps, every=1):
+        times, potentials, currents = [], [], []
+        for time, node_potentials, edge_currents in self.run(num_steps, every):
+            times.append(time)
+            potentials.append(node_potentials)
+            currents.append(edge_currents)
+        n, m = self.circuit.num_nodes, self.circuit.num_edges
+        return np.array(times), np.array(potentials).reshape(-1, n), np.array(currents).reshape(-1, m)
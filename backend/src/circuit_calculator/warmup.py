@@ -0,0 +1,31 @@
+import time
+
+from .circuit_generators import generate_grid
+from .circuit_parser import parse_circuit, parse_compact_circuit
+
+# Прогрев расчёта. Первый расчёт в процессе заметно дольше последующих: загружаются модули SciPy,
+# выполняется первичная инициализация LAPACK и SuperLU. Небольшие цепи рассчитываются всеми путями
+# (плотное и разреженное LU-разложение, контурные токи, сопряжённые градиенты, чувствительность,
+# компактное представление), чтобы первый запрос клиента рассчитывался так же быстро, как последующие
+
+# Число узлов цепей прогрева: меньшая раскладывается плотной факторизацией, большая – разреженной
+# (см. linear_solver.DENSE_THRESHOLD)
+WARMUP_SIZES = (25, 400)
+
+
+# Возвращает время прогрева, секунд
+def warm_up():
+    start = time.perf_counter()
+    for size in WARMUP_SIZES:
+        data = generate_grid(size)
+        parse_circuit(data).solve_circuit()
+        circuit_graph = parse_circuit(data)
+        circuit_graph.solve_circuit_using_mca()
+        circuit_graph = parse_circuit(data)
+        circuit_graph.solve_circuit_using_mna(solver='cg')
+        circuit_graph = parse_circuit(data)
+        circuit_graph.analyze_circuit(solver='direct')
+        circuit_graph.sensitivity([('current', next(iter(circuit_graph.edges)))])
+        circuit_graph.form_result(circuit_graph.analyzing_method)
+        parse_compact_circuit(data).solve_circuit()
+    return time.perf_counter() - start
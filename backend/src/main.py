@@ -1,12 +1,64 @@
-import uvicorn
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import signal
+import threading
+import time
+from functools import partial
 
-from fastapi import FastAPI, WebSocket
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 import circuit_calculator
+from sessions import RateLimiter, SessionRegistry
+from solve_executor import SolveExecutor, SolverBusyError
+
+# Уровень журнала задаётся переменной LOG_LEVEL; по умолчанию отладочный вывод (матрицы, токи ветвей) отключён
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'WARNING').upper(),
+                    format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
+# Число узлов или ветвей, результаты которых отправляются клиенту одним сообщением при передаче по частям
+RESULT_CHUNK_SIZE = 10000
+# Число шагов переходного процесса, результаты которых отправляются клиенту одним сообщением
+TRANSIENT_CHUNK_STEPS = 1000
+
+def read_env_number(name, number_type=int):
+    return number_type(os.environ[name]) if os.environ.get(name) else None
+
+# Прогрев расчёта в исполнителях пула до первого запроса (см. circuit_calculator.warmup)
+def warm_up_solver():
+    logger.info('solver warmed up in %.3f s', circuit_calculator.warm_up())
+
+# Пул для расчётов: SOLVER_EXECUTOR – thread или process, SOLVER_WORKERS – число исполнителей,
+# SOLVER_MAX_PENDING – предельное число расчётов в работе и в очереди, SOLVER_TIMEOUT – секунд на расчёт,
+# SOLVER_WARMUP=0 – без прогрева
+solve_executor = SolveExecutor(
+    kind=os.environ.get('SOLVER_EXECUTOR', 'thread'),
+    max_workers=read_env_number('SOLVER_WORKERS'),
+    max_pending=read_env_number('SOLVER_MAX_PENDING'),
+    timeout=read_env_number('SOLVER_TIMEOUT', float),
+    initializer=warm_up_solver if os.environ.get('SOLVER_WARMUP', '1') != '0' else None,
+)
+
+# Кэш решений цепей, общий для всех сессий; ограничение памяти задаётся в байтах
+solve_cache = circuit_calculator.SolveCache(
+    max_bytes=int(os.environ.get('SOLVE_CACHE_MAX_BYTES', circuit_calculator.solve_cache.DEFAULT_MAX_BYTES))
+)
+
+# Коэффициенты модели стоимости методов расчёта, подобранные на этой машине (python benchmark.py --calibrate)
+if os.environ.get('METHOD_COST_MODEL'):
+    circuit_calculator.set_cost_model(circuit_calculator.CostModel.load(os.environ['METHOD_COST_MODEL']))
+
+# Метрики расчётов всех сессий (время этапов, размеры цепей), доступные по /metrics
+solve_metrics = circuit_calculator.SolveMetrics()
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],  # Указываем разрешенный домен
@@ -15,25 +67,560 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Сессии WebSocket: не больше SERVER_MAX_SESSIONS одновременно (по умолчанию без ограничения),
+# SESSION_MAX_PENDING – число принятых, но ещё не обработанных сообщений сессии.
+# Частота расчётов клиента ограничивается: CLIENT_RATE_LIMIT расчётов в секунду в среднем,
+# до CLIENT_RATE_BURST расчётов подряд (по умолчанию без ограничения).
+# При завершении работы сервера принятые сообщения дорабатываются не дольше DRAIN_TIMEOUT секунд
+SESSION_MAX_PENDING = read_env_number('SESSION_MAX_PENDING') or 32
+DRAIN_TIMEOUT = read_env_number('DRAIN_TIMEOUT', float) or 30.0
+sessions = SessionRegistry(max_sessions=read_env_number('SERVER_MAX_SESSIONS'))
+rate_limiter = RateLimiter(rate=read_env_number('CLIENT_RATE_LIMIT', float),
+                           burst=read_env_number('CLIENT_RATE_BURST') or 10)
+
 @app.websocket('/ws')
 async def websocket_endpoint(websocket: WebSocket):
+    if not sessions.can_open():
+        # сервер завершает работу или достигнуто предельное число сессий: клиенту следует повторить попытку позже
+        solve_metrics.count_dropped('draining' if sessions.draining else 'session_limit')
+        await websocket.close(code=1013)
+        return
     await websocket.accept()
+    session = sessions.open(websocket.client.host if websocket.client else None, SESSION_MAX_PENDING)
+    solve_executor.open_session(session.key)
+    # Сообщения принимаются независимо от расчётов: новая цепь вытесняет ожидающие устаревшие
+    # и прерывает ожидание расчёта устаревшей цепи
+    receiver = asyncio.ensure_future(receive_messages(websocket, session))
+    session.task = asyncio.ensure_future(process_messages(websocket, session))
     try:
-        while True:
-            # Получение данных от клиента
-            data = await websocket.receive_json()
-            # Парсинг графа электрической цепи
-            circuit_graph = circuit_calculator.parse_circuit(data)
-            # Расчёт токов в электрической цепи
-            result = calculate_circuit(circuit_graph)
-            # Отправка результатов клиенту
-            await websocket.send_json(result)
+        done, _ = await asyncio.wait({receiver, session.task}, return_when=asyncio.FIRST_COMPLETED)
+        if receiver in done:
+            receiver.result()
+        else:
+            if not session.task.cancelled():
+                session.task.result()
+            # сервер завершает работу: все принятые сообщения сессии обработаны
+            await websocket.close(code=1001)
+    except WebSocketDisconnect:
+        logger.debug('websocket client disconnected')
     except Exception as e:
-        print('Error: ', e)
+        solve_metrics.count_error('exception')
+        logger.exception('websocket session error: %s', e)
+    finally:
+        receiver.cancel()
+        session.task.cancel()
+        sessions.close(session)
+        solve_executor.close_session(session.key)
+
+# Вид сообщения для очереди сессии (см. sessions.Mailbox)
+def classify_message(data):
+    if isinstance(data, bytes) or 'type' not in data:
+        return 'circuit'
+    if data['type'] in ('update', 'sweep', 'sensitivity') or (data['type'] == 'ac' and 'nodes' not in data):
+        return 'command'
+    return 'independent'
+
+async def receive_messages(websocket, session):
+    while True:
+        data = await receive_message(websocket)
+        dropped = session.mailbox.put(data, classify_message(data))
+        if dropped:
+            solve_metrics.count_dropped('superseded', dropped)
+        elif dropped is None:
+            reason = 'draining' if session.mailbox.closed else 'overflow'
+            solve_metrics.count_dropped(reason)
+            message = 'server is shutting down' if reason == 'draining' else 'too many pending messages'
+            await send_json(websocket, {"message": message, "error": reason})
+
+# Обработка сообщений сессии по одному. Граф последней полученной цепи вместе с факторизацией хранится
+# на время сессии в исполнителе пула, закреплённом за сессией (или сообщение с цепью, если ответ на него
+# взят из кэша, см. restore_circuit_graph), и не передаётся между процессами при каждом сообщении
+async def process_messages(websocket, session):
+    while await session.mailbox.wait():
+        waited = await rate_limiter.acquire(session.client)
+        if waited:
+            solve_metrics.observe_stage('rate_limit', waited)
+        data, kind = session.mailbox.pop()
+        try:
+            await process_message(websocket, session, data, kind)
+        except WebSocketDisconnect:
+            raise
+        except Exception as e:
+            # ошибка в сообщении клиента не завершает сессию
+            solve_metrics.count_error('calculation')
+            logger.warning('calculation failed: %s', e, exc_info=logger.isEnabledFor(logging.DEBUG))
+            await send_json(websocket, {"message": f"calculation failed: {e}", "error": "calculation"})
+
+async def process_message(websocket, session, data, kind):
+    if isinstance(data, dict) and data.get('type') == 'transient':
+        # Результаты переходного процесса отправляются блоками по мере расчёта
+        await stream_transient(websocket, session, data)
+        return
+    if isinstance(data, dict) and 'type' not in data and data.get('stream'):
+        # Результат расчёта большой цепи отправляется частями после завершения расчёта
+        await stream_circuit(websocket, session, data)
+        return
+    # Ответ на цепь с тем же содержимым, что у уже рассчитанной, берётся из кэша без разбора сообщения
+    message_key = None
+    if is_circuit_message(data):
+        if isinstance(data, dict):
+            data = circuit_calculator.canonicalize_circuit(data)
+        message_key = circuit_calculator.solve_cache.message_key(data)
+        cached = solve_cache.get_message(message_key)
+        if cached is not None:
+            solve_executor.set_session_state(session.key, 'circuit', data if isinstance(data, dict) else None)
+            await send_cached_response(websocket, data, cached)
+            return
+    # Расчёт выполняется в исполнителе пула, закреплённом за сессией; расчёт цепи, вытесненной новой цепью, отменяется
+    # (начатый расчёт завершается в пуле, но его результат не отправляется)
+    session.mailbox.superseded.clear()
+    if isinstance(data, dict) and data.get('type') not in SESSION_COMMANDS:
+        solve = asyncio.ensure_future(solve_circuit_message(session, data))
+    else:
+        solve = asyncio.ensure_future(
+            solve_executor.run_in_session(session.key, 'circuit', run_profiled_with_state, handle_message, data))
+    try:
+        if kind == 'circuit':
+            superseded = asyncio.ensure_future(session.mailbox.superseded.wait())
+            try:
+                await asyncio.wait({solve, superseded}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                superseded.cancel()
+            if not solve.done():
+                solve_metrics.count_dropped('superseded')
+                return
+        try:
+            result, profile = await solve
+            solve_metrics.observe_profile(profile)
+            if message_key is not None:
+                # в кэше – копия ответа, так как к ответу может быть приложен профиль
+                solve_cache.put_message(message_key, result if isinstance(result, bytes) else dict(result))
+            # профиль расчёта прикладывается к ответу по запросу клиента ("profile": true)
+            if isinstance(data, dict) and data.get('profile'):
+                result['profile'] = profile
+        except (SolverBusyError, asyncio.TimeoutError) as e:
+            # прерванный по времени расчёт мог оставить граф в промежуточном состоянии
+            if isinstance(e, asyncio.TimeoutError):
+                solve_executor.set_session_state(session.key, 'circuit', None)
+            result = solver_error_response(e)
+            solve_metrics.count_error(result['error'])
+    finally:
+        solve.cancel()
+    # Отправка результатов клиенту: на двоичное сообщение – двоичный ответ
+    if isinstance(result, bytes):
+        await websocket.send_bytes(result)
+    else:
+        await send_json(websocket, result)
+
+# Расчёт цепи из сообщения в JSON. Кэш решений общий для всех исполнителей пула, поэтому он проверяется
+# и пополняется в основном процессе: цепь разбирается в исполнителе сессии, по ключам цепи из кэша берётся
+# готовый результат или структура решения, и только при промахе цепь рассчитывается в том же исполнителе
+async def solve_circuit_message(session, data):
+    keys, profile = await solve_executor.run_in_session(
+        session.key, 'circuit', run_profiled_with_state, parse_circuit_message, data)
+    result, structure = solve_cache.lookup(*keys) if keys is not None else (None, None)
+    if result is not None:
+        profile.update(cache='hit', method=result['method'])
+    else:
+        (result, exported), solve_profile = await solve_executor.run_in_session(
+            session.key, 'circuit', run_profiled_with_state, calculate_circuit, structure,
+            keys is not None and structure is None)
+        if keys is not None:
+            solve_cache.store(*keys, result, exported)
+            profile['cache'] = 'topology' if structure is not None else 'miss'
+        profile = merge_profiles(profile, solve_profile)
+    return {"message": "circuit graph received", "calculation_result": result}, profile
+
+# Профиль расчёта из нескольких вызовов пула: время этапов и общее время складываются
+def merge_profiles(profile, other):
+    merged = {**profile, **other, 'stages': dict(profile.get('stages', {}))}
+    for name, seconds in other.get('stages', {}).items():
+        merged['stages'][name] = merged['stages'].get(name, 0) + seconds
+    merged['total_time'] = profile.get('total_time', 0) + other.get('total_time', 0)
+    return merged
+
+# Команды для графа последней полученной цепи сессии (см. handle_message); остальные сообщения в JSON – цепи
+SESSION_COMMANDS = ('update', 'sweep', 'sensitivity', 'ac')
+
+# Сообщение с цепью (текстовое без команды или двоичное), ответ на которое определяется только его содержимым
+def is_circuit_message(data):
+    return isinstance(data, bytes) or ('type' not in data and not data.get('stream'))
+
+async def send_cached_response(websocket, data, cached):
+    profile = {'type': 'binary' if isinstance(data, bytes) else 'circuit', 'cache': 'message'}
+    if isinstance(cached, bytes):
+        solve_metrics.observe_profile(profile)
+        await websocket.send_bytes(cached)
+        return
+    profile['method'] = cached['calculation_result'].get('method', '')
+    solve_metrics.observe_profile(profile)
+    response = dict(cached)
+    if data.get('profile'):
+        response['profile'] = profile
+    await send_json(websocket, response)
+
+# Текстовое сообщение – цепь или команда в JSON, двоичное – цепь в столбцовом формате (см. parse_binary_circuit)
+async def receive_message(websocket):
+    message = await websocket.receive()
+    if message['type'] == 'websocket.disconnect':
+        raise WebSocketDisconnect(message.get('code', 1000))
+    if message.get('bytes') is not None:
+        return message['bytes']
+    return json.loads(message['text'])
+
+# Ответ кодируется отдельно от отправки, чтобы время кодирования JSON учитывалось в метриках
+async def send_json(websocket, result):
+    start = time.perf_counter()
+    text = json.dumps(result, separators=(',', ':'), ensure_ascii=False)
+    solve_metrics.observe_stage('encoding', time.perf_counter() - start)
+    await websocket.send_text(text)
+
+# Выполнение function с профилированием; возвращаются результат function и профиль расчёта.
+# Профиль передаётся явно, так как расчёт может выполняться в другом процессе
+def run_profiled(function, *args):
+    with circuit_calculator.metrics.profile() as profile:
+        result = function(*args)
+    return result, profile.to_dict()
+
+# Выполнение function(state, *args) -> (новое состояние, результат) с профилированием в исполнителе сессии
+# (см. SolveExecutor.run_in_session): состояние остаётся в исполнителе, возвращаются результат и профиль
+def run_profiled_with_state(state, function, *args):
+    (state, result), profile = run_profiled(function, state, *args)
+    return state, (result, profile)
+
+def solver_error_response(error):
+    if isinstance(error, SolverBusyError):
+        return {"message": "solver is busy", "error": "busy"}
+    return {"message": "calculation timed out", "error": "timeout"}
 
-def calculate_circuit(circuit_graph):
+# Расчёт цепи с передачей результата частями; граф цепи становится графом сессии.
+# Части отправляются после завершения расчёта: в исполнителе готовятся только массивы результата,
+# а словари и JSON строятся для одной части за раз
+async def stream_circuit(websocket, session, data):
+    try:
+        solution, profile = await solve_executor.run_in_session(
+            session.key, 'circuit', run_profiled_with_state, solve_circuit_for_stream, data)
+    except (SolverBusyError, asyncio.TimeoutError) as e:
+        if isinstance(e, asyncio.TimeoutError):
+            solve_executor.set_session_state(session.key, 'circuit', None)
+        response = solver_error_response(e)
+        solve_metrics.count_error(response['error'])
+        await send_json(websocket, response)
+        return
+    chunk_size = circuit_calculator.parse_stream_options(data)[0] or RESULT_CHUNK_SIZE
+    chunks = 0
+    for result in iterate_result_chunks(solution, chunk_size):
+        await send_json(websocket, {"message": "circuit graph chunk", "calculation_result": result})
+        chunks += 1
+    solve_metrics.observe_profile(profile)
+    result = {
+        'method': solution['method'],
+        'nodes': len(solution['nodes']) if 'node_potentials' in solution else 0,
+        'branches': len(solution['branches']),
+        'chunks': chunks
+    }
+    if 'current' in solution:
+        result['current'] = solution['current']
+    response = {"message": "circuit graph received", "calculation_result": result}
+    if data.get('profile'):
+        response['profile'] = profile
+    await send_json(websocket, response)
+
+# Анализ переходного процесса хранится между блоками в исполнителе сессии (слот 'transient')
+# и удаляется после последнего блока или при ошибке
+async def stream_transient(websocket, session, data):
+    try:
+        num_steps, every = await solve_executor.run_in_session(session.key, 'transient', start_transient, data)
+        # блок содержит целое число интервалов every, чтобы прореживание не сбивалось между блоками
+        chunk_steps = TRANSIENT_CHUNK_STEPS * every
+        for first_step in range(0, num_steps, chunk_steps):
+            result, profile = await solve_executor.run_in_session(
+                session.key, 'transient', run_profiled_with_state, advance_transient,
+                min(chunk_steps, num_steps - first_step), every)
+            solve_metrics.observe_profile(profile)
+            await send_json(websocket, {"message": "transient steps", "calculation_result": result})
+        end_time = await solve_executor.run_in_session(session.key, 'transient', finish_transient)
+    except (SolverBusyError, asyncio.TimeoutError) as e:
+        response = solver_error_response(e)
+        solve_metrics.count_error(response['error'])
+        await send_json(websocket, response)
+        return
+    finally:
+        solve_executor.set_session_state(session.key, 'transient', None)
+    result = {'method': 'transient analysis', 'steps': num_steps, 'time': end_time}
+    await send_json(websocket, {"message": "transient finished", "calculation_result": result})
+
+# Метрики в текстовом формате Prometheus
+@app.get('/metrics', response_class=PlainTextResponse)
+def read_metrics():
+    cache_stats = solve_cache.stats()
+    values = {
+        'circuit_cache_hits_total': ('counter', 'Solve cache hits', cache_stats['hits']),
+        'circuit_cache_topology_hits_total': ('counter', 'Solve cache hits of the circuit topology only',
+                                              cache_stats['topology_hits']),
+        'circuit_cache_misses_total': ('counter', 'Solve cache misses', cache_stats['misses']),
+        'circuit_cache_message_hits_total': ('counter', 'Responses taken from the cache by message content',
+                                             cache_stats['message_hits']),
+        'circuit_cache_evictions_total': ('counter', 'Solve cache evictions', cache_stats['evictions']),
+        'circuit_cache_entries': ('gauge', 'Solve cache entries', cache_stats['entries']),
+        'circuit_cache_bytes': ('gauge', 'Estimated solve cache size in bytes', cache_stats['size']),
+        'circuit_sessions': ('gauge', 'Open websocket sessions', len(sessions.sessions)),
+        'circuit_solves_pending': ('gauge', 'Solves running or queued in the solver pool', solve_executor.pending),
+        'circuit_server_draining': ('gauge', 'Whether the server is shutting down', int(sessions.draining)),
+    }
+    return PlainTextResponse(solve_metrics.render(values), media_type='text/plain; version=0.0.4')
+
+# Процесс сервера работает
+@app.get('/health')
+def read_health():
+    return {'status': 'ok'}
+
+# Готовность принять новую сессию: 503, если сервер завершает работу, пул расчётов заполнен
+# или достигнуто предельное число сессий
+@app.get('/ready')
+def read_readiness():
+    if sessions.draining:
+        status = 'draining'
+    elif solve_executor.is_full() or not sessions.can_open():
+        status = 'busy'
+    else:
+        status = 'ready'
+    body = {'status': status, 'sessions': len(sessions.sessions), 'solver': solve_executor.stats()}
+    return JSONResponse(body, status_code=200 if status == 'ready' else 503)
+
+# Завершение работы по SIGTERM или SIGINT: обработчик сервера вызывается после дорасчёта принятых сообщений
+# (не дольше DRAIN_TIMEOUT секунд), повторный сигнал завершает работу сразу.
+# Обработчики сигналов сервера оборачиваются при запуске приложения, так как uvicorn устанавливает их до него.
+# Обработчики устанавливаются только из главного потока: приложение, запущенное в другом потоке
+# (тестовый клиент, встроенный сервер), работает без дорасчёта при завершении
+drain_task = None
+
+@app.on_event('startup')
+async def start_solve_executor():
+    await solve_executor.start()
+
+@app.on_event('startup')
+async def install_drain_handlers():
+    if threading.current_thread() is not threading.main_thread():
+        logger.info('not in the main thread, websocket sessions will not be drained on exit signals')
+        return
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGTERM, signal.SIGINT):
+        handler = signal.getsignal(signal_number)
+        if callable(handler):
+            signal.signal(signal_number, partial(handle_exit_signal, loop, handler))
+
+def handle_exit_signal(loop, handler, signal_number, frame):
+    if sessions.draining:
+        handler(signal_number, frame)
+        return
+    loop.call_soon_threadsafe(start_drain, handler, signal_number, frame)
+
+def start_drain(handler, signal_number, frame):
+    global drain_task
+    logger.warning('draining %d websocket sessions before shutdown', len(sessions.sessions))
+    drain_task = asyncio.ensure_future(sessions.drain(DRAIN_TIMEOUT))
+    drain_task.add_done_callback(lambda _: handler(signal_number, frame))
+
+@app.on_event('shutdown')
+async def shutdown_solve_executor():
+    await sessions.drain(DRAIN_TIMEOUT)
+    solve_executor.shutdown()
+    circuit_calculator.decomposition.shutdown_executor()
+
+# Обработка команды или двоичной цепи; выполняется в исполнителе сессии (см. run_profiled_with_state):
+# граф сессии передаётся и возвращается явно, но остаётся в исполнителе. Цепь в JSON разбирается
+# и рассчитывается отдельно, с проверкой кэша решений в основном процессе (см. solve_circuit_message)
+def handle_message(circuit_graph, data):
+    if isinstance(data, bytes):
+        # Цепь в двоичном формате рассчитывается в компактном представлении; изменение номиналов
+        # и пакетный расчёт для неё недоступны, поэтому граф сессии сбрасывается
+        circuit_calculator.metrics.record(type='binary')
+        with circuit_calculator.metrics.stage('parse'):
+            circuit = circuit_calculator.parse_binary_circuit(data)
+        circuit.solve_circuit()
+        return None, circuit.form_binary_result()
+    circuit_calculator.metrics.record(type=data.get('type', 'circuit'))
+    if data.get('type') == 'update':
+        # Изменение номинала одного элемента – пересчёт без повторного построения графа
+        if circuit_graph is None:
+            raise Exception('no circuit to update')
+        circuit_graph = restore_circuit_graph(circuit_graph)
+        with circuit_calculator.metrics.stage('update'):
+            return circuit_graph, update_circuit(circuit_graph, data)
+    if data.get('type') == 'sweep':
+        # Пакетный расчёт вариантов номиналов для топологии последней полученной цепи
+        if circuit_graph is None:
+            raise Exception('no circuit to sweep')
+        circuit_graph = restore_circuit_graph(circuit_graph)
+        with circuit_calculator.metrics.stage('sweep'):
+            return circuit_graph, sweep_circuit(circuit_graph, data)
+    if data.get('type') == 'sensitivity':
+        # Производные токов и потенциалов по номиналам элементов последней полученной цепи
+        if circuit_graph is None:
+            raise Exception('no circuit for sensitivity analysis')
+        circuit_graph = restore_circuit_graph(circuit_graph)
+        with circuit_calculator.metrics.stage('sensitivity'):
+            return circuit_graph, sensitivity_circuit(circuit_graph, data)
+    if data.get('type') == 'ac':
+        # Частотный анализ цепи из сообщения, если она передана, иначе – последней полученной цепи
+        if 'nodes' in data:
+            with circuit_calculator.metrics.stage('parse'):
+                circuit_graph = circuit_calculator.parse_circuit(data)
+        if circuit_graph is None:
+            raise Exception('no circuit for AC analysis')
+        circuit_graph = restore_circuit_graph(circuit_graph)
+        with circuit_calculator.metrics.stage('ac'):
+            return circuit_graph, ac_circuit(circuit_graph, data)
+    raise Exception(f'unknown message type "{data.get("type")}"')
+
+# Разбор цепи: граф остаётся в исполнителе сессии, в основной процесс возвращаются ключи кэша решений
+# (None для цепи без узлов – её решение не кэшируется)
+def parse_circuit_message(_, data):
+    circuit_calculator.metrics.record(type=data.get('type', 'circuit'))
+    with circuit_calculator.metrics.stage('parse'):
+        circuit_graph = circuit_calculator.parse_circuit(data)
+    if not circuit_graph.edges:
+        return circuit_graph, None
+    with circuit_calculator.metrics.stage('cache_keys'):
+        keys = (circuit_calculator.solve_cache.topology_key(circuit_graph),
+                circuit_calculator.solve_cache.values_key(circuit_graph))
+    return circuit_graph, keys
+
+# Расчёт разобранной цепи при промахе кэша решений; structure – структура решения цепи с той же топологией
+# из кэша. Возвращается результат и структура решения, если её нужно добавить в кэш (export_structure)
+def calculate_circuit(circuit_graph, structure, export_structure):
+    circuit_graph.structure = structure
     result = circuit_graph.solve_circuit()
-    return {"message": "circuit graph received", "calculation_result": result}
+    return circuit_graph, (result, circuit_graph.export_structure() if export_structure else None)
+
+# Если ответ на последнюю цепь сессии взят из кэша, сессия хранит сообщение с цепью:
+# граф строится при первой команде, которой он нужен
+def restore_circuit_graph(circuit_graph):
+    if isinstance(circuit_graph, dict):
+        with circuit_calculator.metrics.stage('parse'):
+            return circuit_calculator.parse_circuit(circuit_graph)
+    return circuit_graph
+
+def update_circuit(circuit_graph, data):
+    result = circuit_graph.update_element(*circuit_calculator.parse_update(data))
+    return {"message": "circuit update received", "calculation_result": result}
+
+def sweep_circuit(circuit_graph, data):
+    currents = circuit_graph.sweep(*circuit_calculator.parse_sweep(data))
+    result = {
+        'method': 'parameter sweep',
+        'branches': [int(label) for label in circuit_graph.edges],
+        'currents': currents.tolist()
+    }
+    return {"message": "circuit sweep received", "calculation_result": result}
+
+# Строка gradients – производные одного выхода по параметрам parameters;
+# неопределённая производная (по нулевому сопротивлению ветви) передаётся как null
+def sensitivity_circuit(circuit_graph, data):
+    outputs, parameters = circuit_calculator.parse_sensitivity(data)
+    if parameters is None:
+        parameters = circuit_graph.find_sensitivity_parameters()
+    gradients = circuit_graph.sensitivity(outputs, parameters)
+    element_names = {element_type: name for name, element_type in circuit_calculator.ELEMENT_TYPES.items()}
+    result = {
+        'method': 'adjoint sensitivity',
+        'parameters': [{'edge': int(edge_label), 'element': element_names[element_type], 'index': element_index}
+                       for edge_label, element_type, element_index in parameters],
+        'gradients': [[None if math.isnan(value) else value for value in row] for row in gradients.tolist()]
+    }
+    return {"message": "circuit sensitivity received", "calculation_result": result}
+
+# Расчёт без построения полного результата: в основной процесс возвращаются только массивы
+def solve_circuit_for_stream(circuit_graph, data):
+    circuit_calculator.metrics.record(type='stream')
+    with circuit_calculator.metrics.stage('parse'):
+        circuit_graph = circuit_calculator.parse_circuit(data)
+    analyzing_method = circuit_graph.analyze_circuit()
+    _, node_labels, edge_labels = circuit_calculator.parse_stream_options(data)
+    solution = circuit_graph.export_solution(node_labels, edge_labels)
+    if analyzing_method == "Ohm's law":
+        solution['current'] = circuit_graph.ohm_law_current
+    return circuit_graph, solution
+
+# Части результата в формате обычного ответа: сначала потенциалы узлов, затем токи ветвей,
+# не больше chunk_size записей в части
+def iterate_result_chunks(solution, chunk_size):
+    if 'node_potentials' in solution:
+        for start in range(0, len(solution['nodes']), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            yield {
+                'method': solution['method'],
+                'node_potentials': dict(zip(solution['nodes'][chunk].tolist(),
+                                            solution['node_potentials'][chunk].tolist()))
+            }
+    for start in range(0, len(solution['branches']), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        yield {
+            'method': solution['method'],
+            'branch_currents': [
+                {'id': edge_id, 'from': from_node, 'to': to_node, 'current': current}
+                for edge_id, from_node, to_node, current in zip(
+                    solution['branches'][chunk].tolist(),
+                    solution['from'][chunk].tolist(),
+                    solution['to'][chunk].tolist(),
+                    solution['currents'][chunk].tolist(),
+                )
+            ]
+        }
+
+# Комплексные потенциалы и токи передаются раздельно действительной и мнимой частями
+def ac_circuit(circuit_graph, data):
+    frequencies = circuit_calculator.parse_ac(data)
+    potentials, currents = circuit_graph.ac_sweep(frequencies)
+    result = {
+        'method': 'AC analysis',
+        'frequencies': list(frequencies),
+        'nodes': [int(label) for label in circuit_graph.nodes],
+        'node_potentials': {'real': potentials.real.tolist(), 'imag': potentials.imag.tolist()},
+        'branches': [int(label) for label in circuit_graph.edges],
+        'currents': {'real': currents.real.tolist(), 'imag': currents.imag.tolist()}
+    }
+    return {"message": "circuit AC analysis received", "calculation_result": result}
+
+def start_transient(_, data):
+    analysis, num_steps, every = circuit_calculator.parse_transient(data)
+    return analysis, (num_steps, every)
+
+def finish_transient(analysis):
+    return None, analysis.time
+
+# Следующий блок шагов переходного процесса; анализ возвращается явно, как граф сессии в handle_message
+def advance_transient(analysis, num_steps, every):
+    circuit_calculator.metrics.record(type='transient', method='transient analysis')
+    with circuit_calculator.metrics.stage('transient'):
+        times, potentials, currents = analysis.advance(num_steps, every)
+    circuit = analysis.circuit
+    result = {
+        'method': 'transient analysis',
+        'time': times.tolist(),
+        'nodes': circuit.node_labels.astype(int).tolist(),
+        'node_potentials': potentials.tolist(),
+        'branches': circuit.edge_labels.astype(int).tolist(),
+        'currents': currents.tolist()
+    }
+    return analysis, result
+
+# Запуск сервера: по умолчанию SERVER_WORKERS процессов (у каждого свой пул расчётов, общий для его сессий)
+# без перезагрузки при изменении кода; --reload – режим разработки
+def serve():
+    # uvicorn нужен только для запуска; в процессах сервера приложение загружает он сам
+    import uvicorn
+    parser = argparse.ArgumentParser(description='Circuit calculator server')
+    parser.add_argument('--host', default=os.environ.get('SERVER_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=read_env_number('SERVER_PORT') or 4000)
+    parser.add_argument('--workers', type=int, default=read_env_number('SERVER_WORKERS') or 1)
+    parser.add_argument('--reload', action='store_true')
+    args = parser.parse_args()
+    if args.reload:
+        uvicorn.run('main:app', host=args.host, port=args.port, reload=True)
+    else:
+        uvicorn.run('main:app', host=args.host, port=args.port, workers=args.workers)
 
 if __name__ == '__main__':
-    uvicorn.run('main:app', host='0.0.0.0', port=4000, reload=True)
\ No newline at end of file
+    serve()
\ No newline at end of file
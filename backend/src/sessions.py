@@ -0,0 +1,132 @@
+import asyncio
+import itertools
+import time
+from collections import deque
+
+# Сессии WebSocket сервера: очередь сообщений сессии, в которой новая цепь вытесняет устаревшие,
+# ограничение частоты расчётов для клиента, ограничение числа сессий и завершение работы сервера
+# с дорасчётом уже принятых сообщений
+
+# Число клиентов, после которого из ограничителя частоты удаляются клиенты с полным запасом маркеров
+MAX_TRACKED_CLIENTS = 10000
+
+_session_keys = itertools.count(1)
+
+
+# Ограничение частоты расчётов клиента («корзина маркеров»): rate расчётов в секунду в среднем,
+# до burst расчётов подряд. Клиент – адрес, с которого открыты его сессии, поэтому ограничение общее
+# для всех его сессий. rate = None – без ограничения
+class RateLimiter:
+    def __init__(self, rate=None, burst=1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        # клиент -> (запас маркеров, время последнего расчёта)
+        self.buckets = {}
+
+    # Списание маркера; возвращает время ожидания, через которое расчёт можно начать
+    def reserve(self, client):
+        if not self.rate:
+            return 0.0
+        now = time.monotonic()
+        if len(self.buckets) > MAX_TRACKED_CLIENTS:
+            self.buckets = {key: (tokens, last) for key, (tokens, last) in self.buckets.items()
+                            if tokens + (now - last) * self.rate < self.burst}
+        tokens, last = self.buckets.get(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate) - 1
+        self.buckets[client] = (tokens, now)
+        return max(0.0, -tokens / self.rate)
+
+    async def acquire(self, client):
+        delay = self.reserve(client)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+
+# Очередь сообщений сессии. Вид сообщения:
+# 'circuit' – новая цепь, заменяет цепь сессии; 'command' – команда для цепи сессии (изменение номинала и т. п.);
+# 'independent' – запрос, не связанный с цепью сессии.
+# Новая цепь вытесняет ещё не обработанные цепи и команды для них: расчёт устаревших правок не нужен
+class Mailbox:
+    def __init__(self, max_messages):
+        self.max_messages = max_messages
+        self.messages = deque()
+        self.closed = False
+        self.changed = asyncio.Event()
+        # поступила новая цепь: рассчитываемая цепь устарела
+        self.superseded = asyncio.Event()
+
+    # Возвращает число вытесненных сообщений или None, если сообщение не принято (очередь закрыта или полна)
+    def put(self, message, kind):
+        if self.closed:
+            return None
+        dropped = 0
+        if kind == 'circuit':
+            kept = deque(entry for entry in self.messages if entry[1] == 'independent')
+            dropped = len(self.messages) - len(kept)
+            self.messages = kept
+            self.superseded.set()
+        if len(self.messages) >= self.max_messages:
+            return None
+        self.messages.append((message, kind))
+        self.changed.set()
+        return dropped
+
+    # Ожидание сообщения; False – очередь закрыта и пуста
+    async def wait(self):
+        while not self.messages:
+            if self.closed:
+                return False
+            self.changed.clear()
+            await self.changed.wait()
+        return True
+
+    def pop(self):
+        return self.messages.popleft()
+
+    # Новые сообщения не принимаются, принятые дорабатываются
+    def close(self):
+        self.closed = True
+        self.changed.set()
+
+
+class Session:
+    def __init__(self, client, max_messages):
+        # ключ состояния сессии в пуле расчётов (см. SolveExecutor.run_in_session)
+        self.key = next(_session_keys)
+        self.client = client
+        self.mailbox = Mailbox(max_messages)
+        # задача обработки сообщений сессии
+        self.task = None
+
+
+# Открытые сессии сервера (процесса): не больше max_sessions (None – без ограничения)
+class SessionRegistry:
+    def __init__(self, max_sessions=None):
+        self.max_sessions = max_sessions
+        self.sessions = set()
+        self.draining = False
+
+    def can_open(self):
+        return not self.draining and (not self.max_sessions or len(self.sessions) < self.max_sessions)
+
+    def open(self, client, max_messages):
+        session = Session(client, max_messages)
+        self.sessions.add(session)
+        return session
+
+    def close(self, session):
+        self.sessions.discard(session)
+
+    # Завершение работы: новые сессии и сообщения не принимаются, принятые сообщения обрабатываются
+    # не дольше timeout секунд, после чего обработка оставшихся отменяется
+    async def drain(self, timeout=None):
+        self.draining = True
+        for session in self.sessions:
+            session.mailbox.close()
+        tasks = [session.task for session in self.sessions if session.task is not None]
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,205 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class SolverBusyError(Exception):
+    pass
+
+
+# Состояние сессий (граф последней цепи с факторизацией, анализ переходного процесса) в исполнителе,
+# где выполняются расчёты сессии: {ключ сессии: {слот: (номер расчёта, состояние)}}.
+# В пуле процессов у каждого процесса свой словарь, состояние не передаётся между процессами
+_states = {}
+_states_lock = threading.Lock()
+
+
+def open_state(key):
+    with _states_lock:
+        _states.setdefault(key, {})
+
+
+def close_state(key):
+    with _states_lock:
+        _states.pop(key, None)
+
+
+# Состояние сохраняется, только если сессия открыта и не сохранено состояние более позднего расчёта
+# (расчёт вытесненной цепи может завершиться после расчёта следующей)
+def store_state(key, slot, sequence, state):
+    with _states_lock:
+        slots = _states.get(key)
+        if slots is not None and sequence >= slots.get(slot, (0, None))[0]:
+            slots[slot] = (sequence, state)
+
+
+# Выполнение function(state, *args) -> (новое состояние, результат) с состоянием слота сессии
+def run_with_state(key, slot, sequence, function, *args):
+    with _states_lock:
+        state = _states.get(key, {}).get(slot, (0, None))[1]
+    state, result = function(state, *args)
+    store_state(key, slot, sequence, state)
+    return result
+
+
+# Выполнение расчётов вне цикла событий: в пуле потоков (NumPy и SciPy освобождают GIL
+# на время факторизации) или в пуле процессов
+class SolveExecutor:
+    # initializer – функция, выполняемая в каждом процессе пула при его запуске
+    # (в пуле потоков – один раз, см. start)
+    def __init__(self, kind='thread', max_workers=None, max_pending=None, timeout=None, initializer=None):
+        if kind not in ('thread', 'process'):
+            raise Exception(f'unknown executor kind "{kind}"')
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.initializer = initializer
+        # в пуле процессов у каждого процесса своя очередь: сессия закрепляется за одним процессом, который хранит
+        # её состояние (см. run_in_session), расчёты без состояния выполняются наименее загруженным
+        self.executors = [self.create_executor() for _ in range(1 if kind == 'thread' else self.max_workers)]
+        self.loads = [0] * len(self.executors)
+        # процесс, за которым закреплена сессия, и номер последнего расчёта каждого слота сессии
+        self.session_workers = {}
+        self.sequences = {}
+        # число выполняемых и ожидающих в очереди расчётов ограничено,
+        # при заполнении очереди новые расчёты отклоняются
+        self.max_pending = max_pending or 2 * self.max_workers
+        self.slots = threading.BoundedSemaphore(self.max_pending)
+        self.lock = threading.Lock()
+        self.pending = 0
+        # ограничение времени одного расчёта, секунд
+        self.timeout = timeout
+
+    def create_executor(self):
+        if self.kind == 'thread':
+            return ThreadPoolExecutor(max_workers=self.max_workers)
+        return ProcessPoolExecutor(max_workers=1, initializer=self.initializer)
+
+    # Запуск исполнителей до первого расчёта: процессы пула запускаются заранее и выполняют initializer;
+    # в пуле потоков загруженные модули общие для всех потоков, поэтому initializer выполняется один раз
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        if self.kind == 'process':
+            await asyncio.gather(*(loop.run_in_executor(executor, os.getpid) for executor in self.executors))
+        elif self.initializer is not None:
+            await loop.run_in_executor(self.executors[0], self.initializer)
+
+    # worker – номер исполнителя (по умолчанию – наименее загруженный)
+    async def run(self, function, *args, worker=None):
+        if not self.slots.acquire(blocking=False):
+            raise SolverBusyError('solver is busy')
+        with self.lock:
+            if worker is None:
+                worker = self.loads.index(min(self.loads))
+            self.pending += 1
+            self.loads[worker] += 1
+            executor = self.executors[worker]
+        try:
+            try:
+                future = executor.submit(function, *args)
+            except BrokenExecutor:
+                # исполнитель сломан (например, процесс завершён системой) – расчёт передаётся новому
+                executor = self.restart_worker(worker, executor)
+                future = executor.submit(function, *args)
+        except BaseException:
+            self.release(worker)
+            raise
+        # место в очереди освобождается, только когда расчёт действительно завершён или отменён
+        future.add_done_callback(lambda _: self.release(worker))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            # расчёт, ещё не начатый исполнителем, снимается с очереди; начатый расчёт в процессе прерывается
+            # вместе с процессом, иначе он занимает процесс и место в очереди до своего завершения
+            if not future.cancel() and self.kind == 'process':
+                self.restart_worker(worker, executor)
+            raise
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BrokenExecutor:
+            self.restart_worker(worker, executor)
+            raise
+
+    # Замена исполнителя worker новым, если он ещё не заменён (executor – исполнитель, с которым случился сбой).
+    # Процессы заменяемого исполнителя завершаются: начатые и ожидающие в его очереди расчёты завершаются
+    # с BrokenProcessPool и освобождают места в очереди. Состояния сессий, закреплённых за процессом,
+    # теряются вместе с ним; в новом процессе сессии открываются заново с пустым состоянием
+    def restart_worker(self, worker, executor):
+        with self.lock:
+            if self.executors[worker] is not executor:
+                return self.executors[worker]
+            self.executors[worker] = self.create_executor()
+            session_keys = [key for key, session_worker in self.session_workers.items() if session_worker == worker]
+        if self.kind == 'process':
+            # у ProcessPoolExecutor нет открытого способа завершить процессы
+            for process in list((getattr(executor, '_processes', None) or {}).values()):
+                process.terminate()
+        executor.shutdown(wait=self.kind == 'process', cancel_futures=True)
+        for key in session_keys:
+            self.call_in_worker(worker, open_state, key)
+        return self.executors[worker]
+
+    def release(self, worker):
+        with self.lock:
+            self.pending -= 1
+            self.loads[worker] -= 1
+        self.slots.release()
+
+    # Сессия закрепляется за процессом с наименьшим числом сессий; в пуле потоков состояние общее
+    def open_session(self, key):
+        with self.lock:
+            sessions_by_worker = [0] * len(self.executors)
+            for worker in self.session_workers.values():
+                sessions_by_worker[worker] += 1
+            worker = min(range(len(self.executors)), key=lambda i: (sessions_by_worker[i], self.loads[i]))
+            self.session_workers[key] = worker
+            self.sequences[key] = {}
+        self.call_in_worker(worker, open_state, key)
+
+    def close_session(self, key):
+        with self.lock:
+            worker = self.session_workers.pop(key, None)
+            self.sequences.pop(key, None)
+        if worker is not None:
+            self.call_in_worker(worker, close_state, key)
+
+    def next_sequence(self, key, slot):
+        with self.lock:
+            sequence = self.sequences[key].get(slot, 0) + 1
+            self.sequences[key][slot] = sequence
+        return sequence
+
+    # Расчёт function(state, *args) -> (новое состояние, результат) с состоянием слота slot сессии key
+    # в закреплённом за ней исполнителе; возвращается результат. Состояние не передаётся между процессами
+    async def run_in_session(self, key, slot, function, *args):
+        sequence = self.next_sequence(key, slot)
+        return await self.run(run_with_state, key, slot, sequence, function, *args,
+                              worker=self.session_workers[key])
+
+    # Замена состояния слота сессии (None – сброс, например после прерванного по времени расчёта)
+    def set_session_state(self, key, slot, state=None):
+        self.call_in_worker(self.session_workers[key], store_state, key, slot, self.next_sequence(key, slot), state)
+
+    # Служебные вызовы выполняются вне очереди расчётов: в пуле потоков – сразу (словарь состояний общий),
+    # в процессе – после уже принятых им расчётов
+    def call_in_worker(self, worker, function, *args):
+        if self.kind == 'thread':
+            function(*args)
+            return
+        try:
+            self.executors[worker].submit(function, *args)
+        except RuntimeError:
+            # пул уже остановлен: вместе с процессами удалены и состояния сессий
+            pass
+
+    def is_full(self):
+        return self.pending >= self.max_pending
+
+    def stats(self):
+        return {'kind': self.kind, 'workers': self.max_workers, 'pending': self.pending,
+                'max_pending': self.max_pending, 'sessions': len(self.session_workers)}
+
+    def shutdown(self):
+        for executor in self.executors:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,113 @@
+import copy
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from circuit_calculator import parse_circuit  # noqa: E402
+from circuit_calculator.circuit_generators import GENERATORS  # noqa: E402, F401
+from circuit_calculator.method_selector import ANALYZING_METHODS, solve_with_method  # noqa: E402
+
+
+# Эталон для проверок – расчёт цепи с нуля (разбор сообщения и solve_circuit) без обновлений
+def solve_fresh(data, **solver_options):
+    circuit_graph = parse_circuit(copy.deepcopy(data))
+    circuit_graph.solve_circuit(**solver_options)
+    return circuit_graph
+
+
+# Расчёт заданным методом ('mna', 'cg', 'mca') или с выбором метода ('auto')
+def solve_with(data, method):
+    circuit_graph = parse_circuit(copy.deepcopy(data))
+    if method == 'auto':
+        circuit_graph.solve_circuit()
+    elif method == 'cg':
+        # токи сравниваются с расчётом LU-разложением до 1e-9: невязка меньше CG_TOLERANCE
+        circuit_graph.solve_circuit_using_mna(solver='cg', tol=1e-13)
+        circuit_graph.analyzing_method = ANALYZING_METHODS[method]
+    else:
+        solve_with_method(circuit_graph, method)
+        circuit_graph.analyzing_method = ANALYZING_METHODS[method]
+    return circuit_graph
+
+
+# Токи ветвей в их исходных направлениях, в порядке ветвей графа
+def branch_currents(circuit_graph):
+    return np.array([edge.current_strength if edge.current_direction.start_node is edge.direction.start_node
+                     else -edge.current_strength for edge in circuit_graph.edges.values()])
+
+
+def node_potentials(circuit_graph, reference):
+    potentials = np.array([node.potential for node in circuit_graph.nodes.values()])
+    return potentials - circuit_graph.nodes[reference].potential
+
+
+# Копия сообщения с изменённым номиналом element_index-го элемента типа element_type ветви edge_id
+def with_value(data, edge_id, element_type, value, element_index=0):
+    data = copy.deepcopy(data)
+    edge = next(edge for edge in data['edges'] if edge['id'] == edge_id)
+    elements = [element for element in edge['elements'] if element['type'] == element_type]
+    elements[element_index]['value'] = value
+    return data
+
+
+# Две цепи, соединённые мостом
+def join_with_bridge(first, second):
+    offset = max(first['nodes'])
+    edge_offset = max(edge['id'] for edge in first['edges'])
+    edges = copy.deepcopy(first['edges'])
+    for edge in second['edges']:
+        elements = []
+        for element in edge['elements']:
+            element = dict(element)
+            if 'direction' in element:
+                element['direction'] = {'from': element['direction']['from'] + offset,
+                                        'to': element['direction']['to'] + offset}
+            elements.append(element)
+        edges.append({'id': edge['id'] + edge_offset, 'from': edge['from'] + offset, 'to': edge['to'] + offset,
+                      'elements': elements})
+    edges.append({'id': len(edges) + 1, 'from': first['nodes'][-1], 'to': second['nodes'][0] + offset,
+                  'elements': [{'type': 'resistor', 'value': 10}]})
+    return {'nodes': first['nodes'] + [node + offset for node in second['nodes']], 'edges': edges}
+
+
+# Цепочка из num_nodes узлов: источник между первым и последним узлом, резисторы между соседними –
+# один контур длиной num_nodes ветвей (глубина обхода графа – num_nodes)
+def form_chain(num_nodes):
+    edges = [{'id': i, 'from': i, 'to': i + 1, 'elements': [{'type': 'resistor', 'value': 1 + i % 7}]}
+             for i in range(1, num_nodes)]
+    edges.append({'id': num_nodes, 'from': num_nodes, 'to': 1, 'elements': [
+        {'type': 'resistor', 'value': 5},
+        {'type': 'voltageSource', 'value': 12, 'direction': {'from': num_nodes, 'to': 1}}]})
+    return {'nodes': list(range(1, num_nodes + 1)), 'edges': edges}
+
+
+# Номиналы цепи из источника с резистором и реактивного элемента (см. form_series_circuit)
+RESISTANCE, CAPACITANCE, INDUCTANCE, VOLTAGE = 1000, 1e-6, 0.1, 5
+
+
+# Источник напряжения с резистором и реактивный элемент, замыкающий контур
+def form_series_circuit(element):
+    return {
+        'nodes': [1, 2],
+        'edges': [
+            {'id': 1, 'from': 1, 'to': 2, 'elements': [
+                {'type': 'resistor', 'value': RESISTANCE},
+                {'type': 'voltageSource', 'value': VOLTAGE, 'direction': {'from': 1, 'to': 2}}]},
+            {'id': 2, 'from': 2, 'to': 1, 'elements': [element]},
+        ],
+    }
+
+
+# Клиент приложения сервера, общий для всех тестов: при остановке приложения сессии завершаются (см. main.py),
+# и после этого сервер не принимает новые сессии
+@pytest.fixture(scope='session')
+def client():
+    os.environ.setdefault('SOLVER_WARMUP', '0')
+    from fastapi.testclient import TestClient
+    import main
+    with TestClient(main.app) as client:
+        yield client
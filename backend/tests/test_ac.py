@@ -0,0 +1,43 @@
+import copy
+
+import numpy as np
+import pytest
+
+from circuit_calculator import ELEMENT_TYPES, parse_circuit, parse_update
+
+from conftest import CAPACITANCE, GENERATORS, INDUCTANCE, RESISTANCE, VOLTAGE, branch_currents, form_series_circuit, \
+    solve_fresh
+
+
+# AC-анализ резистивной цепи на любой частоте совпадает с расчётом постоянного тока
+@pytest.mark.parametrize('topology', ['grid', 'specific'])
+def test_ac_of_resistive_circuit_matches_dc(topology):
+    data = GENERATORS[topology](300, 18)
+    _, currents = parse_circuit(copy.deepcopy(data)).ac_sweep([1, 50, 1e6], max_workers=2)
+    dc_currents = branch_currents(solve_fresh(data))
+    for frequency_currents in currents:
+        np.testing.assert_allclose(frequency_currents, dc_currents, rtol=1e-7, atol=1e-9)
+
+
+# Ток RC- и RL-цепи: E / (R + 1 / (jwC)) и E / (R + jwL)
+@pytest.mark.parametrize('element_type', ['capacitor', 'inductor'])
+def test_ac_matches_impedance(element_type):
+    value = CAPACITANCE if element_type == 'capacitor' else INDUCTANCE
+    frequencies = np.array([10, 159.15, 1e4])
+    _, currents = parse_circuit(form_series_circuit({'type': element_type, 'value': value})).ac_sweep(frequencies)
+    omega = 2 * np.pi * frequencies
+    impedance = RESISTANCE + (1 / (1j * omega * value) if element_type == 'capacitor' else 1j * omega * value)
+    # ветви контура направлены по обходу контура, ток обеих ветвей – контурный ток
+    np.testing.assert_allclose(currents[:, 0], VOLTAGE / impedance, rtol=1e-9)
+    np.testing.assert_allclose(currents[:, 1], currents[:, 0], rtol=1e-9)
+
+
+# Цепь с конденсатором в режиме постоянного тока не рассчитывается: изменённый номинал используется AC-анализом
+def test_capacitor_update_applies_to_ac():
+    circuit_graph = parse_circuit(form_series_circuit({'type': 'capacitor', 'value': CAPACITANCE}))
+    update = parse_update({'type': 'update', 'edge': 2, 'element': 'capacitor', 'value': 2 * CAPACITANCE})
+    assert update[1] is ELEMENT_TYPES['capacitor']
+    assert circuit_graph.update_element(*update)['method'] == 'element update'
+    _, currents = circuit_graph.ac_sweep([100])
+    omega = 2 * np.pi * 100
+    np.testing.assert_allclose(currents[0, 0], VOLTAGE / (RESISTANCE + 1 / (1j * omega * 2 * CAPACITANCE)), rtol=1e-9)
@@ -0,0 +1,51 @@
+import copy
+
+import numpy as np
+import pytest
+
+from circuit_calculator import parse_circuit, parse_transient
+
+from conftest import GENERATORS, branch_currents, node_potentials, solve_fresh
+
+
+def potentials(circuit_graph):
+    return np.array([node.potential for node in circuit_graph.nodes.values()])
+
+
+# Потенциал заданного базового узла равен нулю в графе цепи и в компактном представлении
+@pytest.mark.parametrize('topology', ['grid', 'specific'])
+def test_requested_basis_node(topology):
+    data = GENERATORS[topology](200, 8)
+    # в цепи с идеальными источниками базовым может быть только узел особой ветви: берётся узел,
+    # выбранный по правилу seed
+    circuit_graph = parse_circuit({**copy.deepcopy(data), 'basisPolicy': 'seed', 'seed': 3})
+    labels = list(circuit_graph.nodes)
+    basis_node = labels[circuit_graph.choose_basis_node(circuit_graph.find_specific_edges())[0]]
+    circuit_graph = solve_fresh({**data, 'basisNode': int(basis_node)}, solver='direct')
+    assert circuit_graph.nodes[basis_node].potential == 0
+    circuit = parse_circuit(copy.deepcopy({**data, 'basisNode': int(basis_node)}), compact=True)
+    circuit.solve_circuit()
+    assert circuit.node_potentials[labels.index(basis_node)] == 0
+    np.testing.assert_allclose(circuit.node_potentials, node_potentials(circuit_graph, basis_node),
+                               rtol=1e-7, atol=1e-8)
+
+
+# Одинаковые сообщения дают побитово одинаковые результаты; seed задаёт базовый узел воспроизводимо
+@pytest.mark.parametrize('policy', [{}, {'basisPolicy': 'seed', 'seed': 5}])
+def test_identical_inputs_give_identical_results(policy):
+    data = {**GENERATORS['random'](300, 9), **policy}
+    first, second = solve_fresh(data), solve_fresh(data)
+    assert first.basis_node_index == second.basis_node_index
+    assert np.array_equal(potentials(first), potentials(second))
+    assert np.array_equal(branch_currents(first), branch_currents(second))
+
+
+# Переходный процесс рассчитывается относительно базового узла из сообщения
+def test_transient_basis_node():
+    data = GENERATORS['grid'](100, 10)
+    basis_node = data['nodes'][17]
+    analysis, _, _ = parse_transient(
+        {**data, 'type': 'transient', 'timeStep': 1e-3, 'steps': 2, 'basisNode': basis_node})
+    assert analysis.basis_node_index == 17
+    _, node_potentials, _ = analysis.step()
+    assert node_potentials[17] == 0
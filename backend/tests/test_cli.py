@@ -0,0 +1,55 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from circuit_calculator import parse_circuit
+
+from conftest import GENERATORS, branch_currents, solve_fresh
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+
+def run_cli(*args, input=None):
+    return subprocess.run([sys.executable, '-m', 'circuit_calculator', *args], cwd=SRC, input=input,
+                          capture_output=True, text=True, timeout=120)
+
+
+# Консольный расчёт: строка JSON на каждый файл, ошибка в одном файле не прерывает остальные,
+# веб-сервер не загружается
+def test_solve_files(tmp_path):
+    data = GENERATORS['grid'](100, 11)
+    path = tmp_path / 'circuit.json'
+    path.write_text(json.dumps(data))
+    broken = tmp_path / 'broken.json'
+    broken.write_text('{"nodes": [1]')
+    completed = run_cli('solve', str(path), str(broken), '--profile', '--timing')
+    assert completed.returncode == 1
+    solved, failed = [json.loads(line) for line in completed.stdout.splitlines()]
+    assert solved['file'] == str(path) and 'profile' in solved and failed['file'] == str(broken)
+    assert 'error' in failed and '2 files (1 failed)' in completed.stderr
+    currents = {current['id']: current['current'] for current in solved['calculation_result']['branch_currents']}
+    expected = {current['id']: current['current'] for current in parse_circuit(data).solve_circuit()['branch_currents']}
+    assert currents.keys() == expected.keys()
+    np.testing.assert_allclose([currents[key] for key in expected], list(expected.values()), rtol=1e-7, atol=1e-9)
+
+
+def test_solve_standard_input():
+    data = GENERATORS['ladder'](50, 12)
+    completed = run_cli('solve', '-', input=json.dumps(data))
+    assert completed.returncode == 0
+    result = json.loads(completed.stdout)['calculation_result']
+    assert len(result['branch_currents']) == len(branch_currents(solve_fresh(data)))
+
+
+# Консольная программа не загружает веб-сервер
+def test_no_web_imports(tmp_path):
+    path = tmp_path / 'circuit.json'
+    path.write_text(json.dumps(GENERATORS['ladder'](20, 13)))
+    code = ('import sys; from circuit_calculator.__main__ import main; main(["solve", sys.argv[1], "--output", '
+            'sys.argv[2]]); print(sorted(m for m in ("fastapi", "uvicorn", "starlette") if m in sys.modules))')
+    completed = subprocess.run([sys.executable, '-c', code, str(path), str(tmp_path / 'out.jsonl')], cwd=SRC,
+                               capture_output=True, text=True, timeout=120)
+    assert completed.returncode == 0 and completed.stdout.strip() == '[]'
@@ -0,0 +1,56 @@
+import copy
+import io
+
+import numpy as np
+import pytest
+
+from circuit_calculator import form_binary_circuit, parse_binary_circuit, parse_circuit
+from circuit_calculator.circuit_parser import load_binary_arrays
+
+from conftest import GENERATORS, branch_currents, node_potentials, solve_fresh, solve_with
+
+
+# Компактное представление (LU-разложение, метод сопряжённых градиентов и выбор решателя по модели стоимости)
+# даёт те же токи и потенциалы, что и граф цепи (метод узловых потенциалов)
+@pytest.mark.parametrize('solver', [None, 'direct', 'cg'])
+@pytest.mark.parametrize('topology', ['ladder', 'grid', 'grid3d', 'random', 'specific'])
+def test_compact_matches_graph(topology, solver):
+    data = GENERATORS[topology](400, 15)
+    circuit = parse_circuit(copy.deepcopy(data), compact=True)
+    if solver == 'cg' and topology == 'specific':
+        # идеальные источники напряжения делают матрицу знаконеопределённой
+        with pytest.raises(Exception, match='conjugate gradient'):
+            circuit.solve_circuit(solver=solver)
+        return
+    result = circuit.solve_circuit(solver=solver)
+    circuit_graph = solve_with(data, 'mna')
+    np.testing.assert_allclose(circuit.edge_currents, branch_currents(circuit_graph), rtol=1e-7, atol=1e-8)
+    reference = str(data['nodes'][0])
+    np.testing.assert_allclose(circuit.node_potentials - circuit.node_potentials[0],
+                               node_potentials(circuit_graph, reference), rtol=1e-7, atol=1e-8)
+    if solver is None:
+        assert result['selection']['method'] in result['selection']['candidates']
+
+
+def test_binary_circuit_matches_graph():
+    data = GENERATORS['random'](300, 16)
+    circuit = parse_binary_circuit(form_binary_circuit(data))
+    circuit.solve_circuit()
+    np.testing.assert_allclose(circuit.edge_currents, branch_currents(solve_fresh(data)), rtol=1e-7, atol=1e-8)
+
+
+# Массивы архива из файла отображаются в память, сжатый архив читается целиком
+@pytest.mark.parametrize('compressed', [False, True])
+def test_binary_circuit_from_file(tmp_path, compressed):
+    data = GENERATORS['grid'](300, 17)
+    path = tmp_path / 'circuit.npz'
+    with np.load(io.BytesIO(form_binary_circuit(data))) as archive:
+        arrays = {name: archive[name] for name in archive.files}
+    (np.savez_compressed if compressed else np.savez)(path, **arrays)
+    mapped = load_binary_arrays(path)
+    for name, array in arrays.items():
+        assert isinstance(mapped[name], np.memmap) != compressed
+        np.testing.assert_array_equal(mapped[name], array)
+    circuit = parse_binary_circuit(str(path))
+    circuit.solve_circuit()
+    np.testing.assert_allclose(circuit.edge_currents, branch_currents(solve_fresh(data)), rtol=1e-7, atol=1e-8)
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from circuit_calculator import ELEMENT_TYPES, parse_circuit
+from circuit_calculator.linear_solver import CG_TOLERANCE
+
+from conftest import GENERATORS, branch_currents, solve_fresh
+
+
+# Число итераций и относительная невязка метода сопряжённых градиентов передаются в результате,
+# токи совпадают с расчётом LU-разложением
+@pytest.mark.parametrize('preconditioner', ['jacobi', 'ic'])
+def test_iterations_and_residual_in_result(preconditioner):
+    data = GENERATORS['grid'](400, 19)
+    circuit_graph = parse_circuit(data)
+    result = circuit_graph.solve_circuit(solver='cg', preconditioner=preconditioner)
+    assert result['solver']['name'] == 'conjugate gradient'
+    assert result['solver']['iterations'] > 0
+    assert result['solver']['residual'] <= CG_TOLERANCE
+    np.testing.assert_allclose(branch_currents(circuit_graph), branch_currents(solve_fresh(data, solver='direct')),
+                               rtol=1e-7, atol=1e-8)
+
+
+# После изменения номинала расчёт начинается с предыдущего решения и требует меньше итераций
+def test_update_starts_from_previous_solution():
+    data = GENERATORS['grid'](900, 20)
+    circuit_graph = parse_circuit(data)
+    first = circuit_graph.solve_circuit(solver='cg')
+    resistance = data['edges'][10]['elements'][0]['value']
+    second = circuit_graph.update_element('11', ELEMENT_TYPES['resistor'], resistance * 1.01)
+    assert second['solver']['iterations'] < first['solver']['iterations']
+
+
+# Явно заданный решатель относится к методу узловых потенциалов: выбор метода ограничивается им,
+# расчёт не подменяется методом контурных токов
+def test_explicit_solver_selects_nodal_analysis():
+    data = GENERATORS['ladder'](100, 21)
+    for solver, method in (('direct', 'mna'), ('cg', 'cg')):
+        result = parse_circuit(data).solve_circuit(solver=solver)
+        assert result['method'] == 'modified nodal analysis' and result['selection']['candidates'] == [method]
+    with pytest.raises(Exception, match='unknown solver'):
+        parse_circuit(data).solve_circuit(solver='gauss')
+    with pytest.raises(Exception, match='not applicable'):
+        parse_circuit(GENERATORS['specific'](100, 21)).solve_circuit(solver='cg')
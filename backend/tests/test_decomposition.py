@@ -0,0 +1,42 @@
+import copy
+
+import numpy as np
+import pytest
+
+from circuit_calculator import parse_circuit
+
+from conftest import GENERATORS, branch_currents, join_with_bridge, node_potentials, solve_fresh, solve_with
+
+
+# Расчёт по блокам (согласование потенциалов по шарнирным узлам) совпадает с расчётом всей цепи
+@pytest.mark.parametrize('topologies', [('grid', 'ladder'), ('specific', 'random')])
+def test_blocks_match_whole_circuit(topologies):
+    data = join_with_bridge(GENERATORS[topologies[0]](80, 11), GENERATORS[topologies[1]](80, 12))
+    circuit_graph = solve_fresh(data)
+    assert circuit_graph.analyzing_method == 'block decomposition'
+    whole_graph = parse_circuit(copy.deepcopy(data))
+    whole_graph.analyze_circuit(decompose=False, solver='direct')
+    np.testing.assert_allclose(branch_currents(circuit_graph), branch_currents(whole_graph), rtol=1e-7, atol=1e-9)
+    reference = str(data['nodes'][0])
+    np.testing.assert_allclose(node_potentials(circuit_graph, reference), node_potentials(whole_graph, reference),
+                               rtol=1e-7, atol=1e-9)
+
+
+# Несвязная цепь рассчитывается по компонентам связности: токи – как при отдельном расчёте каждой компоненты
+def test_disconnected_circuit_matches_components():
+    first, second = GENERATORS['grid'](60, 13), GENERATORS['ladder'](60, 14)
+    data = join_with_bridge(first, second)
+    data['edges'].pop()
+    circuit_graph = solve_fresh(data)
+    assert circuit_graph.analyzing_method == 'block decomposition'
+    component_currents = np.concatenate([branch_currents(solve_fresh(first)), branch_currents(solve_fresh(second))])
+    np.testing.assert_allclose(branch_currents(circuit_graph), component_currents, rtol=1e-7, atol=1e-9)
+
+
+# Потенциалы узлов для передачи частями при расчёте методом контурных токов восстанавливаются по токам ветвей
+def test_mesh_analysis_exports_potentials():
+    data = GENERATORS['grid'](100, 15)
+    solution = solve_with(data, 'mca').export_solution()
+    reference = str(data['nodes'][0])
+    np.testing.assert_allclose(solution['node_potentials'] - solution['node_potentials'][0],
+                               node_potentials(solve_with(data, 'mna'), reference), rtol=1e-7, atol=1e-9)
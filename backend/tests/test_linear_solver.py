@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from circuit_calculator.linear_solver import SingularMatrixError, factorize
+
+
+# Матрица уравнений узлов двух цепочек, связанных проводимостью 1e-12: проводимости ветвей первой цепочки
+# порядка 1e6, второй – порядка 1e-12. grounded = False – цепь не заземлена, матрица вырождена
+def form_matrix(num_nodes, grounded=True):
+    half = num_nodes // 2
+    chain = sp.diags([-np.ones(half - 1), np.full(half, 2.0), -np.ones(half - 1)], [-1, 0, 1], format='lil')
+    if grounded:
+        chain[0, 0] += 0.5
+    else:
+        chain[0, 0] = chain[-1, -1] = 1.0
+    A = sp.block_diag([1e6 * chain, 1e-12 * chain], format='lil')
+    A[half - 1, half - 1] += 1e-12
+    A[half, half] += 1e-12
+    A[half - 1, half] -= 1e-12
+    A[half, half - 1] -= 1e-12
+    return A.tocsr()
+
+
+# Плотное (до DENSE_THRESHOLD неизвестных) и разреженное LU-разложение: ведущие элементы сравниваются
+# с масштабом своего столбца, поэтому цепь с проводимостями 1e6 и 1e-12 не считается вырожденной
+@pytest.mark.parametrize('num_nodes', [40, 400])
+def test_wide_conductance_spread(num_nodes):
+    A = form_matrix(num_nodes)
+    x = np.random.default_rng(0).random(num_nodes)
+    np.testing.assert_allclose(factorize(A).solve(A @ x), x, rtol=1e-6)
+
+
+@pytest.mark.parametrize('num_nodes', [40, 400])
+def test_singular_matrix(num_nodes):
+    with pytest.raises(SingularMatrixError):
+        factorize(form_matrix(num_nodes, grounded=False))
@@ -0,0 +1,59 @@
+import pytest
+
+from circuit_calculator import CostModel, parse_circuit, set_cost_model
+from circuit_calculator.method_selector import DEFAULT_COEFFICIENTS, get_cost_model
+
+from conftest import GENERATORS, branch_currents, solve_fresh
+
+
+# Модель стоимости с коэффициентами метода контурных токов, умноженными на mca_scale,
+# и коэффициентом уточнения длины контуров probe
+def scaled_model(mca_scale, probe=DEFAULT_COEFFICIENTS['mca']['probe']):
+    coefficients = {method: dict(stages) for method, stages in DEFAULT_COEFFICIENTS.items()}
+    coefficients['mca'] = {stage: value * mca_scale for stage, value in coefficients['mca'].items()}
+    coefficients['mca']['probe'] = probe
+    return CostModel(coefficients)
+
+
+@pytest.fixture
+def cost_model():
+    default = get_cost_model()
+    yield set_cost_model
+    set_cost_model(default)
+
+
+# Метод контурных токов выбирается из нескольких кандидатов только после уточнения длины контуров
+# по остовному дереву; если уточнение дороже выигрыша, метод не выбирается
+@pytest.mark.parametrize('mca_scale, probe', [(1, DEFAULT_COEFFICIENTS['mca']['probe']), (1e-6, 0), (1e-6, 1e3)])
+@pytest.mark.parametrize('topology', ['ladder', 'grid', 'random', 'specific'])
+def test_mesh_analysis_is_never_selected_unprobed(cost_model, topology, mca_scale, probe):
+    cost_model(scaled_model(mca_scale, probe))
+    circuit_graph = parse_circuit(GENERATORS[topology](300, 6))
+    method, selection = get_cost_model().select(circuit_graph)
+    if method == 'mca' and len(selection['candidates']) > 1:
+        assert circuit_graph.spanning_tree is not None
+    if probe == 1e3:
+        assert method != 'mca' or selection['candidates'] == ['mca']
+
+
+# Цепь с той же топологией рассчитывается методом из структуры решения без повторного выбора
+def test_selected_method_from_structure_is_reused(cost_model, monkeypatch):
+    data = GENERATORS['grid'](300, 7)
+    cost_model(scaled_model(1e-6, 0))
+    circuit_graph = parse_circuit(data)
+    circuit_graph.solve_circuit()
+    assert circuit_graph.analyzing_method == 'mesh current analysis'
+    structure = circuit_graph.export_structure()
+    assert structure['selected_method'] == 'mca'
+    cost_model(scaled_model(1))
+
+    def select(*args, **kwargs):
+        raise AssertionError('method selected again')
+    monkeypatch.setattr(CostModel, 'select', select)
+    circuit_graph = parse_circuit(data)
+    circuit_graph.structure = structure
+    circuit_graph.solve_circuit()
+    assert circuit_graph.analyzing_method == 'mesh current analysis'
+    monkeypatch.undo()
+    expected = branch_currents(solve_fresh(data))
+    assert branch_currents(circuit_graph) == pytest.approx(expected, rel=1e-7, abs=1e-9)
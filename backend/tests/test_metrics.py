@@ -0,0 +1,37 @@
+from circuit_calculator import SolveMetrics, metrics
+
+from conftest import GENERATORS
+
+
+# Профиль расчёта учитывается в счётчике запросов и гистограммах времени этапов и размеров цепи
+def test_render_profile():
+    solve_metrics = SolveMetrics()
+    with metrics.profile() as profile:
+        with metrics.stage('assembly'):
+            pass
+        metrics.record(type='circuit', method='modified nodal analysis', nodes=50)
+    solve_metrics.observe_profile(profile.to_dict())
+    solve_metrics.count_dropped('superseded', 2)
+    text = solve_metrics.render({'circuit_sessions': ('gauge', 'Open websocket sessions', 3)})
+    assert 'circuit_requests_total{method="modified nodal analysis",type="circuit"} 1' in text
+    assert 'circuit_stage_seconds_count{stage="assembly"} 1' in text
+    assert 'circuit_size_bucket{quantity="nodes",le="100"} 1' in text
+    assert 'circuit_size_bucket{quantity="nodes",le="10"} 0' in text
+    assert 'circuit_dropped_total{reason="superseded"} 2' in text
+    assert '# TYPE circuit_sessions gauge\ncircuit_sessions 3\n' in text
+
+
+# Профиль прикладывается к ответу только по запросу клиента ("profile": true); расчёт виден в /metrics
+def test_profile_in_reply(client):
+    data = GENERATORS['grid'](50, 3)
+    with client.websocket_connect('/ws') as websocket:
+        websocket.send_json({**data, 'profile': True})
+        reply = websocket.receive_json()
+        websocket.send_json(GENERATORS['grid'](50, 4))
+        assert 'profile' not in websocket.receive_json()
+    text = client.get('/metrics').text
+    profile = reply['profile']
+    assert profile['method'] == reply['calculation_result']['method']
+    assert profile['nodes'] == len(data['nodes']) and profile['edges'] == len(data['edges'])
+    assert profile['stages'] and profile['total_time'] > 0
+    assert f'circuit_requests_total{{method="{profile["method"]}",type="circuit"}}' in text
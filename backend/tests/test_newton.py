@@ -0,0 +1,48 @@
+import copy
+
+import numpy as np
+import pytest
+
+from circuit_calculator.components import THERMAL_VOLTAGE
+
+from conftest import GENERATORS, branch_currents, solve_fresh
+
+
+# Нелинейный резистор с линейной характеристикой I = V / R рассчитывается методом Ньютона
+# с тем же результатом, что и резистор R (с точностью до проводимости GMIN)
+@pytest.mark.parametrize('modified', [False, True])
+def test_linear_characteristic_matches_resistor(modified):
+    data = GENERATORS['grid'](60, 10)
+    nonlinear_data = copy.deepcopy(data)
+    nonlinear_data['newton'] = {'modified': modified}
+    for edge in nonlinear_data['edges'][::4]:
+        if [element['type'] for element in edge['elements']] == ['resistor']:
+            resistance = edge['elements'][0]['value']
+            edge['elements'] = [{'type': 'nonlinearResistor', 'coefficients': [1 / resistance],
+                                 'direction': {'from': edge['from'], 'to': edge['to']}}]
+    circuit_graph = solve_fresh(nonlinear_data)
+    assert circuit_graph.analyzing_method == 'nonlinear nodal analysis'
+    np.testing.assert_allclose(branch_currents(circuit_graph), branch_currents(solve_fresh(data)),
+                               rtol=1e-7, atol=1e-9)
+
+
+# Источник 5 В с резистором 1 кОм, параллельно – диод в прямом направлении:
+# ток диода удовлетворяет уравнению Шокли, токи ветвей – первому закону Кирхгофа
+def test_diode_operating_point():
+    saturation_current = 1e-14
+    data = {
+        'nodes': [1, 2],
+        'edges': [
+            {'id': 1, 'from': 2, 'to': 1, 'elements': [
+                {'type': 'resistor', 'value': 1000},
+                {'type': 'voltageSource', 'value': 5, 'direction': {'from': 2, 'to': 1}}]},
+            {'id': 2, 'from': 1, 'to': 2, 'elements': [
+                {'type': 'diode', 'value': saturation_current, 'direction': {'from': 1, 'to': 2}}]},
+        ],
+    }
+    circuit_graph = solve_fresh(data)
+    source_current, diode_current = branch_currents(circuit_graph)
+    voltage = circuit_graph.nodes['1'].potential - circuit_graph.nodes['2'].potential
+    assert 0.5 < voltage < 0.8
+    np.testing.assert_allclose(diode_current, saturation_current * np.expm1(voltage / THERMAL_VOLTAGE), rtol=1e-6)
+    np.testing.assert_allclose(source_current, diode_current, rtol=1e-6)
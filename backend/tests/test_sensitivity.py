@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from circuit_calculator import ELEMENT_TYPES
+
+from conftest import GENERATORS, branch_currents, node_potentials, solve_fresh, solve_with, with_value
+
+
+def find_outputs(circuit_graph, data):
+    edge_index = {label: k for k, label in enumerate(circuit_graph.edges)}
+    node_index = {label: k for k, label in enumerate(circuit_graph.nodes)}
+    edge_ids = [edge['id'] for edge in data['edges'][:3]] + [data['edges'][-1]['id']]
+    nodes = data['nodes'][1], data['nodes'][-1]
+    outputs = [('current', str(edge_id)) for edge_id in edge_ids] + [('potential', str(nodes[1]), str(nodes[0]))]
+
+    def evaluate(graph):
+        currents = branch_currents(graph)
+        potentials = node_potentials(graph, str(nodes[0]))
+        return np.array([currents[edge_index[str(edge_id)]] for edge_id in edge_ids]
+                        + [potentials[node_index[str(nodes[1])]]])
+    return outputs, evaluate
+
+
+# Производные по номиналам (метод сопряжённой системы) совпадают с центральными разностями расчётов с нуля;
+# по источникам выходы линейны, по сопротивлениям погрешность разностей – O(h^2)
+@pytest.mark.parametrize('method', ['mna', 'mca'])
+@pytest.mark.parametrize('topology', ['grid', 'specific'])
+def test_sensitivity_matches_finite_differences(topology, method):
+    data = GENERATORS[topology](120, 8)
+    circuit_graph = solve_with(data, method)
+    outputs, evaluate = find_outputs(circuit_graph, data)
+    source_edge = next(edge for edge in data['edges']
+                       if [element['type'] for element in edge['elements']] == ['resistor', 'voltageSource'])
+    parameters = [(source_edge['id'], 'resistor'), (source_edge['id'], 'voltageSource'),
+                  (data['edges'][-1]['id'], 'resistor')]
+    gradients = circuit_graph.sensitivity(outputs, [(str(edge_id), ELEMENT_TYPES[element_type], 0)
+                                                    for edge_id, element_type in parameters])
+    for j, (edge_id, element_type) in enumerate(parameters):
+        edge = next(edge for edge in data['edges'] if edge['id'] == edge_id)
+        value = next(element['value'] for element in edge['elements'] if element['type'] == element_type)
+        h = 1e-4 * max(abs(value), 1)
+        # потенциалы узлов есть только в результате метода узловых потенциалов
+        difference = (evaluate(solve_fresh(with_value(data, edge_id, element_type, value + h), solver='direct'))
+                      - evaluate(solve_fresh(with_value(data, edge_id, element_type, value - h), solver='direct'))
+                      ) / (2 * h)
+        np.testing.assert_allclose(gradients[:, j], difference, rtol=1e-6, atol=1e-9)
+
+
+def test_sensitivity_to_all_parameters():
+    data = GENERATORS['ladder'](40, 9)
+    circuit_graph = solve_fresh(data)
+    outputs, _ = find_outputs(circuit_graph, data)
+    gradients = circuit_graph.sensitivity(outputs)
+    num_parameters = sum(len(edge['elements']) for edge in data['edges'])
+    assert gradients.shape == (len(outputs), num_parameters)
+    assert np.all(np.isfinite(gradients))
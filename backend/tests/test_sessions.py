@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from sessions import Mailbox, RateLimiter, SessionRegistry
+
+
+# Первые burst расчётов клиента начинаются сразу, следующие – с интервалом 1 / rate;
+# запас маркеров у каждого клиента свой
+def test_rate_limiter():
+    limiter = RateLimiter(rate=10, burst=3)
+    assert [limiter.reserve('a') for _ in range(3)] == [0, 0, 0]
+    assert limiter.reserve('a') == pytest.approx(0.1, abs=0.01)
+    assert limiter.reserve('a') == pytest.approx(0.2, abs=0.01)
+    assert limiter.reserve('b') == 0
+    assert RateLimiter().reserve('a') == 0
+
+    async def acquire():
+        limiter = RateLimiter(rate=20, burst=1)
+        await limiter.acquire('a')
+        start = asyncio.get_running_loop().time()
+        await limiter.acquire('a')
+        return asyncio.get_running_loop().time() - start
+    assert asyncio.run(acquire()) >= 0.04
+
+
+# Новая цепь вытесняет ожидающие цепи и команды, но не независимые запросы
+def test_mailbox_coalescing():
+    async def run():
+        mailbox = Mailbox(max_messages=4)
+        assert mailbox.put('first', 'circuit') == 0
+        assert mailbox.put('update', 'command') == 0
+        assert mailbox.put('transient', 'independent') == 0
+        mailbox.superseded.clear()
+        assert mailbox.put('second', 'circuit') == 2
+        assert mailbox.superseded.is_set()
+        assert [mailbox.pop() for _ in range(2)] == [('transient', 'independent'), ('second', 'circuit')]
+        for i in range(4):
+            mailbox.put(i, 'independent')
+        assert mailbox.put(4, 'independent') is None
+        mailbox.close()
+        assert mailbox.put('third', 'circuit') is None
+        assert await mailbox.wait()
+    asyncio.run(run())
+
+
+# При завершении работы новые сессии не открываются, принятые сообщения дорабатываются,
+# обработка, не завершённая за timeout, отменяется
+def test_drain():
+    async def process(session, handled, delay):
+        while await session.mailbox.wait():
+            message, _ = session.mailbox.pop()
+            await asyncio.sleep(delay)
+            handled.append(message)
+
+    async def run():
+        registry = SessionRegistry(max_sessions=2)
+        handled = []
+        fast, slow = registry.open('a', 8), registry.open('b', 8)
+        assert not registry.can_open()
+        for session, delay in ((fast, 0.01), (slow, 10)):
+            session.mailbox.put(f'{session.client}1', 'independent')
+            session.mailbox.put(f'{session.client}2', 'independent')
+            session.task = asyncio.ensure_future(process(session, handled, delay))
+        await registry.drain(timeout=0.2)
+        assert not registry.can_open()
+        assert fast.mailbox.put('a3', 'independent') is None
+        assert handled == ['a1', 'a2'] and not fast.task.cancelled()
+        await asyncio.sleep(0)
+        assert slow.task.cancelled()
+    asyncio.run(run())
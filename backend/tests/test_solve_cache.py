@@ -0,0 +1,75 @@
+from circuit_calculator import SolveCache, canonicalize_circuit, parse_circuit
+from circuit_calculator.solve_cache import estimate_size, message_key, topology_key, values_key
+
+from conftest import GENERATORS, with_value
+
+
+def find_keys(data):
+    circuit_graph = parse_circuit(data)
+    return topology_key(circuit_graph), values_key(circuit_graph)
+
+
+# Записи вытесняются в порядке давности использования: чтение записи делает её последней
+def test_lru_eviction():
+    values = {key: [key] * 10 for key in 'abcd'}
+    cache = SolveCache(max_bytes=3 * estimate_size(values['a']))
+    for key in 'abc':
+        cache.put(key, values[key])
+    assert cache.get('a') == values['a']
+    cache.put('d', values['d'])
+    assert cache.get('b') is None
+    assert [cache.get(key) for key in 'acd'] == [values['a'], values['c'], values['d']]
+    assert cache.stats()['evictions'] == 1
+    # запись больше всего кэша не сохраняется и ничего не вытесняет
+    cache.put('e', list(range(1000)))
+    assert cache.get('e') is None and cache.stats()['entries'] == 3
+
+
+# При изменении номиналов меняется только ключ номиналов, при изменении направления источника – ключ топологии
+def test_keys_follow_values_and_topology():
+    data = GENERATORS['ladder'](40, 1)
+    topology, values = find_keys(data)
+    changed_topology, changed_values = find_keys(with_value(data, 1, 'resistor', 470))
+    assert changed_topology == topology and changed_values != values
+    reversed_source = with_value(data, 1, 'voltageSource', 5)
+    direction = reversed_source['edges'][0]['elements'][1]['direction']
+    direction['from'], direction['to'] = direction['to'], direction['from']
+    assert find_keys(reversed_source)[0] != topology
+
+
+# Промах, затем совпадение топологии (структура решения) и совпадение топологии и номиналов (готовый результат)
+def test_lookup_counters():
+    data = GENERATORS['grid'](50, 2)
+    cache = SolveCache()
+    topology, values = find_keys(data)
+    assert cache.lookup(topology, values) == (None, None)
+    cache.store(topology, values, {'method': 'modified nodal analysis'},
+                {'analyzing_method': 'modified nodal analysis'})
+    assert cache.lookup(topology, values) == ({'method': 'modified nodal analysis'}, None)
+    _, changed_values = find_keys(with_value(data, 1, 'resistor', 470))
+    assert cache.lookup(topology, changed_values) == (None, {'analyzing_method': 'modified nodal analysis'})
+    stats = cache.stats()
+    assert (stats['misses'], stats['hits'], stats['topology_hits']) == (1, 1, 1)
+
+
+# Ключ сообщения не зависит от порядка узлов, ветвей и полей сообщения и от поля profile
+def test_message_key_of_canonical_circuit():
+    data = GENERATORS['grid'](50, 3)
+    reordered = {'profile': True, 'edges': data['edges'][::-1], 'nodes': data['nodes'][::-1]}
+    assert message_key(canonicalize_circuit(reordered)) == message_key(canonicalize_circuit(data))
+    changed = with_value(data, 1, 'resistor', 1234)
+    assert message_key(canonicalize_circuit(changed)) != message_key(canonicalize_circuit(data))
+
+
+# Ответ на повторное сообщение с той же цепью берётся из кэша по содержимому сообщения
+def test_repeated_message_is_answered_from_cache(client):
+    import main
+    data = GENERATORS['grid'](50, 31)
+    message_hits = main.solve_cache.message_hits
+    with client.websocket_connect('/ws') as websocket:
+        websocket.send_json(data)
+        first = websocket.receive_json()
+        websocket.send_json({**data, 'edges': data['edges'][::-1]})
+        second = websocket.receive_json()
+    assert main.solve_cache.message_hits == message_hits + 1
+    assert second == first
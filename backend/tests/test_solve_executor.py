@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from solve_executor import SolveExecutor, SolverBusyError
+
+
+# Расчёт, который выполняется, пока не установлено событие release
+def wait_for(release, result):
+    release.wait(5)
+    return result
+
+
+# Очередь на одно место занята выполняемым расчётом: следующий расчёт сразу отклоняется
+def test_busy_when_queue_is_full():
+    async def run():
+        executor = SolveExecutor(kind='thread', max_workers=1, max_pending=1)
+        release = threading.Event()
+        try:
+            solve = asyncio.ensure_future(executor.run(wait_for, release, 'first'))
+            await asyncio.sleep(0.05)
+            with pytest.raises(SolverBusyError):
+                await executor.run(wait_for, release, 'second')
+            release.set()
+            assert await solve == 'first'
+            assert await executor.run(wait_for, release, 'third') == 'third'
+        finally:
+            release.set()
+            executor.shutdown()
+    asyncio.run(run())
+
+
+# Расчёт дольше timeout прерывается для клиента; место в очереди освобождается, когда расчёт завершится
+def test_timeout():
+    async def run():
+        executor = SolveExecutor(kind='thread', max_workers=1, max_pending=1, timeout=0.05)
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await executor.run(time.sleep, 0.3)
+            with pytest.raises(SolverBusyError):
+                await executor.run(time.sleep, 0)
+            await asyncio.sleep(0.5)
+            assert await executor.run(abs, -1) == 1
+        finally:
+            executor.shutdown()
+    asyncio.run(run())
+
+
+# Ожидающий в очереди расчёт отменяется вместе с задачей (например, при отключении клиента) и не выполняется
+def test_cancel_queued_solve():
+    async def run():
+        executor = SolveExecutor(kind='thread', max_workers=1, max_pending=2)
+        release = threading.Event()
+        calls = []
+        try:
+            first = asyncio.ensure_future(executor.run(wait_for, release, 'first'))
+            second = asyncio.ensure_future(executor.run(calls.append, 'second'))
+            await asyncio.sleep(0.05)
+            second.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await second
+            release.set()
+            assert await first == 'first'
+            assert await executor.run(abs, -1) == 1
+            assert calls == []
+        finally:
+            release.set()
+            executor.shutdown()
+    asyncio.run(run())
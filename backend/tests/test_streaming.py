@@ -0,0 +1,46 @@
+import pytest
+
+from conftest import GENERATORS
+
+
+# Части результата до итогового сообщения; ответ на ту же цепь без передачи частями – для сравнения
+def receive_stream(client, data, stream):
+    with client.websocket_connect('/ws') as websocket:
+        websocket.send_json({**data, 'stream': stream})
+        chunks = []
+        reply = websocket.receive_json()
+        while reply['message'] == 'circuit graph chunk':
+            chunks.append(reply['calculation_result'])
+            reply = websocket.receive_json()
+        websocket.send_json(data)
+        full = websocket.receive_json()['calculation_result']
+    return chunks, reply['calculation_result'], full
+
+
+# Каждая часть содержит не больше chunkSize записей, объединение частей совпадает с обычным ответом
+@pytest.mark.parametrize('chunk_size', [1, 7, 1000])
+def test_chunks_join_to_full_result(client, chunk_size):
+    chunks, summary, full = receive_stream(client, GENERATORS['grid'](60, 5), {'chunkSize': chunk_size})
+    assert all(len(chunk.get('node_potentials', chunk.get('branch_currents'))) <= chunk_size for chunk in chunks)
+    assert summary['chunks'] == len(chunks) and summary['method'] == full['method']
+    potentials = {}
+    currents = []
+    for chunk in chunks:
+        potentials.update(chunk.get('node_potentials', {}))
+        currents.extend(chunk.get('branch_currents', []))
+    assert list(potentials) == list(full.get('node_potentials', {}))
+    assert list(potentials.values()) == pytest.approx(list(full.get('node_potentials', {}).values()))
+    # ветви в частях следуют в порядке ветвей графа, в обычном ответе – в порядке обхода узлов
+    currents.sort(key=lambda current: current['id'])
+    expected = sorted(full['branch_currents'], key=lambda current: current['id'])
+    assert [(c['id'], c['from'], c['to']) for c in currents] == [(c['id'], c['from'], c['to']) for c in expected]
+    assert [c['current'] for c in currents] == pytest.approx([c['current'] for c in expected])
+
+
+# Передаются только запрошенные ветви
+def test_subset_of_branches(client):
+    chunks, summary, full = receive_stream(client, GENERATORS['grid'](60, 5), {'chunkSize': 2, 'branches': [3, 1, 8]})
+    currents = [current for chunk in chunks for current in chunk.get('branch_currents', [])]
+    expected = {current['id']: current['current'] for current in full['branch_currents']}
+    assert sorted(current['id'] for current in currents) == [1, 3, 8] and summary['branches'] == 3
+    assert [current['current'] for current in currents] == pytest.approx([expected[c['id']] for c in currents])
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from circuit_calculator import ELEMENT_TYPES, parse_circuit
+
+from conftest import GENERATORS, branch_currents, join_with_bridge, solve_fresh, with_value
+
+
+def fresh_currents(data, parameters, variant):
+    for (edge_id, element_type), value in zip(parameters, variant):
+        data = with_value(data, edge_id, element_type, value)
+    return branch_currents(solve_fresh(data))
+
+
+def sweep(data, parameters, values):
+    circuit_graph = parse_circuit(data)
+    return circuit_graph.sweep([(str(edge_id), ELEMENT_TYPES[element_type], 0)
+                                for edge_id, element_type in parameters], values)
+
+
+# Параметры пакетного расчёта: резистор и источник напряжения одной ветви и резистор другой ветви
+# или только источник напряжения (в цепи с ветвями без сопротивления – ветви с резистором)
+def find_parameters(data, sources_only):
+    source_edges = [edge['id'] for edge in data['edges']
+                    if [element['type'] for element in edge['elements']] == ['resistor', 'voltageSource']]
+    resistor_edges = [edge['id'] for edge in data['edges'] if edge['elements'][0]['type'] == 'resistor']
+    if sources_only:
+        return [(source_edges[0], 'voltageSource')], [[1], [-7], [12]]
+    parameters = [(source_edges[0], 'resistor'), (source_edges[0], 'voltageSource'), (resistor_edges[-1], 'resistor')]
+    return parameters, [[10, 5, 20], [1, -2, 300], [75, 0, 1]]
+
+
+# Каждый вариант пакетного расчёта совпадает с расчётом цепи с нуля: плотный пакет (до DENSE_THRESHOLD узлов),
+# разреженное LU-разложение и изменение только источников (одна факторизация на все варианты)
+@pytest.mark.parametrize('sources_only', [False, True])
+@pytest.mark.parametrize('size', [50, 500])
+@pytest.mark.parametrize('topology', ['grid', 'specific'])
+def test_sweep_matches_fresh_solve(topology, size, sources_only):
+    data = GENERATORS[topology](size, 5)
+    parameters, values = find_parameters(data, sources_only)
+    currents = sweep(data, parameters, values)
+    for variant, variant_currents in zip(values, currents):
+        np.testing.assert_allclose(variant_currents, fresh_currents(data, parameters, variant), rtol=1e-7, atol=1e-9)
+
+
+# Без моста цепь несвязна: узлы второй части заземляются при пакетном расчёте,
+# токи совпадают с расчётом каждой части отдельно
+def test_sweep_of_disconnected_circuit():
+    first, second = GENERATORS['ladder'](40, 6), GENERATORS['grid'](40, 7)
+    data = join_with_bridge(first, second)
+    data['edges'].pop()
+    parameters = [(2, 'resistor'), (len(data['edges']), 'resistor')]
+    values = [[3, 4], [50, 60]]
+    currents = sweep(data, parameters, values)
+    for (first_value, second_value), variant_currents in zip(values, currents):
+        expected = np.concatenate([fresh_currents(first, [(2, 'resistor')], [first_value]),
+                                   fresh_currents(second, [(len(second['edges']), 'resistor')], [second_value])])
+        np.testing.assert_allclose(variant_currents, expected, rtol=1e-7, atol=1e-9)
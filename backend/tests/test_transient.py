@@ -0,0 +1,46 @@
+import copy
+
+import numpy as np
+import pytest
+
+from circuit_calculator import TransientAnalysis, parse_circuit
+
+from conftest import CAPACITANCE, GENERATORS, INDUCTANCE, RESISTANCE, VOLTAGE, form_series_circuit
+
+
+# Ток RC- и RL-цепи при включении источника: E / R exp(-t / tau) и E / R (1 - exp(-t / tau))
+@pytest.mark.parametrize('method', ['backward_euler', 'trapezoidal'])
+@pytest.mark.parametrize('element_type', ['capacitor', 'inductor'])
+def test_step_response_matches_analytic(element_type, method):
+    if element_type == 'capacitor':
+        data = form_series_circuit({'type': 'capacitor', 'value': CAPACITANCE})
+        tau = RESISTANCE * CAPACITANCE
+        expected_current = lambda t: VOLTAGE / RESISTANCE * np.exp(-t / tau)  # noqa: E731
+    else:
+        data = form_series_circuit({'type': 'inductor', 'value': INDUCTANCE})
+        tau = INDUCTANCE / RESISTANCE
+        expected_current = lambda t: VOLTAGE / RESISTANCE * -np.expm1(-t / tau)  # noqa: E731
+    circuit = parse_circuit(data, compact=True)
+    analysis = TransientAnalysis(circuit, tau / 1000, method)
+    times, _, currents = analysis.advance(3000, every=100)
+    # погрешность неявного метода Эйлера – O(h), метода трапеций – O(h^2)
+    tolerance = 1e-3 if method == 'backward_euler' else 1e-5
+    np.testing.assert_allclose(np.abs(currents[:, 0]), expected_current(times),
+                               atol=tolerance * VOLTAGE / RESISTANCE)
+
+
+# Через много постоянных времени переходный процесс приходит к режиму постоянного тока:
+# ветви с конденсаторами разомкнуты, индуктивности – короткое замыкание
+def test_transient_settles_to_dc_solution():
+    data = GENERATORS['grid'](50, 17)
+    for edge in data['edges'][2::7]:
+        edge['elements'].append({'type': 'capacitor', 'value': 1e-6})
+    for edge in data['edges'][5::11]:
+        edge['elements'].append({'type': 'inductor', 'value': 1e-3})
+    dc_circuit = parse_circuit(copy.deepcopy(data), compact=True)
+    dc_circuit.solve_circuit(solver='direct')
+    # неявный метод Эйлера затухает и при шаге много больше постоянных времени цепи (метод трапеций – нет)
+    analysis = TransientAnalysis(parse_circuit(copy.deepcopy(data), compact=True), 1e-2, 'backward_euler')
+    _, potentials, currents = analysis.advance(200, every=200)
+    np.testing.assert_allclose(currents[-1], dc_circuit.edge_currents, atol=1e-9)
+    np.testing.assert_allclose(potentials[-1], dc_circuit.node_potentials, atol=1e-7)
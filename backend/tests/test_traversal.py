@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from conftest import branch_currents, form_chain, solve_with
+
+NUM_NODES = 6000
+
+
+# Цепочка длиннее предела рекурсии Python: обход графа, поиск контуров и расчёт токов выполняются без рекурсии.
+# В единственном контуре ток всех ветвей одинаков и равен ЭДС, делённой на сумму сопротивлений
+@pytest.mark.parametrize('method', ['mna', 'mca'])
+def test_deep_chain(method):
+    data = form_chain(NUM_NODES)
+    resistance = sum(edge['elements'][0]['value'] for edge in data['edges'])
+    np.testing.assert_allclose(np.abs(branch_currents(solve_with(data, method))), 12 / resistance, rtol=1e-9)
+
+
+# Последовательная цепочка источников ЭДС (особых ветвей) замкнута двумя параллельными резисторами
+def test_deep_chain_of_sources():
+    edges = [{'id': i, 'from': i, 'to': i + 1, 'elements': [
+        {'type': 'voltageSource', 'value': 1, 'direction': {'from': i, 'to': i + 1}}]} for i in range(1, NUM_NODES)]
+    edges.append({'id': NUM_NODES, 'from': NUM_NODES, 'to': 1, 'elements': [{'type': 'resistor', 'value': 10}]})
+    edges.append({'id': NUM_NODES + 1, 'from': NUM_NODES, 'to': 1, 'elements': [{'type': 'resistor', 'value': 30}]})
+    currents = np.abs(branch_currents(solve_with({'nodes': list(range(1, NUM_NODES + 1)), 'edges': edges}, 'mca')))
+    voltage = NUM_NODES - 1
+    np.testing.assert_allclose(currents[:-2], voltage / 10 + voltage / 30, rtol=1e-9)
+    np.testing.assert_allclose(currents[-2:], [voltage / 10, voltage / 30], rtol=1e-9)
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from circuit_calculator import ELEMENT_TYPES
+
+from conftest import GENERATORS, branch_currents, join_with_bridge, solve_fresh, solve_with, with_value
+
+
+# Изменение номинала (формула Шермана – Моррисона – Вудбери для LU-разложения, повторный расчёт
+# методом сопряжённых градиентов с начальным приближением) совпадает с расчётом изменённой цепи с нуля
+@pytest.mark.parametrize('method', ['mna', 'cg', 'mca'])
+@pytest.mark.parametrize('topology', ['ladder', 'grid', 'random'])
+def test_update_matches_fresh_solve(topology, method):
+    data = GENERATORS[topology](300, 1)
+    circuit_graph = solve_with(data, method)
+    for edge_id, element_type, value in [(7, 'resistor', 470), (1, 'voltageSource', -3), (7, 'resistor', 5)]:
+        circuit_graph.update_element(str(edge_id), ELEMENT_TYPES[element_type], value)
+        data = with_value(data, edge_id, element_type, value)
+        np.testing.assert_allclose(branch_currents(circuit_graph), branch_currents(solve_fresh(data)),
+                                   rtol=1e-7, atol=1e-9)
+
+
+def test_update_with_zero_resistance_branches():
+    data = GENERATORS['specific'](300, 2)
+    circuit_graph = solve_with(data, 'mna')
+    # ветвь с резистором и источником напряжения
+    edge = next(edge for edge in data['edges'] if [element['type'] for element in edge['elements']] == [
+        'resistor', 'voltageSource'])
+    circuit_graph.update_element(str(edge['id']), ELEMENT_TYPES['resistor'], 33)
+    data = with_value(data, edge['id'], 'resistor', 33)
+    np.testing.assert_allclose(branch_currents(circuit_graph), branch_currents(solve_fresh(data)),
+                               rtol=1e-7, atol=1e-9)
+
+
+def test_update_of_decomposed_circuit():
+    data = join_with_bridge(GENERATORS['grid'](100, 3), GENERATORS['ladder'](100, 4))
+    circuit_graph = solve_with(data, 'auto')
+    assert circuit_graph.analyzing_method == 'block decomposition'
+    for edge_id, element_type, value in [(3, 'resistor', 91), (len(data['edges']), 'resistor', 1)]:
+        circuit_graph.update_element(str(edge_id), ELEMENT_TYPES[element_type], value)
+        data = with_value(data, edge_id, element_type, value)
+        np.testing.assert_allclose(branch_currents(circuit_graph), branch_currents(solve_fresh(data)),
+                                   rtol=1e-7, atol=1e-9)
@@ -52,6 +52,11 @@ function App() {
 
         ws.onmessage = (e) => {
             const data = JSON.parse(e.data);
+            // Сообщения об ошибках (сервер занят, превышено время расчёта и т. п.) не содержат результата расчёта
+            if (!data.calculation_result) {
+                console.log('Calculation error: ', data);
+                return;
+            }
             if (data.calculation_result.current) {
                 setElements(prevElements => prevElements.map(element => {
                     if (element.type === 'wire') {